@@ -1,17 +1,106 @@
+import argparse
 import sys
-from PyQt6.QtWidgets import QApplication
-from ui.main_window import MainWindow
-from core.config import load_theme
-from dotenv import load_dotenv
 
-load_dotenv()
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="foxchat", add_help=True)
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="print an import-time and first-paint breakdown to stderr")
+    parser.add_argument("--quit-after-startup", action="store_true",
+                        help="exit right after the first paint (use with --startup-profile)")
+    # Anything else (e.g. Qt's own -style/-platform options) goes to QApplication
+    return parser.parse_known_args(argv[1:])
+
+
+HEADLESS_COMMANDS = ("export", "import", "batch")
+
+
+def parse_headless_args(argv):
+    parser = argparse.ArgumentParser(prog="foxchat", description="Headless commands (no GUI)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for command, path_help in (("export", "output file (default: stdout)"),
+                               ("import", "input file (default: stdin)")):
+        sub = commands.add_parser(command, help=f"{command} chat history as JSONL")
+        sub.add_argument("path", nargs="?", default="-", help=path_help)
+        sub.add_argument("--mode", action="append", default=[],
+                         help="only this chat mode, e.g. \"AI Chat\" (repeatable)")
+        sub.add_argument("--session", action="append", default=[], help="only this session (repeatable)")
+        sub.add_argument("--since", help="only messages from this date on (YYYY-MM-DD or ISO datetime)")
+        sub.add_argument("--until", help="only messages before this date")
+
+    from core.config import BATCH_CONCURRENCY
+    batch = commands.add_parser("batch", help="run a file of prompts through a provider, results as JSONL")
+    batch.add_argument("path", nargs="?", default="-",
+                       help="prompts, one per line: text or {\"prompt\", \"id\", \"profile\"} (default: stdin)")
+    batch.add_argument("-o", "--output", default="-", help="results file (default: stdout)")
+    batch.add_argument("--profile", default="deepseek", help="API profile for prompts that don't name one")
+    batch.add_argument("-j", "--concurrency", type=int, default=BATCH_CONCURRENCY,
+                       help=f"requests in flight (default: {BATCH_CONCURRENCY})")
+    batch.add_argument("--session", help="also append every prompt and reply to this session")
+    batch.add_argument("--mode", default="AI Chat", help="chat mode of --session (default: AI Chat)")
+    return parser.parse_args(argv[1:])
+
+
+def run_headless(argv):
+    """`export`/`import`/`batch`, without Qt."""
+    args = parse_headless_args(argv)
+    try:
+        if args.command == "batch":
+            if args.concurrency < 1:
+                sys.exit("foxchat batch: --concurrency must be at least 1")
+            from dotenv import load_dotenv
+            load_dotenv()
+            from core.batch_runner import run
+            return run(args.path, args.output, args.profile, args.concurrency, args.mode, args.session)
+
+        from core.session_transfer import MessageFilter, parse_date, run
+        try:
+            selection = MessageFilter(args.mode, args.session, parse_date(args.since), parse_date(args.until))
+        except ValueError as e:
+            sys.exit(f"foxchat {args.command}: {e}")
+        return run(args.command, args.path, selection)
+    except OSError as e:
+        sys.exit(f"foxchat {args.command}: {e}")
+
 
 def main():
-    app = QApplication(sys.argv)
+    if sys.argv[1:2] and sys.argv[1] in HEADLESS_COMMANDS:
+        sys.exit(run_headless(sys.argv))
+
+    args, qt_args = parse_args(sys.argv)
+
+    profiler = None
+    if args.startup_profile:
+        from core.startup_profile import StartupProfiler
+        profiler = StartupProfiler()
+        profiler.install()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from PyQt6.QtWidgets import QApplication
+    if profiler:
+        profiler.mark("Qt imported")
+
+    from ui.main_window import MainWindow
+    from core.config import load_theme
+    if profiler:
+        profiler.mark("app modules imported")
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    # Session changes are written in the background; make sure they land before exit
+    from core.file_manager import flush_writes
+    app.aboutToQuit.connect(flush_writes)
 
     load_theme(app, mode="colorful")
 
     window = MainWindow()
+    if profiler:
+        profiler.mark("main window built")
+        profiler.watch_first_paint(window, on_done=app.quit if args.quit_after_startup else None)
+    elif args.quit_after_startup:
+        from PyQt6.QtCore import QTimer
+        QTimer.singleShot(0, app.quit)
     window.show()
 
     sys.exit(app.exec())
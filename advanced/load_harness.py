@@ -0,0 +1,121 @@
+# advanced/load_harness.py
+
+"""
+Load harness for the provider request path.
+
+Drives `query_api` (or `stream_api` with --stream) at a fixed concurrency
+and reports p50/p95/p99 latency and requests/sec. By default it starts
+the local stand-in server (advanced.mock_openrouter) and points the
+built-in OpenRouter provider at it, giving a repeatable offline baseline:
+
+    python -m advanced.load_harness --requests 500 --concurrency 16 --latency 0.1
+    python -m advanced.load_harness --url http://127.0.0.1:8787/api/v1/chat/completions
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from advanced.mock_openrouter import MockOpenRouterServer, add_config_arguments, config_from_args
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def _timed_query(prompt, profile, stream):
+    from core.api_manager import is_error_reply, query_api, stream_api
+
+    start = time.perf_counter()
+    first_chunk = None
+    if stream:
+        failed = False
+        for chunk in stream_api(prompt, profile):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            failed = failed or is_error_reply(chunk)
+    else:
+        failed = is_error_reply(query_api(prompt, profile))
+    return time.perf_counter() - start, first_chunk, failed
+
+
+def run_load(total: int, concurrency: int, profile: str = "deepseek", stream: bool = False) -> dict:
+    """Send `total` requests with `concurrency` in flight; return latency statistics (seconds)."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(_timed_query, f"load test prompt {i}", profile, stream) for i in range(total)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _, _ in results)
+    ttfts = sorted(ttft for _, ttft, _ in results if ttft is not None)
+    stats = {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": sum(1 for _, _, failed in results if failed),
+        "elapsed": elapsed,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+    if ttfts:
+        stats["ttft_p50"] = percentile(ttfts, 50)
+        stats["ttft_p95"] = percentile(ttfts, 95)
+    return stats
+
+
+def format_report(stats: dict) -> str:
+    lines = [
+        f"requests      {stats['requests']} ({stats['errors']} errors), concurrency {stats['concurrency']}",
+        f"elapsed       {stats['elapsed']:.2f} s",
+        f"throughput    {stats['rps']:.1f} req/s",
+        f"latency p50   {stats['p50'] * 1000:.1f} ms",
+        f"latency p95   {stats['p95'] * 1000:.1f} ms",
+        f"latency p99   {stats['p99'] * 1000:.1f} ms",
+    ]
+    if "ttft_p50" in stats:
+        lines.append(f"first chunk   p50 {stats['ttft_p50'] * 1000:.1f} ms, p95 {stats['ttft_p95'] * 1000:.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark query_api against a local or remote endpoint")
+    parser.add_argument("--requests", type=int, default=200, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--profile", default="deepseek", help="API profile to query")
+    parser.add_argument("--stream", action="store_true", help="use stream_api and report time to first chunk")
+    parser.add_argument("--url", help="existing OpenRouter-compatible endpoint (skips the built-in server)")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Measure the request path, not the cache
+    os.environ["FOXCHAT_RESPONSE_CACHE"] = "0"
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock-key")
+
+    server = None
+    if args.url:
+        os.environ["FOXCHAT_OPENROUTER_URL"] = args.url
+    else:
+        server = MockOpenRouterServer(config=config_from_args(args)).start_in_background()
+        os.environ["FOXCHAT_OPENROUTER_URL"] = server.url
+
+    from core import http_client
+    http_client.configure(pool_size=max(args.concurrency, 10))
+
+    try:
+        print(format_report(run_load(args.requests, args.concurrency, args.profile, args.stream)))
+    finally:
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
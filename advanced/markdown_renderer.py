@@ -1,24 +1,123 @@
-import markdown
-from markdown.extensions.codehilite import CodeHiliteExtension
-from markdown.extensions.tables import TableExtension
-from markdown.extensions.fenced_code import FencedCodeExtension
-from markdown.extensions.nl2br import Nl2BrExtension
-from markdown.extensions.sane_lists import SaneListExtension
+# advanced/markdown_renderer.py
+
+"""
+Markdown -> HTML for the chat.
+
+One configured `markdown.Markdown` instance is reused (reset between
+documents) instead of rebuilding the parser and its extensions per
+message. Results are memoized by content hash: a memory LRU sits in
+front of a bounded SQLite table under sessions/, so reopening a
+session, even after a restart, skips rendering. The GUI thread only
+uses the memory LRU; the table is read by RenderQueue workers and
+written on the session writer.
+
+Code blocks are highlighted with Pygments CSS classes rather than
+inline styles, and each highlighted block is cached by language and
+content hash. Spans of tokens that no configured theme colors are
+dropped. The colors come from the Pygments style of each theme
+(code_stylesheet), set as the default stylesheet of the documents
+showing the HTML, so switching theme needs no re-rendering.
+
+IncrementalRenderer renders a growing (streamed) text: finished
+top-level blocks are rendered once, only the open tail is re-rendered.
+
+RenderQueue renders on a small thread pool (one engine per thread) so
+the chat can show a plain-text placeholder and swap in the HTML when
+it arrives. Bumping its generation (e.g. on session switch) drops
+queued work and results that are still in flight.
+"""
+
+import hashlib
+import html as html_escape
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
 
 from PyQt6.QtWidgets import QTextBrowser
 from PyQt6.QtGui import QDesktopServices
-from PyQt6.QtCore import QUrl
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QUrl, pyqtSignal
 
-def render_markdown(text: str) -> str:
-    """
-    Render markdown text to HTML using Python-Markdown with extensions.
-    Returns HTML string suitable for PyQt rich text display.
-    """
-    try:
-        html = markdown.markdown(
-            text,
+from core.config import (
+    CODE_STYLES, HIGHLIGHT_CACHE_ENTRIES, MARKDOWN_CACHE_ENTRIES, MARKDOWN_DISK_CACHE_ENTRIES,
+    MARKDOWN_RENDER_THREADS
+)
+from core.file_manager import DATA_DIR, ensure_data_dir, get_writer
+
+RENDER_CACHE_FILE = os.path.join(DATA_DIR, "render_cache.sqlite3")
+
+# Bump when the generated HTML changes, so cached renderings are not reused
+HTML_FORMAT = "codehilite-classes"
+
+# Unhighlighted code blocks as emitted by fenced_code/codehilite (use_pygments=False)
+_CODE_BLOCK = re.compile(
+    r'<pre(?: class="codehilite")?><code(?: class="language-([^" ]+)( linenums)?")?>(.*?)</code></pre>',
+    re.DOTALL
+)
+_TOKEN_SPAN = re.compile(r'<span(?: class="([\w-]+)")?>([^<]*)</span>')
+_CLASS = re.compile(r'class="([\w-]+)"')
+_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_LIST_ITEM = re.compile(r"^ {0,3}([-*+]|\d+[.)])(\s|$)")
+
+
+class _CodeHighlighter:
+    """Markdown postprocessor: highlights code blocks, caching each by (language, content hash)."""
+
+    def __init__(self, entries: int = HIGHLIGHT_CACHE_ENTRIES):
+        self.entries = entries
+        self._blocks = OrderedDict()  # (language, line numbers, sha1) -> html
+        self._lock = threading.Lock()
+
+    def run(self, text: str) -> str:
+        return _CODE_BLOCK.sub(self._highlight, text)
+
+    def _highlight(self, match) -> str:
+        from markdown.extensions.codehilite import CodeHilite
+
+        lang, linenums, code = match.group(1), bool(match.group(2)), html_escape.unescape(match.group(3))
+        key = (lang, linenums, hashlib.sha1(code.encode("utf-8")).hexdigest())
+        with self._lock:
+            html = self._blocks.get(key)
+            if html is not None:
+                self._blocks.move_to_end(key)
+                return html
+        html = CodeHilite(code, lang=lang, linenums=linenums or None, css_class="codehilite").hilite(shebang=False)
+        # Qt matches every stylesheet rule against every span: keep only spans some theme colors
+        kept = _styled_classes()
+        html = _TOKEN_SPAN.sub(lambda m: m.group(0) if m.group(1) in kept else m.group(2), html)
+        with self._lock:
+            self._blocks[key] = html
+            while len(self._blocks) > self.entries:
+                self._blocks.popitem(last=False)
+        return html
+
+
+_highlighter = _CodeHighlighter()
+
+
+class MarkdownEngine:
+    """A single Markdown converter, reset between documents. Thread-safe (one render at a time)."""
+
+    def __init__(self):
+        self._md = None
+        self._lock = threading.Lock()
+
+    def _build(self):
+        # Imported on first use: Markdown + Pygments dominate startup otherwise
+        import markdown
+        from markdown.extensions.codehilite import CodeHiliteExtension
+        from markdown.extensions.tables import TableExtension
+        from markdown.extensions.fenced_code import FencedCodeExtension
+        from markdown.extensions.nl2br import Nl2BrExtension
+        from markdown.extensions.sane_lists import SaneListExtension
+
+        md = markdown.Markdown(
             extensions=[
-                CodeHiliteExtension(noclasses=True, pygments_style='friendly'),
+                # Code blocks are highlighted (and cached) by _highlighter after conversion
+                CodeHiliteExtension(use_pygments=False),
                 FencedCodeExtension(),
                 TableExtension(),
                 SaneListExtension(),
@@ -26,10 +125,412 @@ def render_markdown(text: str) -> str:
             ],
             output_format="html5",
         )
-        return html
-    except Exception as e:
-        # Optional: return plain escaped text or empty on failure
-        return f"<pre>{text}</pre>"
+        # After raw HTML and "&" placeholders are restored
+        md.postprocessors.register(_highlighter, "cached_highlight", 10)
+        return md
+
+    def convert(self, text: str) -> str:
+        with self._lock:
+            if self._md is None:
+                self._md = self._build()
+            try:
+                return self._md.reset().convert(text)
+            except Exception:
+                # A failed conversion can leave the instance half-reset
+                self._md = None
+                return f"<pre>{text}</pre>"
+
+
+class RenderCache:
+    """
+    Memory LRU + bounded SQLite table of rendered HTML. Safe to use from
+    worker threads. peek() and put() only touch memory: new entries are
+    written out by save(), which `persist(save)` runs on a background
+    thread (without `persist`, put() saves at once). get() also looks on
+    disk, so call it off the GUI thread.
+    """
+
+    def __init__(self, path: str = RENDER_CACHE_FILE, memory_entries: int = MARKDOWN_CACHE_ENTRIES,
+                 max_disk_entries: int = MARKDOWN_DISK_CACHE_ENTRIES, persist=None):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.persist = persist
+        self._memory = OrderedDict()  # key -> html
+        self._unsaved = {}  # key -> html put since the last save
+        self._save_scheduled = False
+        self._lock = threading.Lock()  # Memory and unsaved entries
+        self._db_lock = threading.Lock()  # The connection: held during disk I/O
+        self._conn = None
+        self._writes_since_evict = 0
+
+    @staticmethod
+    def make_key(text: str) -> str:
+        return hashlib.sha1(f"{HTML_FORMAT}\0{text}".encode("utf-8")).hexdigest()
+
+    def peek(self, key: str) -> Optional[str]:
+        """The cached HTML if it is in memory; never reads the disk."""
+        with self._lock:
+            html = self._memory.get(key)
+            if html is None:
+                html = self._unsaved.get(key)
+            if html is not None:
+                self._remember(key, html)
+            return html
+
+    def get(self, key: str) -> Optional[str]:
+        html = self.peek(key)
+        if html is not None or not self.max_disk_entries:
+            return html
+        with self._db_lock:
+            row = self._db().execute("SELECT html FROM rendered WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self._remember(key, row[0])
+        return row[0]
+
+    def put(self, key: str, html: str) -> None:
+        with self._lock:
+            self._remember(key, html)
+            if not self.max_disk_entries:
+                return
+            self._unsaved[key] = html
+            schedule = not self._save_scheduled
+            self._save_scheduled = True
+        if schedule:
+            if self.persist is None:
+                self.save()
+            else:
+                self.persist(self.save)
+
+    def save(self) -> None:
+        """Write the entries put since the last save to disk."""
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+            self._save_scheduled = False
+        if not unsaved:
+            return
+        now = time.time()
+        with self._db_lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO rendered (key, html, created_at) VALUES (?, ?, ?)",
+                           [(key, html, now) for key, html in unsaved.items()])
+            self._writes_since_evict += len(unsaved)
+            if self._writes_since_evict >= 200:
+                self._evict()
+            db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._unsaved.clear()
+        if self.max_disk_entries:
+            with self._db_lock:
+                self._db().execute("DELETE FROM rendered")
+                self._db().commit()
+
+    def close(self) -> None:
+        self.save()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _remember(self, key, html):
+        self._memory[key] = html
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            ensure_data_dir()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # Only a cache: losing the last writes in a crash is fine
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rendered ("
+                " key TEXT PRIMARY KEY, html TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_rendered_created ON rendered(created_at)")
+            self._evict()
+            self._conn.commit()
+        return self._conn
+
+    def _evict(self):
+        """Drop the oldest rows beyond the size limit."""
+        self._writes_since_evict = 0
+        self._conn.execute(
+            "DELETE FROM rendered WHERE key IN ("
+            " SELECT key FROM rendered ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+
+def _persist(save) -> None:
+    """Write render cache entries on the session writer, behind session changes."""
+    get_writer().submit_background(lambda store: save())
+
+
+_engines = threading.local()  # One MarkdownEngine per rendering thread
+_cache = RenderCache(persist=_persist)
+_theme = "colorful"
+_style_rules = {}  # Pygments style name -> {CSS class: declarations}
+_stylesheets = {}  # (style, classes) -> CSS
+_kept_classes = None
+
+
+def set_theme(theme: str) -> None:
+    """Select the theme whose code colors code_stylesheet() returns (called by load_theme)."""
+    global _theme
+    _theme = theme
+
+
+def _rules(style: str) -> dict:
+    """Token class -> CSS declarations for a Pygments style, plus the code block itself ("codehilite")."""
+    rules = _style_rules.get(style)
+    if rules is None:
+        from pygments.formatters import HtmlFormatter
+        from pygments.token import Token
+
+        formatter = HtmlFormatter(style=style)
+        background = formatter.style.background_color or "#f8f8f8"
+        foreground = formatter.style.styles.get(Token) or (
+            "#000000" if _luminance(background) > 0.5 else "#ffffff"
+        )
+        plain = f"color: {foreground}".lower()
+        rules = {"codehilite": f"background: {background}; color: {foreground}"}
+        for css_class, (declarations, _token, _level) in formatter.class2style.items():
+            # Whitespace and tokens drawn in the default color need no span
+            if css_class and css_class != "w" and declarations and declarations.lower() != plain:
+                rules[css_class] = declarations
+        _style_rules[style] = rules
+    return rules
+
+
+def _luminance(color: str) -> float:
+    color = color.lstrip("#")
+    if len(color) == 3:
+        color = "".join(c * 2 for c in color)
+    red, green, blue = (int(color[i:i + 2], 16) / 255 for i in (0, 2, 4))
+    return 0.299 * red + 0.587 * green + 0.114 * blue
+
+
+def _styled_classes() -> frozenset:
+    """Token classes colored by at least one theme's style: spans for the rest are dropped."""
+    global _kept_classes
+    if _kept_classes is None:
+        _kept_classes = frozenset().union(*(_rules(style) for style in set(CODE_STYLES.values())))
+    return _kept_classes
+
+
+def code_stylesheet(html: Optional[str] = None, theme: Optional[str] = None) -> str:
+    """
+    CSS for highlighted code in `theme` (default: the active one), for
+    rich-text documents' default stylesheet (QSS cannot style their
+    contents). Qt checks every rule against every span, so with `html`
+    only the rules for classes it uses are included.
+    """
+    style = CODE_STYLES.get(theme or _theme, "friendly")
+    rules = _rules(style)
+    classes = frozenset(_CLASS.findall(html)) if html is not None else frozenset(rules)
+    css = _stylesheets.get((style, classes))
+    if css is None:
+        css = "\n".join(f".{name} {{ {rules[name]} }}" for name in sorted(classes) if name in rules)
+        if len(_stylesheets) > 256:
+            _stylesheets.clear()
+        _stylesheets[(style, classes)] = css
+    return css
+
+
+def cached_markdown(text: str) -> Optional[str]:
+    """The rendered HTML for `text` if it is cached in memory, without rendering or reading the disk."""
+    return _cache.peek(_cache.make_key(text))
+
+
+def placeholder_html(text: str) -> str:
+    """Cheap stand-in shown until the real rendering is ready: the escaped source text."""
+    return html_escape.escape(text).replace("\n", "<br>")
+
+
+def _convert(text: str) -> str:
+    """Uncached conversion with this thread's engine."""
+    engine = getattr(_engines, "engine", None)
+    if engine is None:
+        engine = _engines.engine = MarkdownEngine()
+    return engine.convert(text)
+
+
+def render_markdown(text: str) -> str:
+    """
+    Render markdown text to HTML using Python-Markdown with extensions.
+    Returns HTML string suitable for PyQt rich text display.
+    Only the memory cache is consulted: safe on the GUI thread.
+    """
+    key = _cache.make_key(text)
+    html = _cache.peek(key)
+    if html is None:
+        html = _convert(text)
+        _cache.put(key, html)
+    return html
+
+
+def _render_stored(text: str) -> str:
+    """render_markdown that also looks in the disk cache, for worker threads."""
+    key = _cache.make_key(text)
+    html = _cache.get(key)
+    if html is None:
+        html = _convert(text)
+        _cache.put(key, html)
+    return html
+
+
+def finished_length(text: str) -> int:
+    """
+    Length of the prefix of `text` made of finished top-level blocks:
+    up to the last blank line that is outside a code fence and followed
+    by a block that cannot continue the one before it (not indented, not
+    another item of the same list or quote). That block's first line must
+    be complete: a partial one ("1") may still turn out to continue it.
+    0 if none.
+    """
+    boundary = 0
+    fence = None  # Opening fence of the code block we are in
+    block_start = None  # First line of the current block
+    blank = False
+    position = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if fence is not None:
+            match = _FENCE.match(line)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) \
+                    and not line[match.end():].strip():
+                fence = None
+        elif not stripped:
+            blank = block_start is not None
+        else:
+            if blank and line.endswith("\n") and not line[0].isspace() and not (
+                (_LIST_ITEM.match(line) and _LIST_ITEM.match(block_start))
+                or (line.startswith(">") and block_start.startswith(">"))
+            ):
+                boundary = position
+                block_start = None
+            blank = False
+            if block_start is None:
+                block_start = line
+            match = _FENCE.match(line)
+            if match:
+                fence = match.group(1)
+        position += len(line)
+    return boundary
+
+
+class IncrementalRenderer:
+    """
+    Renders a text that keeps growing (a streamed reply). Blocks that are
+    finished (see finished_length) are rendered once and kept; each
+    update only re-renders the still-open tail, so the cost per update
+    stays about constant instead of growing with the reply. Link
+    reference definitions only apply within their own block until the
+    final, full rendering.
+    """
+
+    def __init__(self):
+        self.source = ""  # Text of the finished blocks
+        self.stable = ""  # Their HTML
+
+    def update(self, text: str) -> Tuple[bool, str, str]:
+        """
+        Returns (reset, appended, tail): `appended` is the HTML of blocks
+        finished since the last update and `tail` the HTML of the open
+        block. `reset` means `text` does not extend the previous one, so
+        `appended` covers everything from the start.
+        """
+        reset = not text.startswith(self.source)
+        if reset:
+            self.source = self.stable = ""
+        rest = text[len(self.source):]
+        done = finished_length(rest)
+        appended = ""
+        if done:
+            appended = _convert(rest[:done])
+            self.source += rest[:done]
+            self.stable = f"{self.stable}\n{appended}" if self.stable else appended
+        return reset, appended, _convert(rest[done:])
+
+    def html(self, tail: str) -> str:
+        """The whole document: finished blocks plus `tail`."""
+        if self.stable and tail:
+            return f"{self.stable}\n{tail}"
+        return self.stable or tail
+
+
+class _RenderSignals(QObject):
+    """Signal carrier for render tasks (QRunnable is not a QObject)."""
+    rendered = pyqtSignal(int, object, str)
+
+
+class _RenderTask(QRunnable):
+    def __init__(self, queue, generation: int, text: str, token):
+        super().__init__()
+        self.queue = queue
+        self.generation = generation
+        self.text = text
+        self.token = token
+        self.setAutoDelete(False)  # Kept by the caller so it can be taken back from the pool
+
+    def run(self):
+        if self.generation != self.queue.generation:
+            return  # Queued before a session switch
+        self.queue.signals.rendered.emit(self.generation, self.token, _render_stored(self.text))
+
+
+class RenderQueue(QObject):
+    """
+    Renders Markdown off the GUI thread. `rendered(token, html)` is
+    emitted on the GUI thread for each request of the current generation.
+    Requests run by tier, newest first within a tier: while scrolling,
+    the rows just scrolled into view go before ones already scrolled past.
+    """
+
+    VISIBLE = 1  # Tiers: rows on screen before rows near it
+    NEARBY = 0
+
+    rendered = pyqtSignal(object, str)
+
+    def __init__(self, parent=None, threads: int = MARKDOWN_RENDER_THREADS):
+        super().__init__(parent)
+        self.generation = 0
+        self._sequence = 0
+        self.signals = _RenderSignals()
+        self.signals.rendered.connect(self._deliver)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(threads)
+
+    def submit(self, text: str, token, tier: int = VISIBLE) -> _RenderTask:
+        """Queue a render. Keep the returned task to cancel() it."""
+        self._sequence = (self._sequence + 1) % (1 << 24)
+        task = _RenderTask(self, self.generation, text, token)
+        self._pool.start(task, (tier << 24) | self._sequence)
+        return task
+
+    def cancel(self, task: _RenderTask) -> bool:
+        """Take a request back if it has not started yet."""
+        return self._pool.tryTake(task)
+
+    def reset(self) -> None:
+        """Drop queued requests and ignore results still being rendered."""
+        self.generation += 1
+        self._pool.clear()
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def _deliver(self, generation, token, html):
+        if generation == self.generation:
+            self.rendered.emit(token, html)
+
 
 class MarkdownViewer(QTextBrowser):
     """
@@ -48,6 +549,7 @@ class MarkdownViewer(QTextBrowser):
         Render and set markdown text in the viewer.
         """
         html = render_markdown(markdown_text)
+        self.document().setDefaultStyleSheet(code_stylesheet(html))
         self.setHtml(html)
 
     def handle_link_click(self, url: QUrl):
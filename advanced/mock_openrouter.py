@@ -0,0 +1,192 @@
+# advanced/mock_openrouter.py
+
+"""
+Local stand-in for the OpenRouter chat completions endpoint.
+
+Speaks the `/api/v1/chat/completions` request/response shape (plain JSON
+or `stream: true` server-sent events) with configurable latency,
+throughput and error injection, so the request path can be benchmarked
+and regression-tested offline.
+
+Run it, then point FoxChat at it:
+
+    python -m advanced.mock_openrouter --port 8787 --latency 0.3 --error-rate 0.05
+    FOXCHAT_OPENROUTER_URL=http://127.0.0.1:8787/api/v1/chat/completions python -m FoxChat
+"""
+
+import argparse
+import json
+import math
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_COMPLETIONS_PATH = "/api/v1/chat/completions"
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.2  # Seconds before the first byte
+    jitter: float = 0.0  # Extra random latency, uniform in [0, jitter]
+    tokens_per_sec: float = 200.0  # Streaming throughput (0 = unthrottled)
+    reply_words: int = 60  # Length of generated replies
+    error_rate: float = 0.0  # Fraction of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0  # Fraction of requests answered with HTTP 429
+    retry_after: int = 1  # Retry-After header sent with 429s (whole seconds)
+
+
+def _reply_words(prompt: str, count: int):
+    seed = prompt.split() or ["fox"]
+    return [seed[i % len(seed)] for i in range(count)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real endpoint
+    server_version = "MockOpenRouter/1.0"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let Nagle delay the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_POST(self):
+        config: MockConfig = self.server.config
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if self.path.rstrip("/") != CHAT_COMPLETIONS_PATH:
+            return self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "code": 404}})
+        try:
+            payload = json.loads(body or b"{}")
+            messages = payload["messages"]
+        except (ValueError, KeyError):
+            return self._send_json(400, {"error": {"message": "Invalid request body", "code": 400}})
+
+        self.server.count_request()
+        time.sleep(config.latency + random.uniform(0, config.jitter))
+
+        roll = random.random()
+        if roll < config.rate_limit_rate:
+            return self._send_json(429, {"error": {"message": "Rate limit exceeded", "code": 429}},
+                                   # HTTP allows only whole seconds (urllib3 rejects "1.0")
+                                   {"Retry-After": str(math.ceil(config.retry_after))})
+        if roll < config.rate_limit_rate + config.error_rate:
+            return self._send_json(500, {"error": {"message": "Injected server error", "code": 500}})
+
+        words = _reply_words(messages[-1].get("content", ""), config.reply_words)
+        model = payload.get("model", "mock/model")
+        if payload.get("stream"):
+            self._stream(words, model, config)
+        else:
+            self._send_json(200, {
+                "id": "gen-mock", "object": "chat.completion", "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+            })
+
+    def _send_json(self, status, data, headers=None):
+        encoded = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _stream(self, words, model, config):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")  # No Content-Length: end of body is end of stream
+        self.end_headers()
+        self.close_connection = True
+
+        self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+        delay = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0
+        for i, word in enumerate(words):
+            event = {"id": "gen-mock", "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockOpenRouterServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), _Handler)
+        self.config = config or MockConfig()
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{CHAT_COMPLETIONS_PATH}"
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests_served += 1
+
+    def start_in_background(self) -> "MockOpenRouterServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="MockOpenRouter", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="seconds before the first byte")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter, help="extra random latency (seconds)")
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_sec,
+                        help="streaming throughput, 0 for unthrottled")
+    parser.add_argument("--reply-words", type=int, default=defaults.reply_words, help="words per reply")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="fraction of HTTP 500s")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate,
+                        help="fraction of HTTP 429s")
+    parser.add_argument("--retry-after", type=int, default=defaults.retry_after,
+                        help="Retry-After for 429s (whole seconds)")
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency=args.latency, jitter=args.jitter, tokens_per_sec=args.tokens_per_sec,
+        reply_words=args.reply_words, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenRouter-compatible stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockOpenRouterServer(args.host, args.port, config_from_args(args))
+    print(f"Mock OpenRouter listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,77 @@
-import importlib
 import os
-from typing import Callable
+from typing import Iterator, Optional
 
-from dotenv import load_dotenv
-import requests
 import json
 import logging
 
+from core import http_client
+from core import response_cache
+from core.provider_registry import (
+    ProviderError, ProviderNotFoundError, get_registry, normalize_name
+)
+
 logging.basicConfig(level=logging.DEBUG, filename="app.log", filemode="a",
                     format="%(asctime)s - %(levelname)s - %(message)s")
 
 def log_error(error_msg):
     logging.error(error_msg)
 
-load_dotenv()
-
 # Built-in API registry
 BUILT_IN_APIS = {
     "deepseek": "openrouter_internal",  # Use fake internal tag
 }
 
-# Load environment variables
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+# ------------------- Built-in OpenRouter Query ------------------- #
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_MODEL = "deepseek/deepseek-r1:free"
 
-# Validate the keys
-if not OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY is missing in the .env file.")
 
+class MissingApiKeyError(RuntimeError):
+    pass
 
-# ------------------- Built-in OpenRouter Query ------------------- #
-def query_openrouter(prompt: str) -> str:
-    url = "https://openrouter.ai/api/v1/chat/completions"
+
+class ErrorChunk(str):
+    """
+    A streamed chunk reporting that the stream failed. It is shown like
+    any other chunk, but tells consumers the reply is incomplete (it
+    must not be cached), even when it follows partial text.
+    """
+
+
+def get_openrouter_url() -> str:
+    """Endpoint URL; FOXCHAT_OPENROUTER_URL overrides it (e.g. advanced.mock_openrouter)."""
+    return os.getenv("FOXCHAT_OPENROUTER_URL") or OPENROUTER_URL
+
+
+def get_openrouter_api_key() -> str:
+    """
+    Read the key when a request is made (the environment is loaded from
+    .env by __main__), so a missing key is a provider error, not an import crash.
+    """
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise MissingApiKeyError("OPENROUTER_API_KEY is missing in the .env file.")
+    return api_key
+
+
+def _openrouter_request(prompt: str, stream: bool = False, messages: Optional[list] = None):
     headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "Authorization": f"Bearer {get_openrouter_api_key()}",
         "Content-Type": "application/json",
     }
     payload = {
-        "model": "deepseek/deepseek-r1:free",
-        "messages": [{"role": "user", "content": prompt}],
+        "model": OPENROUTER_MODEL,
+        "messages": messages or [{"role": "user", "content": prompt}],
     }
+    if stream:
+        payload["stream"] = True
+    return get_openrouter_url(), headers, payload
+
+
+def query_openrouter(prompt: str, messages: Optional[list] = None) -> str:
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        url, headers, payload = _openrouter_request(prompt, messages=messages)
+        response = http_client.post(url, headers=headers, data=json.dumps(payload))
         response.raise_for_status()
         return response.json()["choices"][0]["message"]["content"]
     except Exception as e:
@@ -48,28 +79,135 @@ def query_openrouter(prompt: str) -> str:
         return f"❌ Error querying OpenRouter: {e}"
 
 
+def stream_openrouter(prompt: str, messages: Optional[list] = None) -> Iterator[str]:
+    """
+    Stream a completion from OpenRouter using server-sent events.
+    Yields content deltas as they arrive.
+    """
+    try:
+        url, headers, payload = _openrouter_request(prompt, stream=True, messages=messages)
+        with http_client.post(url, headers=headers, data=json.dumps(payload), stream=True) as response:
+            response.raise_for_status()
+            done = False
+            for line in response.iter_lines(decode_unicode=True):
+                # Blank lines separate events; ':' lines are keep-alive comments
+                if not line or line.startswith(":") or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                event = json.loads(data)
+                if "error" in event:
+                    raise RuntimeError(event["error"].get("message", event["error"]))
+                choices = event.get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+            if not done:
+                raise RuntimeError("stream ended before [DONE]")
+    except Exception as e:
+        log_error(f"OpenRouter Stream Error: {e}")
+        yield ErrorChunk(f"❌ Error querying OpenRouter: {e}")
+
+
+# ------------------- Provider Registry ------------------- #
+registry = get_registry()
+registry.register_builtin(
+    "deepseek", query=query_openrouter, stream=stream_openrouter, model=OPENROUTER_MODEL,
+    accepts_messages=True
+)
+
+
 # ------------------- Public Interface ------------------- #
-def normalize_name(name: str) -> str:
-    return name.strip().lower().replace(" ", "_")
+def is_error_reply(reply: str) -> bool:
+    """
+    Error replies are returned as text; they must never be cached. For
+    streams, check for an ErrorChunk instead: a stream that fails
+    partway ends with one after its partial text.
+    """
+    return isinstance(reply, ErrorChunk) or reply.startswith(("❌", "⚠️"))
+
+
+def get_profile_model(profile_name: str) -> str:
+    """Model identifier used in cache keys (custom modules may set `MODEL`)."""
+    try:
+        return registry.resolve(profile_name).model
+    except Exception:
+        return normalize_name(profile_name)
+
+
+def get_cached_reply(text: str, profile_name: str, messages: Optional[list] = None) -> Optional[str]:
+    """Return a cached reply for this prompt/history, or None (also when caching is off)."""
+    if not response_cache.cache_allowed_for(profile_name):
+        return None
+    key = response_cache.make_key(profile_name, get_profile_model(profile_name), messages or text)
+    return response_cache.get_response_cache().get(key)
+
+
+def cache_reply(text: str, profile_name: str, reply: str, messages: Optional[list] = None) -> None:
+    if is_error_reply(reply) or not response_cache.cache_allowed_for(profile_name):
+        return
+    key = response_cache.make_key(profile_name, get_profile_model(profile_name), messages or text)
+    response_cache.get_response_cache().put(key, profile_name, reply)
 
 
-def query_api(text: str, profile_name: str) -> str:
-    profile_key = profile_name.strip().lower()
+def query_api(text: str, profile_name: str, messages: Optional[list] = None) -> str:
+    """
+    Query a provider. `messages` is the optional conversation history
+    (role/content dicts, see core.context_builder) ending with `text`;
+    providers that don't accept history only receive `text`.
+    """
+    cached = get_cached_reply(text, profile_name, messages)
+    if cached is not None:
+        return cached
+    reply = _query_provider(text, profile_name, messages)
+    cache_reply(text, profile_name, reply, messages)
+    return reply
 
-    # Handle built-in API directly
-    if profile_key == "deepseek":
-        return query_openrouter(text)
 
+def _query_provider(text: str, profile_name: str, messages: Optional[list] = None) -> str:
     try:
-        module_name = normalize_name(profile_name)
-        api_module = importlib.import_module(f"foxchat.apis.{module_name}")
-        query_func: Callable[[str], str] = getattr(api_module, "query", None)
-        if not callable(query_func):
-            return f"⚠️ API module '{module_name}' does not implement a callable `query(text)`."
-        return query_func(text)
+        provider = registry.resolve(profile_name)
+        if messages and provider.accepts_messages:
+            return provider.query(text, messages=messages)
+        return provider.query(text)
 
-    except ModuleNotFoundError:
-        return f"⚠️ API module not found: 'foxchat.apis.{module_name}'"
+    except (ProviderNotFoundError, ProviderError) as e:
+        return f"⚠️ {e}"
 
     except Exception as e:
         return f"❌ Error while querying '{profile_name}': {str(e)}"
+
+
+def stream_api(text: str, profile_name: str, messages: Optional[list] = None) -> Iterator[str]:
+    """
+    Streaming counterpart of `query_api` (without the response cache; see
+    `get_cached_reply`/`cache_reply`).
+    Custom API modules may define `stream(text)` returning an iterator of
+    chunks; modules with only `query(text)` yield their full reply once.
+    A failure, before or after partial text, is yielded as an ErrorChunk.
+    """
+    try:
+        provider = registry.resolve(profile_name)
+    except (ProviderNotFoundError, ProviderError) as e:
+        yield ErrorChunk(f"⚠️ {e}")
+        return
+    except Exception as e:
+        yield ErrorChunk(f"❌ Error while querying '{profile_name}': {str(e)}")
+        return
+
+    if provider.stream is None:
+        reply = _query_provider(text, profile_name, messages)
+        yield ErrorChunk(reply) if is_error_reply(reply) else reply
+        return
+
+    try:
+        if messages and provider.accepts_messages:
+            chunks = provider.stream(text, messages=messages)
+        else:
+            chunks = provider.stream(text)
+        for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        yield ErrorChunk(f"❌ Error while querying '{profile_name}': {str(e)}")
@@ -0,0 +1,148 @@
+# core/batch_runner.py
+
+"""
+Headless batch mode (`python -m FoxChat batch`).
+
+Reads prompts from a file or stdin, one per line: either plain text or
+a JSON object {"prompt", "id"?, "profile"?}. Each prompt goes through
+`query_api` (same provider registry and response cache as the GUI),
+scheduled at BATCH priority so provider rate limits and 429 back-off
+apply, with up to `concurrency` requests in flight. Results are
+written as JSONL in completion order:
+
+    {"index", "id", "profile", "prompt", "reply", "error", "latency"}
+
+Only a bounded window of prompts is read ahead, so input of any length
+runs in constant memory. With a session name, every prompt/reply pair
+is also appended to that session through file_manager.
+"""
+
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Iterable, Iterator, Optional
+
+from core.api_manager import is_error_reply, query_api
+from core.config import BATCH_CONCURRENCY
+from core.scheduler import BATCH, get_scheduler
+
+# Prompts read ahead per in-flight request
+READ_AHEAD = 4
+
+
+class BatchItem:
+    __slots__ = ("index", "id", "prompt", "profile")
+
+    def __init__(self, index: int, prompt: str, profile: str, id=None):
+        self.index = index
+        self.id = id
+        self.prompt = prompt
+        self.profile = profile
+
+
+def read_prompts(lines: Iterable[str], default_profile: str, source: str = "<input>") -> Iterator[BatchItem]:
+    """Parse prompt lines lazily; blank and malformed lines are skipped (malformed ones reported)."""
+    index = 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        if line.lstrip().startswith("{"):
+            try:
+                record = json.loads(line)
+                item = BatchItem(index, record["prompt"], record.get("profile") or default_profile, record.get("id"))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"{source}:{number}: skipped ({e})", file=sys.stderr)
+                continue
+        else:
+            item = BatchItem(index, line, default_profile)
+        index += 1
+        yield item
+
+
+class BatchRunner:
+    """Runs BatchItems through the scheduler and a thread pool, writing one JSON line per result."""
+
+    def __init__(self, out: IO[str], concurrency: int, mode: str = "AI Chat", session: Optional[str] = None):
+        self.out = out
+        self.concurrency = concurrency
+        self.mode = mode
+        self.session = session
+        self.completed = 0
+        self.errors = 0
+        self._slots = threading.BoundedSemaphore(concurrency * READ_AHEAD)
+        self._out_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="Batch")
+
+    def run(self, items: Iterable[BatchItem]) -> int:
+        """Run every item and wait for all results. Returns the number of prompts run."""
+        scheduler = get_scheduler()
+        scheduler.set_max_concurrent(self.concurrency)
+        if self.session:
+            from core.file_manager import create_session
+            create_session(self.mode, self.session)
+        submitted = 0
+        for item in items:
+            self._slots.acquire()
+            scheduler.submit(item.profile, lambda ticket, item=item: self._pool.submit(self._query, ticket, item),
+                             BATCH)
+            submitted += 1
+        # Wait for the in-flight window to drain
+        for _ in range(self.concurrency * READ_AHEAD):
+            self._slots.acquire()
+        self._pool.shutdown()
+        if self.session:
+            from core.file_manager import flush_writes
+            flush_writes()
+        return submitted
+
+    def _query(self, ticket, item: BatchItem) -> None:
+        try:
+            with ticket.running():
+                start = time.perf_counter()
+                try:
+                    reply = query_api(item.prompt, item.profile)
+                except Exception as e:
+                    reply = f"❌ Error while querying '{item.profile}': {e}"
+                latency = time.perf_counter() - start
+            self._record(item, reply, latency)
+        finally:
+            self._slots.release()
+
+    def _record(self, item: BatchItem, reply: str, latency: float) -> None:
+        error = is_error_reply(reply)
+        line = json.dumps({
+            "index": item.index, "id": item.id, "profile": item.profile, "prompt": item.prompt,
+            "reply": reply, "error": error, "latency": round(latency, 4),
+        }, ensure_ascii=False)
+        with self._out_lock:
+            self.out.write(line + "\n")
+            self.completed += 1
+            self.errors += error
+            if self.session:
+                from core.file_manager import append_message
+                from core.message import Message
+                append_message(self.mode, self.session, Message(item.prompt, True, "You"))
+                append_message(self.mode, self.session, Message(reply, False, item.profile))
+
+
+def run(input_path: str, output_path: str, profile: str, concurrency: int = BATCH_CONCURRENCY,
+        mode: str = "AI Chat", session: Optional[str] = None) -> int:
+    """Run a prompt file ("-" for stdin) into a JSONL file ("-" for stdout); summary on stderr."""
+    source = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+    out = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    start = time.perf_counter()
+    runner = BatchRunner(out, concurrency, mode, session)
+    try:
+        total = runner.run(read_prompts(source, profile, "<stdin>" if input_path == "-" else input_path))
+    finally:
+        for f in (source, out):
+            if f not in (sys.stdin, sys.stdout):
+                f.close()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"Ran {total} prompts ({runner.errors} errors) in {elapsed:.2f} s ({rate:,.1f} prompts/sec)",
+          file=sys.stderr)
+    return 0
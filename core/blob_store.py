@@ -0,0 +1,264 @@
+# core/blob_store.py
+
+"""
+Content-addressed attachment store (sessions/blobs/).
+
+A file attached to a message is copied in once, named by the SHA-256
+of its content alone, and referenced from the message as
+`[Uploaded File: blob:<sha256>/<original name>]`. The name (and so the
+file type) lives only in the reference, so the same bytes attached as
+`a.txt` and `b.md` share one blob. Attaching the same content again
+only bumps its reference count. Deleting a chat releases its
+references, and blobs nobody references any more are removed along
+with their derived files.
+
+Derived artifacts (thumbnails, extracted text, links named with the
+original extension for other programs) live next to their blob as
+`<sha256>.<kind>` and are removed with it. Plain paths from older
+messages, and blobs stored with an extension by older versions, are
+still accepted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Iterable, Optional
+
+from core.session_writer import atomic_write
+
+BLOB_PREFIX = "blob:"
+CHUNK_SIZE = 1 << 20
+# Extensions whose text is extracted (capped at EXTRACT_LIMIT characters)
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".json", ".py", ".log", ".xml", ".html", ".yaml", ".yml", ".ini"}
+EXTRACT_LIMIT = 20000
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def is_blob_ref(ref: str) -> bool:
+    return ref.startswith(BLOB_PREFIX)
+
+
+def is_digest(digest: str) -> bool:
+    """True for a lowercase hex SHA-256, the only thing allowed to name a blob."""
+    return _DIGEST.fullmatch(digest) is not None
+
+
+def split_ref(ref: str):
+    """`blob:<sha256>/<name>` -> (sha256, name). ValueError if the digest is not a SHA-256."""
+    digest, _, name = ref[len(BLOB_PREFIX):].partition("/")
+    if not is_digest(digest):
+        raise ValueError(f"Invalid blob reference {ref!r}")
+    return digest, name
+
+
+def _ref_digest(ref: str) -> Optional[str]:
+    """Digest of a valid blob ref; None for plain paths and (logged) malformed refs, e.g. from an import."""
+    if not is_blob_ref(ref):
+        return None
+    try:
+        return split_ref(ref)[0]
+    except ValueError as e:
+        logging.warning("Ignoring attachment: %s", e)
+        return None
+
+
+def display_name(ref: str) -> str:
+    """The file name to show for a reference (original name for blobs)."""
+    return ref[len(BLOB_PREFIX):].partition("/")[2] if is_blob_ref(ref) else os.path.basename(ref)
+
+
+class BlobStore:
+    """
+    Blobs under `directory/<first two hex digits>/<sha256>`, plus
+    index.json: {sha256: {"refs", "size"}} ("ext" on blobs stored with
+    an extension by older versions). Thread-safe.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.RLock()
+        self._index: Optional[Dict[str, dict]] = None
+
+    # ------------------- Index ------------------- #
+    def _entries(self) -> Dict[str, dict]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {}
+            except json.JSONDecodeError as e:
+                logging.error("Blob index %s is unreadable: %s", self.index_path, e)
+                self._index = {}
+        return self._index
+
+    def _save_index(self) -> None:
+        atomic_write(self.index_path, json.dumps(self._index, indent=1).encode("utf-8"))
+
+    def refcount(self, digest: str) -> int:
+        with self._lock:
+            entry = self._entries().get(digest)
+            return entry["refs"] if entry else 0
+
+    # ------------------- Paths ------------------- #
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _legacy_path(self, digest: str) -> Optional[str]:
+        """Where older versions stored a blob (`<sha256><ext>`), if it is still there."""
+        with self._lock:
+            entry = self._entries().get(digest)
+        if not entry or not entry.get("ext"):
+            return None
+        path = self._blob_path(digest) + entry["ext"]
+        return path if os.path.exists(path) else None
+
+    def path(self, ref: str) -> str:
+        """
+        File on disk for a reference (blob refs resolve into the store, plain
+        paths pass through); "" (no file) for a malformed blob ref.
+        """
+        if not is_blob_ref(ref):
+            return ref
+        digest = _ref_digest(ref)
+        if digest is None:
+            return ""
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            path = self._legacy_path(digest) or path
+        return path
+
+    def open_path(self, ref: str) -> str:
+        """
+        The file for a reference, named with its original extension, for
+        programs that go by it (a hard link next to the blob, or a copy).
+        """
+        source = self.path(ref)
+        ext = os.path.splitext(display_name(ref))[1].lower()
+        target = self.derived_path(ref, "open" + ext)
+        if target is None or source.endswith(ext) or not os.path.exists(source):
+            return source
+        if not os.path.exists(target):
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copyfile(source, target)
+        return target
+
+    def derived_path(self, ref: str, kind: str) -> Optional[str]:
+        """Where to cache a derived artifact (e.g. "thumb300.png") of a blob; None for plain paths."""
+        digest = _ref_digest(ref)
+        if digest is None:
+            return None
+        return os.path.join(self.directory, digest[:2], f"{digest}.{kind}")
+
+    # ------------------- Ingest / release ------------------- #
+    def ingest(self, path: str) -> str:
+        """Copy `path` into the store (once per distinct content), take a reference and return it."""
+        name = os.path.basename(path)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f"ingest.{os.getpid()}.{threading.get_ident()}.tmp")
+        sha = hashlib.sha256()
+        try:
+            with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    sha.update(chunk)
+                    dst.write(chunk)
+                size = dst.tell()
+            digest = sha.hexdigest()
+            with self._lock:
+                target = self._blob_path(digest)
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    # Move a copy stored with an extension by an older version rather than keep two
+                    os.replace(self._legacy_path(digest) or tmp_path, target)
+                entry = self._entries().setdefault(digest, {"refs": 0, "size": size})
+                entry.pop("ext", None)
+                entry["size"] = size
+                entry["refs"] += 1
+                self._save_index()
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return f"{BLOB_PREFIX}{digest}/{name}"
+
+    def retain(self, refs: Iterable[str]) -> None:
+        """
+        Take one more reference per blob ref (e.g. imported messages). Blobs
+        not in this store are counted too, so a later upload of the same
+        file is not collected while those messages still point at it.
+        """
+        with self._lock:
+            changed = False
+            for ref in refs:
+                digest = _ref_digest(ref)
+                if digest is not None:
+                    entry = self._entries().setdefault(digest, {"refs": 0, "size": 0})
+                    entry["refs"] += 1
+                    changed = True
+            if changed:
+                self._save_index()
+
+    def release(self, refs: Iterable[str]) -> int:
+        """Drop one reference per blob ref and delete blobs left unreferenced. Returns blobs removed."""
+        with self._lock:
+            entries = self._entries()
+            changed = False
+            for ref in refs:
+                digest = _ref_digest(ref)
+                entry = entries.get(digest) if digest is not None else None
+                if entry is not None:
+                    entry["refs"] -= 1
+                    changed = True
+            if changed:
+                self._save_index()
+            return self.collect_garbage()
+
+    def collect_garbage(self) -> int:
+        """Remove blobs (and their derived files) with no references left."""
+        with self._lock:
+            entries = self._entries()
+            dead = [digest for digest, entry in entries.items() if entry["refs"] <= 0 or not is_digest(digest)]
+            for digest in dead:
+                entry = entries.pop(digest)
+                if not is_digest(digest):
+                    # Left by a version that didn't check refs; it names no file, so delete none
+                    logging.warning("Dropped invalid blob index entry %r", digest)
+                    continue
+                folder = os.path.join(self.directory, digest[:2])
+                try:
+                    for filename in os.listdir(folder):
+                        if filename == digest or filename.startswith(digest + "."):
+                            os.remove(os.path.join(folder, filename))
+                    if not os.listdir(folder):
+                        os.rmdir(folder)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.error("Removing blob %s failed: %s", digest, e)
+                logging.info("Removed unreferenced blob %s (%d bytes)", digest, entry["size"])
+            if dead:
+                self._save_index()
+            return len(dead)
+
+    # ------------------- Derived artifacts ------------------- #
+    def extracted_text(self, ref: str) -> Optional[str]:
+        """Text content of a text-like attachment (cached as `<sha256>.extract.txt`), or None."""
+        source = self.path(ref)
+        if os.path.splitext(display_name(ref))[1].lower() not in TEXT_EXTENSIONS or not os.path.exists(source):
+            return None
+        cache = self.derived_path(ref, "extract.txt")
+        if cache and os.path.exists(cache):
+            with open(cache, "r", encoding="utf-8") as f:
+                return f.read()
+        with open(source, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read(EXTRACT_LIMIT)
+        if cache:
+            atomic_write(cache, text.encode("utf-8"))
+        return text
@@ -5,6 +5,9 @@ import os
 # App constants
 APP_NAME = "FoxChat"
 
+# Chat modes, as shown in the sidebar's mode switch
+CHAT_MODES = ("AI Chat", "Anonymous Chat")
+
 # Default API profiles (empty for now; user can add custom later)
 API_PROFILES = {
     # Example profile format:
@@ -16,6 +19,50 @@ API_PROFILES = {
     # },
 }
 
+# Fan-out mode (one message to several API profiles), in seconds
+FANOUT_PROVIDER_TIMEOUT = 90
+FANOUT_TOTAL_BUDGET = 180
+
+# Conversation context sent with each message
+CONTEXT_TOKEN_BUDGET = 4000
+CONTEXT_STRATEGY = "sliding_window"  # or "pinned_system_prompt"
+CONTEXT_SYSTEM_PROMPT = ""
+
+# Request scheduler: concurrent provider calls and per-provider
+# token buckets as (requests per second, burst size)
+SCHEDULER_MAX_CONCURRENT = 4
+DEFAULT_RATE_LIMIT = (1.0, 5)
+PROVIDER_RATE_LIMITS = {
+    "deepseek": (20 / 60, 5),  # OpenRouter free tier: 20 requests/minute
+}
+# Requests in flight for headless batch runs (`python -m FoxChat batch`)
+BATCH_CONCURRENCY = 8
+
+# Session storage: "sqlite" (indexed, messages loaded per session) or
+# "journal" (append-only file per mode). Existing data is imported into
+# SQLite on first use.
+SESSION_BACKEND = "sqlite"
+# Messages loaded when a session is opened; older ones load on demand
+SESSION_PAGE_SIZE = 200
+# Sidebar order: "recent" (last activity first) or "created"
+SESSION_SORT = "recent"
+# Session changes are written in the background, batched over this many seconds
+SESSION_WRITE_INTERVAL = 0.25
+# Sessions idle this long are compressed into sessions/archive/ (0 disables);
+# codec is "auto" (zstd if installed, else zlib), "zstd", "lzma" or "zlib"
+ARCHIVE_IDLE_DAYS = 30
+ARCHIVE_CODEC = "auto"
+
+# Rendered Markdown memoized in memory and in sessions/render_cache.sqlite3
+# (0 disables the disk tier)
+MARKDOWN_CACHE_ENTRIES = 2000
+MARKDOWN_DISK_CACHE_ENTRIES = 20000
+# Threads rendering Markdown in the background (bubbles show plain text until done)
+MARKDOWN_RENDER_THREADS = 2
+# Highlighted code blocks kept in memory, and the Pygments style used per theme
+HIGHLIGHT_CACHE_ENTRIES = 500
+CODE_STYLES = {"colorful": "friendly", "light": "friendly", "dark": "monokai"}
+
 # Path to themes folder (relative to project root)
 THEMES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "themes")
 
@@ -33,6 +80,10 @@ def load_theme(app, mode="colorful"):
         print(f"Theme file not found: {theme_file}")
         return
 
+    # Code block colors follow the theme; set first so restyled widgets pick them up
+    from advanced.markdown_renderer import set_theme
+    set_theme(mode)
+
     with open(theme_file, "r", encoding="utf-8") as f:
         qss = f.read()
         app.setStyleSheet(qss)
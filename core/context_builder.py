@@ -0,0 +1,108 @@
+# core/context_builder.py
+
+"""
+Conversation-context builder.
+
+Turns a session's stored (msg, is_user, sender) messages into the
+role/content history sent to providers, keeping it within a token
+budget. History is walked newest first and only until the budget is
+full, and token counts (from whichever counter is configured) are
+cached per message text, so rebuilding the context after each new
+message only counts the new message.
+"""
+
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from core.config import CONTEXT_TOKEN_BUDGET, CONTEXT_STRATEGY, CONTEXT_SYSTEM_PROMPT
+
+ChatMessage = Dict[str, str]
+
+# Message texts whose token counts each ContextBuilder remembers
+TOKEN_COUNT_CACHE_SIZE = 50_000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, provider-agnostic token estimate (~4 characters per token,
+    plus a small per-message overhead for role markers).
+    """
+    return len(text) // 4 + 4
+
+
+def _is_error_reply(text: str) -> bool:
+    return text.startswith(("❌", "⚠️"))
+
+
+def to_chat_messages(messages: Sequence) -> List[ChatMessage]:
+    """Convert stored (msg, is_user, sender) entries to role/content dicts, skipping error replies."""
+    history = []
+    for msg, is_user, _sender in messages:
+        if not is_user and _is_error_reply(msg):
+            continue
+        history.append({"role": "user" if is_user else "assistant", "content": msg})
+    return history
+
+
+def iter_recent(messages: Sequence) -> Iterator[ChatMessage]:
+    """Like `to_chat_messages`, but lazily and newest first."""
+    for msg, is_user, _sender in reversed(messages):
+        if not is_user and _is_error_reply(msg):
+            continue
+        yield {"role": "user" if is_user else "assistant", "content": msg}
+
+
+# ------------------- Truncation strategies ------------------- #
+class SlidingWindow:
+    """Keep the most recent messages that fit in the budget."""
+
+    name = "sliding_window"
+
+    def select(self, recent: Iterable[ChatMessage], budget: int,
+               count: Callable[[str], int]) -> List[ChatMessage]:
+        """`recent` yields the history newest first; it is only read until the budget is full."""
+        selected = []
+        used = 0
+        for message in recent:
+            cost = count(message["content"])
+            if selected and used + cost > budget:
+                break  # The latest message is always sent, even if it alone exceeds the budget
+            selected.append(message)
+            used += cost
+        selected.reverse()
+        return selected
+
+
+class PinnedSystemPrompt(SlidingWindow):
+    """Always send a system prompt first, then as many recent turns as still fit."""
+
+    name = "pinned_system_prompt"
+
+    def __init__(self, system_prompt: str):
+        self.system_prompt = system_prompt
+
+    def select(self, recent, budget, count):
+        if not self.system_prompt:
+            return super().select(recent, budget, count)
+        system = {"role": "system", "content": self.system_prompt}
+        remaining = max(budget - count(self.system_prompt), 0)
+        return [system] + super().select(recent, remaining, count)
+
+
+STRATEGIES = {
+    SlidingWindow.name: lambda: SlidingWindow(),
+    PinnedSystemPrompt.name: lambda: PinnedSystemPrompt(CONTEXT_SYSTEM_PROMPT),
+}
+
+
+class ContextBuilder:
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET, strategy=None,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.budget = budget
+        self.strategy = strategy or STRATEGIES[CONTEXT_STRATEGY]()
+        # Real tokenizers are slow: count each distinct message text once
+        self.count_tokens = lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)(count_tokens or estimate_tokens)
+
+    def build(self, messages: Sequence) -> List[ChatMessage]:
+        """Build the provider message list for a session's stored messages."""
+        return self.strategy.select(iter_recent(messages), self.budget, self.count_tokens)
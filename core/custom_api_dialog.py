@@ -34,6 +34,8 @@ class CustomApiDialog(QDialog):
         layout.addWidget(QLabel("Custom Query Code (must define a 'query(text)' function):"))
         self.code_input = QTextEdit()
         self.code_input.setPlaceholderText(
+            "# Use core.http_client for pooled connections, timeouts and retries\n"
+            "from core.http_client import post\n\n"
             "def query(text):\n    return 'Your response'"
         )
         layout.addWidget(self.code_input)
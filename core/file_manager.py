@@ -1,13 +1,26 @@
 # core/file_manager.py
 
 import json
+import logging
 import os
-from typing import Any, Dict, List
+import threading
+from typing import Any, Dict, List, Optional
+
+from core.config import SESSION_BACKEND, SESSION_WRITE_INTERVAL, ARCHIVE_CODEC, ARCHIVE_IDLE_DAYS, SESSION_SORT
+from core.blob_store import BlobStore
+from core.message import Message, SessionInfo
+from core.session_archive import SessionArchive
+from core.session_journal import JournalSessionStore, SessionJournal
+from core.session_writer import SessionWriter
 
 # Root-relative path to data directory
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
 DATA_DIR = os.path.join(PROJECT_ROOT, "sessions")
 API_PROFILES_FILE = os.path.join(DATA_DIR, "api_profiles.json")
+CACHE_BYPASS_FILE = os.path.join(DATA_DIR, "cache_bypass.json")
+SESSION_DB_FILE = os.path.join(DATA_DIR, "sessions.sqlite3")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+BLOBS_DIR = os.path.join(DATA_DIR, "blobs")
 
 
 def ensure_data_dir():
@@ -21,38 +34,400 @@ def get_session_file_path(mode: str) -> str:
     return os.path.join(DATA_DIR, filename)
 
 
-def save_sessions(mode: str, session_data: Dict[str, Any]) -> None:
-    """Save chat sessions for a given mode."""
-    ensure_data_dir()
-    with open(get_session_file_path(mode), "w", encoding="utf-8") as f:
-        json.dump(session_data, f, indent=2)
+def get_session_journal_path(mode: str) -> str:
+    """Journal file for a mode (e.g., 'AI Chat' -> ai_chat_sessions.journal)."""
+    return os.path.splitext(get_session_file_path(mode))[0] + ".journal"
 
 
-def load_sessions(mode: str) -> Dict[str, Any]:
-    """Load chat sessions for a given mode."""
-    path = get_session_file_path(mode)
-    if os.path.exists(path):
+_store = None
+_store_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+_migrations = set()  # Modes whose store migration has been queued
+_archive = SessionArchive(ARCHIVE_DIR, codec=ARCHIVE_CODEC)
+_blobs = BlobStore(BLOBS_DIR)
+
+
+def _load_legacy_sessions(mode: str) -> Dict[str, Any]:
+    """Existing journal (or older JSON) data for a mode, for the one-time SQLite import."""
+    journal_path = get_session_journal_path(mode)
+    json_path = get_session_file_path(mode)
+    if os.path.exists(journal_path):
+        return SessionJournal(journal_path).load()
+    if os.path.exists(json_path):
         try:
-            with open(path, "r", encoding="utf-8") as f:
+            with open(json_path, "r", encoding="utf-8") as f:
                 return json.load(f)
         except json.JSONDecodeError:
             return {}
     return {}
 
 
+def get_session_store():
+    """The configured session backend (SESSION_BACKEND in core/config.py), opened on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            ensure_data_dir()
+            if SESSION_BACKEND == "sqlite":
+                from core.session_db import SessionDatabase
+                _store = SessionDatabase(SESSION_DB_FILE, legacy_loader=_load_legacy_sessions)
+            else:
+                _store = JournalSessionStore(lambda mode: SessionJournal(
+                    get_session_journal_path(mode), legacy_path=get_session_file_path(mode)
+                ))
+        return _store
+
+
+def get_writer() -> SessionWriter:
+    """Shared background writer; every session change and settings file goes through it."""
+    global _writer
+    store = get_session_store()
+    with _writer_lock:
+        if _writer is None:
+            _writer = SessionWriter(store, interval=SESSION_WRITE_INTERVAL)
+        return _writer
+
+
+def flush_writes() -> None:
+    """Block until all queued writes are on disk (call on exit)."""
+    if _writer is not None:
+        _writer.flush()
+
+
+def _submit(change, mode: str, *sessions: Optional[str]) -> None:
+    """
+    Queue a store change, tagged with the mode and the sessions it touches
+    (None: every session of the mode), so reads only wait for their own.
+    """
+    get_writer().submit(change, [mode] + [(mode, name) for name in sessions])
+
+
+def prepare_sessions(modes) -> None:
+    """
+    Queue the one-time import of older session data (and the journal
+    replay) for `modes` on the writer thread. Reads of a mode wait for it;
+    call this at startup so it is under way before the first read.
+    """
+    for mode in modes:
+        if mode not in _migrations:
+            _migrations.add(mode)
+            _submit(lambda store, mode=mode: store.migrate(mode), mode, None)
+
+
+def _settled_store(mode: str, name: Optional[str] = None):
+    """
+    The session store, once queued changes a read of `mode` (or only of
+    session `name`) would see are written. Other queued writes don't hold
+    the read up.
+    """
+    prepare_sessions([mode])
+    _writer.flush(keys=[mode] if name is None else [(mode, name), (mode, None)])
+    return get_session_store()
+
+
+def _write_json(path: str, data: Any) -> None:
+    get_writer().write_file(path, json.dumps(data, indent=2).encode("utf-8"))
+
+
+def _read_json(path: str, default: Any) -> Any:
+    # A write still in the queue is read from memory rather than waited for
+    pending = _writer.pending_file(path) if _writer is not None else None
+    try:
+        if pending is not None:
+            return json.loads(pending)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    except json.JSONDecodeError:
+        return default
+    return default
+
+
+def save_sessions(mode: str, session_data: Dict[str, Any]) -> None:
+    """Replace all chat sessions for a given mode (prefer the incremental calls below)."""
+    snapshot = {name: list(messages) for name, messages in session_data.items()}
+    _submit(lambda store: store.replace_sessions(mode, snapshot), mode, None)
+
+
+def load_sessions(mode: str) -> Dict[str, Any]:
+    """
+    Load all chat sessions of a mode, with every message (prefer list_sessions
+    + paging). Archived sessions are included without being restored.
+    """
+    sessions = _settled_store(mode).load_sessions(mode)
+    for name in _archive.names(mode):
+        sessions.setdefault(name, _archive.read(mode, name))
+    return sessions
+
+
+def list_sessions(mode: str) -> List[str]:
+    """Session names of a mode, archived ones last, without loading any messages."""
+    names = _settled_store(mode).list_sessions(mode)
+    active = set(names)
+    return names + [name for name in _archive.names(mode) if name not in active]
+
+
+def list_session_info(mode: str, sort: str = SESSION_SORT) -> List[SessionInfo]:
+    """
+    Name, message count, last activity and size of every session of a
+    mode, from the store's metadata (no message is read). `sort` is
+    "recent" (most recently active first) or "created".
+    """
+    infos = _settled_store(mode).session_info(mode)
+    active = {info.name for info in infos}
+    for name in _archive.names(mode):
+        entry = _archive.entry(mode, name)
+        if name not in active and entry is not None:
+            # Archives from before "size" was recorded get it from a background job (None until then)
+            infos.append(SessionInfo(name, entry["count"], entry["updated"], entry.get("size")))
+    if sort == "recent":
+        infos.sort(key=lambda info: info.updated, reverse=True)
+    return infos
+
+
+def list_archived_sessions(mode: str) -> List[str]:
+    return _archive.names(mode)
+
+
+def count_session_messages(mode: str, name: str) -> int:
+    store = _settled_store(mode, name)
+    entry = _archive.entry(mode, name)
+    if entry is None:
+        count = store.count_messages(mode, name)
+        # An idle-archive job may have moved the session out of the store meanwhile
+        entry = None if count else _archive.entry(mode, name)
+        if entry is None:
+            return count
+    return entry["count"]
+
+
+def load_session_messages(mode: str, name: str, start: int = 0, end: Optional[int] = None) -> List[Message]:
+    """
+    Messages [start, end) of one session, oldest first. An archived session
+    is read from the archive and restored into the store in the background.
+    """
+    store = _settled_store(mode, name)
+    messages = _archive.read_if_archived(mode, name)
+    if messages is None:
+        page = store.load_messages(mode, name, start, end)
+        # An idle-archive job may have moved the session out of the store meanwhile
+        messages = None if page else _archive.read_if_archived(mode, name)
+        if messages is None:
+            return page
+    _submit(lambda store: _archive.restore(store, mode, name), mode, name)
+    return messages[start:end]
+
+
+def iter_session_messages(mode: str, name: str, page_size: int = 1000):
+    """Stream one session's messages, oldest first, a page at a time (archived ones are not restored)."""
+    store = _settled_store(mode, name)
+    if _archive.is_archived(mode, name):
+        yield from _archive.read(mode, name)
+        return
+    start = 0
+    while True:
+        page = store.load_messages(mode, name, start, start + page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+def archive_idle_sessions(mode: str, idle_days: float = ARCHIVE_IDLE_DAYS, keep=()) -> None:
+    """
+    Compress sessions idle for more than `idle_days` into the archive, in
+    the background: one low-priority writer job per session, so neither
+    reads nor other writes wait for the pass. Sessions in `keep` (e.g.
+    open in the window) stay put.
+    """
+    if idle_days <= 0:
+        return
+    keep = set(keep)
+    idle_seconds = idle_days * 86400
+    writer = get_writer()
+
+    def schedule(store):
+        # Archived sessions missing from the search index or their text size (archived before those existed)
+        indexed = store.archived_sessions_indexed(mode)
+        unindexed = set() if indexed is None else set(_archive.names(mode)) - set(indexed)
+        for name in unindexed:
+            writer.submit_background(lambda store, name=name: _archive.index(store, mode, name))
+        for name in set(_archive.unmeasured(mode)) - unindexed:
+            writer.submit_background(lambda store, name=name: _archive.measure(mode, name))
+        for name in _archive.idle_sessions(store, mode, idle_seconds, keep):
+            writer.submit_background(lambda store, name=name: _archive.archive_if_idle(store, mode, name, idle_seconds))
+    writer.submit_background(schedule)
+
+
+def search_messages(mode: str, query: str, limit: int = 50) -> List[tuple]:
+    """
+    Ranked (session, message index, snippet HTML) hits for `query` across
+    a mode's history; hits in archived sessions come after the others.
+    """
+    store = _settled_store(mode)
+    hits = store.search(mode, query, limit)
+    if len(hits) < limit and _archive.names(mode):
+        hits += _search_archive(store, mode, query, limit - len(hits))
+    return hits
+
+
+def _search_archive(store, mode: str, query: str, limit: int) -> List[tuple]:
+    """Hits in archived sessions: found through the store's index, or by scanning the archive without one."""
+    from core.session_db import make_word_snippet
+
+    archived = {}  # name -> messages, each session decompressed once
+
+    def messages_of(name):
+        if name not in archived:
+            archived[name] = _archive.read(mode, name)
+        return archived[name]
+
+    found = store.search_archived(mode, query, limit)
+    if found is None:
+        needle = query.strip().lower()
+        found = []
+        for name in _archive.names(mode) if needle else ():
+            found += [(name, index) for index, m in enumerate(messages_of(name)) if needle in m.text.lower()]
+            if len(found) >= limit:
+                break
+    hits = []
+    for name, index in found[:limit]:
+        messages = messages_of(name)
+        if index < len(messages):
+            hits.append((name, index, make_word_snippet(messages[index].text, query)))
+    return hits
+
+
+def create_session(mode: str, name: str) -> None:
+    """Record a new, empty session (written in the background)."""
+    _submit(lambda store: store.create_session(mode, name), mode, name)
+
+
+def append_message(mode: str, session: str, message) -> None:
+    """Record one Message (or legacy (text, is_user, sender) tuple) appended to a session, in the background."""
+    def change(store):
+        _archive.restore(store, mode, session)
+        store.append_message(mode, session, message)
+    _submit(change, mode, session)
+
+
+def import_messages(mode: str, items, report=None) -> None:
+    """
+    Append (session, Message) pairs in one background batch, restoring
+    archived sessions first. Messages whose id the session already holds
+    are skipped, so importing the same export twice changes nothing.
+    `report(imported, skipped)` is called from the writer thread when done.
+    """
+    by_session = {}
+    for session, message in items:
+        by_session.setdefault(session, []).append(message)
+
+    def change(store):
+        imported = skipped = 0
+        for session, messages in by_session.items():
+            _archive.restore(store, mode, session)
+            known = store.message_ids(mode, session)
+            fresh = []
+            for message in messages:
+                if message.id in known:
+                    skipped += 1
+                else:
+                    known.add(message.id)
+                    fresh.append(message)
+            if fresh:
+                store.append_messages(mode, session, fresh)
+                _blobs.retain(path for message in fresh for path in message.attachments)
+            imported += len(fresh)
+        if report is not None:
+            report(imported, skipped)
+    _submit(change, mode, *by_session)
+
+
+def rename_session(mode: str, old_name: str, new_name: str) -> None:
+    def change(store):
+        _archive.restore(store, mode, old_name)
+        store.rename_session(mode, old_name, new_name)
+    _submit(change, mode, old_name, new_name)
+
+
+def delete_session(mode: str, name: str) -> None:
+    def change(store):
+        if _archive.is_archived(mode, name):
+            messages = _archive.discard(store, mode, name)
+        else:
+            messages = store.load_messages(mode, name)
+        store.delete_session(mode, name)
+        # The chat's attachments go with it, unless another message still refers to them
+        _blobs.release(path for message in messages for path in message.attachments)
+    _submit(change, mode, name)
+
+
+def ingest_attachment(path: str) -> str:
+    """Copy a file into the blob store and return the reference to put in the message."""
+    return _blobs.ingest(path)
+
+
+def ingest_attachments(paths: List[str]) -> List[str]:
+    """
+    Ingest several files (slow for large ones; call off the GUI thread).
+    A file that can't be copied in is referenced by its plain path.
+    """
+    refs = []
+    for path in paths:
+        try:
+            refs.append(_blobs.ingest(path))
+        except OSError as e:
+            logging.error("Could not store attachment %s: %s", path, e)
+            refs.append(path)
+    return refs
+
+
+def release_attachments(refs: List[str]) -> None:
+    """Give back references taken by ingest_attachments for a message that was never saved (in the background)."""
+    if refs:
+        get_writer().submit(lambda store: _blobs.release(refs))
+
+
+def attachment_path(ref: str) -> str:
+    """File on disk for an attachment reference (blob ref or, for older messages, a plain path)."""
+    return _blobs.path(ref)
+
+
+def attachment_open_path(ref: str) -> str:
+    """Like attachment_path, but named with the original extension so other programs can open it."""
+    try:
+        return _blobs.open_path(ref)
+    except OSError as e:
+        logging.error("Could not prepare %s for opening: %s", ref, e)
+        return _blobs.path(ref)
+
+
+def attachment_cache_path(ref: str, kind: str) -> Optional[str]:
+    """Cache file for a derived artifact of an attachment (thumbnail etc.); None if it can't be cached."""
+    return _blobs.derived_path(ref, kind)
+
+
+def attachment_text(ref: str) -> Optional[str]:
+    """Extracted text of a text-like attachment (cached next to the blob)."""
+    return _blobs.extracted_text(ref)
+
+
 def save_api_profiles(profiles: List[str]) -> None:
     """Save a list of custom API profile names."""
-    ensure_data_dir()
-    with open(API_PROFILES_FILE, "w", encoding="utf-8") as f:
-        json.dump(profiles, f, indent=2)
+    _write_json(API_PROFILES_FILE, list(profiles))
 
 
 def load_api_profiles() -> List[str]:
     """Load saved API profile names."""
-    if os.path.exists(API_PROFILES_FILE):
-        try:
-            with open(API_PROFILES_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
-    return []
+    return _read_json(API_PROFILES_FILE, [])
+
+
+def save_cache_bypass(profiles: List[str]) -> None:
+    """Save the API profile names excluded from the response cache."""
+    _write_json(CACHE_BYPASS_FILE, list(profiles))
+
+
+def load_cache_bypass() -> List[str]:
+    """Load the API profile names excluded from the response cache."""
+    return _read_json(CACHE_BYPASS_FILE, [])
@@ -0,0 +1,159 @@
+# core/http_client.py
+
+"""
+Shared HTTP client layer.
+
+Keeps one pooled keep-alive `requests.Session` per provider host, with
+connect/read timeouts and retries (jittered exponential backoff) on
+429 and 5xx responses. Custom `foxchat.apis.*` modules can borrow the
+same pool:
+
+    from core.http_client import post
+
+    def query(text):
+        return post("https://example.com/v1/chat", json={...}).json()["reply"]
+"""
+
+import os
+import threading
+from urllib.parse import urlsplit
+
+# requests/urllib3 are imported on first use to keep them off the startup path
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Defaults: setting -> (environment variable, type, default value).
+# Environment is read lazily so values from .env are picked up.
+_DEFAULTS = {
+    "connect_timeout": ("FOXCHAT_HTTP_CONNECT_TIMEOUT", float, 10.0),
+    "read_timeout": ("FOXCHAT_HTTP_READ_TIMEOUT", float, 120.0),
+    "max_retries": ("FOXCHAT_HTTP_MAX_RETRIES", int, 3),
+    "backoff_factor": ("FOXCHAT_HTTP_BACKOFF_FACTOR", float, 0.5),
+    "backoff_jitter": ("FOXCHAT_HTTP_BACKOFF_JITTER", float, 0.5),
+    "pool_size": ("FOXCHAT_HTTP_POOL_SIZE", int, 10),
+}
+_overrides = {}
+
+_sessions = {}  # host -> requests.Session
+_lock = threading.Lock()
+_rate_limit_listeners = []  # callables(url, retry_after_seconds_or_None)
+
+
+def configure(**settings) -> None:
+    """
+    Update client settings (connect_timeout, read_timeout, max_retries,
+    backoff_factor, backoff_jitter, pool_size). Existing sessions are
+    closed so the next request picks up the new values.
+    """
+    unknown = set(settings) - set(_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown HTTP client setting(s): {', '.join(sorted(unknown))}")
+    _overrides.update(settings)
+    close_all()
+
+
+def get_setting(name: str):
+    if name in _overrides:
+        return _overrides[name]
+    env_var, cast, default = _DEFAULTS[name]
+    value = os.getenv(env_var)
+    return cast(value) if value else default
+
+
+def default_timeout() -> tuple:
+    """(connect, read) timeout tuple used when a call does not pass one."""
+    return get_setting("connect_timeout"), get_setting("read_timeout")
+
+
+def _build_retry():
+    from urllib3.util.retry import Retry
+
+    retries = get_setting("max_retries")
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=0,  # A request that reached the provider may already be billed; don't resend it
+        status=retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=None,  # Provider APIs are POST-only, so retry every method
+        backoff_factor=get_setting("backoff_factor"),
+        backoff_jitter=get_setting("backoff_jitter"),  # urllib3 >= 2 (see requirements.txt)
+        respect_retry_after_header=True,
+        raise_on_status=False,  # Hand the final 429/5xx back so raise_for_status() reports it
+    )
+
+
+def _build_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=get_setting("pool_size"),
+        max_retries=_build_retry(),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url: str) -> "requests.Session":
+    """Return the pooled session for the host of `url` (or a bare host name)."""
+    host = urlsplit(url).netloc or url
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = _sessions[host] = _build_session()
+        return session
+
+
+def add_rate_limit_listener(callback) -> None:
+    """
+    Register `callback(url, retry_after)` to be told when a provider
+    answered 429, including 429s that were retried transparently.
+    """
+    _rate_limit_listeners.append(callback)
+
+
+def _parse_retry_after(value):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None  # HTTP-date form; let the listener use its default pause
+
+
+def _notify_rate_limited(url: str, response: "requests.Response") -> None:
+    retries = getattr(response.raw, "retries", None)
+    history = retries.history if retries is not None else ()
+    if response.status_code != 429 and not any(h.status == 429 for h in history):
+        return
+    retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+    for callback in list(_rate_limit_listeners):
+        callback(url, retry_after)
+
+
+def request(method: str, url: str, **kwargs) -> "requests.Response":
+    """Like `requests.request`, but pooled and with a default timeout."""
+    kwargs.setdefault("timeout", default_timeout())
+    response = get_session(url).request(method, url, **kwargs)
+    if _rate_limit_listeners:
+        _notify_rate_limited(url, response)
+    return response
+
+
+def post(url: str, **kwargs) -> "requests.Response":
+    return request("POST", url, **kwargs)
+
+
+def get(url: str, **kwargs) -> "requests.Response":
+    return request("GET", url, **kwargs)
+
+
+def close_all() -> None:
+    """Close every pooled session (e.g. on shutdown)."""
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
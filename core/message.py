@@ -0,0 +1,126 @@
+# core/message.py
+
+"""
+Compact chat message model.
+
+A Message replaces the old (msg, is_user, sender) tuples. It still
+unpacks and indexes like that 3-tuple, so existing code keeps working,
+but it also carries a stable id and a timestamp. The body and the
+`[Uploaded File: ...]` attachments are parsed from the text when asked
+for rather than stored. Sender names are interned, so thousands of
+"You"/"deepseek" messages share a single string.
+
+On disk a message is the old 3-item list extended to
+[text, is_user, sender, id, timestamp]; plain 3-item lists still load,
+with an id derived from their content and position in the session so
+it is the same on every load.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from typing import NamedTuple, Optional, Tuple
+
+ATTACHMENT_PREFIX = "[Uploaded File: "
+
+_id_lock = threading.Lock()
+_last_id = 0
+
+
+def new_message_id() -> int:
+    """Unique, time-ordered id: microseconds since the epoch, bumped on collision."""
+    global _last_id
+    with _id_lock:
+        _last_id = max(time.time_ns() // 1000, _last_id + 1)
+        return _last_id
+
+
+def legacy_message_id(position: int, text: str, is_user: bool, sender: Optional[str]) -> int:
+    """
+    Id for a message stored before messages had ids, from its position in
+    its session and its content. Below 2**50, i.e. before any time-based id.
+    """
+    material = json.dumps([position, text, bool(is_user), sender], ensure_ascii=False)
+    digest = hashlib.blake2b(material.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 14
+
+
+def attachment_line(path: str) -> str:
+    return f"{ATTACHMENT_PREFIX}{path}]"
+
+
+def parse_attachments(text: str) -> Tuple[str, Tuple[str, ...]]:
+    """Split message text into (body without attachment lines, attachment paths)."""
+    if ATTACHMENT_PREFIX not in text:
+        return text.strip(), ()
+    body_lines, paths = [], []
+    for line in text.strip().splitlines():
+        if line.startswith(ATTACHMENT_PREFIX) and line.endswith("]"):
+            paths.append(line[len(ATTACHMENT_PREFIX):-1])
+        else:
+            body_lines.append(line)
+    return "\n".join(body_lines), tuple(paths)
+
+
+class SessionInfo(NamedTuple):
+    """Sidebar metadata of a session: read without touching its messages."""
+    name: str
+    count: int
+    updated: float  # Last activity (epoch seconds, 0 if unknown)
+    bytes: Optional[int]  # UTF-8 size of the message texts (None: not known yet)
+
+
+class Message:
+    __slots__ = ("text", "is_user", "sender", "id", "timestamp")
+
+    def __init__(self, text: str, is_user: bool, sender: Optional[str] = None,
+                 id: Optional[int] = None, timestamp: Optional[float] = None):
+        self.text = text
+        self.is_user = bool(is_user)
+        self.sender = sys.intern(sender) if sender else sender
+        self.id = id if id is not None else new_message_id()
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @property
+    def body(self) -> str:
+        """Text without the attachment lines."""
+        return parse_attachments(self.text)[0]
+
+    @property
+    def attachments(self) -> Tuple[str, ...]:
+        """Attachment references, in order."""
+        return parse_attachments(self.text)[1]
+
+    # --- (msg, is_user, sender) compatibility ---
+    def __iter__(self):
+        return iter((self.text, self.is_user, self.sender))
+
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, index):
+        return (self.text, self.is_user, self.sender)[index]
+
+    def __repr__(self):
+        return f"Message({self.text[:40]!r}, is_user={self.is_user}, sender={self.sender!r}, id={self.id})"
+
+    # --- On-disk encoding ---
+    def encode(self) -> list:
+        return [self.text, self.is_user, self.sender, self.id, self.timestamp]
+
+    @classmethod
+    def decode(cls, item, position: Optional[int] = None) -> "Message":
+        """
+        Build a Message from a Message, a 5-item encoding or a legacy 3-item
+        list/tuple. Pass the entry's `position` in its session so a legacy
+        entry gets the same id every time; without it, it gets a new one.
+        """
+        if isinstance(item, cls):
+            return item
+        if len(item) >= 5:
+            return cls(item[0], item[1], item[2], id=item[3], timestamp=item[4])
+        message_id = None if position is None else legacy_message_id(position, item[0], item[1], item[2])
+        # Legacy entries carry no time; 0 sorts them before anything timestamped
+        return cls(item[0], item[1], item[2], id=message_id, timestamp=0.0)
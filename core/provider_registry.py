@@ -0,0 +1,187 @@
+# core/provider_registry.py
+
+"""
+Provider registry.
+
+Maps API profile names to their resolved `query`/`stream` callables so a
+dispatch is a dict lookup instead of an import per message. Custom
+modules in apis/ are imported lazily on first use and reloaded only when
+their file's mtime changes, so edits take effect without a restart.
+
+A module's `query(text)` (and optional `stream(text)`) may also accept a
+`messages` keyword to receive the conversation history.
+"""
+
+import importlib
+import importlib.util
+import inspect
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+APIS_DIR = os.path.join(PROJECT_ROOT, "apis")
+PACKAGE_PREFIX = "foxchat.apis"
+
+# How often (seconds) a provider's file is re-stat'ed for changes
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+def normalize_name(name: str) -> str:
+    return name.strip().lower().replace(" ", "_")
+
+
+def _accepts_messages(func: Callable) -> bool:
+    """True if `func` takes a `messages` argument (conversation history)."""
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+    return "messages" in params or any(
+        p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()
+    )
+
+
+class ProviderNotFoundError(LookupError):
+    """No module exists for the requested profile."""
+
+
+class ProviderError(Exception):
+    """The provider module loaded but does not implement the provider interface."""
+
+
+class Provider:
+    """A resolved provider: its callables plus what is needed to detect changes."""
+
+    __slots__ = ("name", "module_name", "query", "stream", "model", "accepts_messages",
+                 "path", "mtime", "checked_at")
+
+    def __init__(self, name: str, module_name: str, query: Callable, stream: Optional[Callable] = None,
+                 model: Optional[str] = None, path: Optional[str] = None, mtime: Optional[float] = None,
+                 accepts_messages: Optional[bool] = None):
+        self.name = name
+        self.module_name = module_name
+        self.query = query
+        self.stream = stream
+        self.model = model or module_name
+        if accepts_messages is None:
+            accepts_messages = _accepts_messages(query) and (stream is None or _accepts_messages(stream))
+        self.accepts_messages = accepts_messages
+        self.path = path
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+
+
+class ProviderRegistry:
+    def __init__(self, apis_dir: str = APIS_DIR):
+        self.apis_dir = apis_dir
+        self._providers: Dict[str, Provider] = {}  # profile key -> Provider
+        self._builtins: Dict[str, Provider] = {}
+        self._lock = threading.Lock()
+
+    # ------------------- Registration ------------------- #
+    def register_builtin(self, name: str, query: Callable, stream: Optional[Callable] = None,
+                         model: Optional[str] = None, accepts_messages: Optional[bool] = None) -> None:
+        """Register an in-process provider (never reloaded)."""
+        key = name.strip().lower()
+        self._builtins[key] = Provider(name, key, query, stream, model,
+                                       accepts_messages=accepts_messages)
+
+    def discover(self) -> None:
+        """Import every module in the APIs directory up front (broken ones are skipped)."""
+        if not os.path.isdir(self.apis_dir):
+            return
+        for filename in sorted(os.listdir(self.apis_dir)):
+            if filename.endswith(".py") and not filename.startswith("_"):
+                try:
+                    self.resolve(filename[:-3])
+                except Exception:
+                    continue
+
+    def invalidate(self, profile_name: Optional[str] = None) -> None:
+        """Forget a resolved provider (or all of them) so the next call re-imports it."""
+        with self._lock:
+            if profile_name is None:
+                self._providers.clear()
+            else:
+                self._providers.pop(profile_name.strip().lower(), None)
+
+    # ------------------- Lookup ------------------- #
+    def resolve(self, profile_name: str) -> Provider:
+        key = profile_name.strip().lower()
+        builtin = self._builtins.get(key)
+        if builtin is not None:
+            return builtin
+
+        with self._lock:
+            provider = self._providers.get(key)
+            if provider is not None and not self._is_stale(provider):
+                return provider
+            provider = self._load(profile_name)
+            self._providers[key] = provider
+            return provider
+
+    def _is_stale(self, provider: Provider) -> bool:
+        if provider.path is None:
+            return False
+        now = time.monotonic()
+        if now - provider.checked_at < RELOAD_CHECK_INTERVAL:
+            return False
+        provider.checked_at = now
+        try:
+            return os.stat(provider.path).st_mtime != provider.mtime
+        except OSError:
+            return True  # File removed: reload to surface "not found"
+
+    def _load(self, profile_name: str) -> Provider:
+        module_name = normalize_name(profile_name)
+        qualified_name = f"{PACKAGE_PREFIX}.{module_name}"
+        path = os.path.join(self.apis_dir, f"{module_name}.py")
+
+        if os.path.isfile(path):
+            mtime = os.stat(path).st_mtime
+            module = self._exec_file(qualified_name, path)
+        else:
+            # Not in apis/: fall back to an installed foxchat.apis package
+            mtime = None
+            stale = sys.modules.get(qualified_name)
+            if stale is not None and getattr(stale, "__file__", None) == path:
+                del sys.modules[qualified_name]  # Loaded from the removed file, not installed
+            path = None
+            try:
+                module = importlib.import_module(qualified_name)
+            except ModuleNotFoundError as e:
+                raise ProviderNotFoundError(f"API module not found: '{qualified_name}'") from e
+
+        query_func = getattr(module, "query", None)
+        if not callable(query_func):
+            raise ProviderError(f"API module '{module_name}' does not implement a callable `query(text)`.")
+        stream_func = getattr(module, "stream", None)
+
+        return Provider(
+            profile_name, module_name, query_func,
+            stream_func if callable(stream_func) else None,
+            str(getattr(module, "MODEL", module_name)),
+            path, mtime,
+        )
+
+    @staticmethod
+    def _exec_file(qualified_name: str, path: str):
+        """Execute a module from its file, replacing any previously loaded version."""
+        spec = importlib.util.spec_from_file_location(qualified_name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[qualified_name] = module
+        return module
+
+
+_default_registry = None
+
+
+def get_registry() -> ProviderRegistry:
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ProviderRegistry()
+    return _default_registry
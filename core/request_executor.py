@@ -0,0 +1,227 @@
+# core/request_executor.py
+
+"""
+Background request executor.
+
+Runs provider queries on a QThreadPool so the Qt event loop keeps
+repainting while a request is in flight. Streamed chunks and final
+replies come back through Qt signals, delivered on the GUI thread.
+
+Each request first probes the response cache on a worker. On a miss it
+is queued in the shared RequestScheduler (rate limits, concurrency cap,
+priorities) and runs on the pool again once the scheduler admits it.
+"""
+
+import itertools
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+
+from core.api_manager import ErrorChunk, cache_reply, get_cached_reply, stream_api
+from core.scheduler import INTERACTIVE, get_scheduler
+
+# How often queued requests report their queue position (ms)
+QUEUE_STATUS_INTERVAL_MS = 500
+
+
+class _RequestSignals(QObject):
+    """Signal carrier for worker tasks (QRunnable is not a QObject)."""
+    queued = pyqtSignal(int)
+    started = pyqtSignal(int)
+    chunk = pyqtSignal(int, str)
+    finished = pyqtSignal(int, str, bool)
+
+
+class _RequestTask(QRunnable):
+    def __init__(self, request_id: int, text: str, profile_name: str, signals: _RequestSignals,
+                 pool: QThreadPool, messages=None, priority: int = INTERACTIVE):
+        super().__init__()
+        self.request_id = request_id
+        self.text = text
+        self.profile_name = profile_name
+        self.messages = messages
+        self.priority = priority
+        self.signals = signals
+        self.pool = pool
+        self.ticket = None  # Scheduler ticket, set once the cache probe missed
+        self.cancelled = False
+        self.setAutoDelete(False)  # The task runs twice and may be taken back from the pool
+
+    def run(self):
+        if self.ticket is None:
+            self._probe_cache()
+        else:
+            with self.ticket.running():
+                self._query()
+
+    def _probe_cache(self):
+        """First run: answer from the cache, or queue the real request in the scheduler."""
+        cached = get_cached_reply(self.text, self.profile_name, self.messages)
+        if cached is not None:
+            self.signals.finished.emit(self.request_id, cached, True)
+            return
+        if self.cancelled:
+            return
+        self.ticket = get_scheduler().submit(self.profile_name, self._admit, self.priority)
+        self.signals.queued.emit(self.request_id)
+
+    def _admit(self, ticket):
+        """Scheduler job. It can run before submit() returns, so it sets the ticket itself."""
+        self.ticket = ticket
+        self.pool.start(self)
+
+    def _query(self):
+        """Second run, admitted by the scheduler: stream the reply."""
+        if self.cancelled:
+            return
+        self.signals.started.emit(self.request_id)
+        chunks = []
+        failed = False
+        stream = stream_api(self.text, self.profile_name, self.messages)
+        try:
+            for chunk in stream:
+                if self.cancelled:
+                    break
+                failed = failed or isinstance(chunk, ErrorChunk)
+                chunks.append(chunk)
+                self.signals.chunk.emit(self.request_id, chunk)
+        except Exception as e:
+            failed = True
+            chunks.append(f"❌ Error while querying '{self.profile_name}': {e}")
+        finally:
+            stream.close()  # Releases the underlying HTTP response on early exit
+
+        reply = "".join(chunks)
+        # Only complete replies are cached: not failed, cancelled or cut-short streams
+        if not (failed or self.cancelled):
+            cache_reply(self.text, self.profile_name, reply, self.messages)
+        self.signals.finished.emit(self.request_id, reply, False)
+
+
+class RequestExecutor(QObject):
+    """
+    Dispatches provider queries (via `stream_api`) to worker threads.
+
+    Signals:
+        chunk_received(request_id, chunk): a streamed piece of a reply arrived.
+        request_queued(request_id, ahead): the request is waiting in the scheduler
+            with `ahead` requests in front of it (re-emitted while it waits).
+        request_started(request_id): the provider call has started.
+        reply_ready(request_id, reply, cached): a request completed with its full reply;
+            `cached` is True when it came from the response cache.
+        request_cancelled(request_id, reason): a request was dropped before its reply
+            was delivered; reason is "cancelled", "timeout" or "budget".
+    """
+
+    request_queued = pyqtSignal(int, int)
+    request_started = pyqtSignal(int)
+    chunk_received = pyqtSignal(int, str)
+    reply_ready = pyqtSignal(int, str, bool)
+    request_cancelled = pyqtSignal(int, str)
+
+    def __init__(self, max_workers: int = 8, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+
+        self._ids = itertools.count(1)
+        self._pending = {}  # request_id -> _RequestTask
+
+        self._signals = _RequestSignals(self)
+        self._signals.queued.connect(self._report_queue_positions)
+        self._signals.started.connect(self._on_started)
+        self._signals.chunk.connect(self._on_chunk)
+        self._signals.finished.connect(self._on_finished)
+
+        self._queue_timer = QTimer(self)
+        self._queue_timer.setInterval(QUEUE_STATUS_INTERVAL_MS)
+        self._queue_timer.timeout.connect(self._report_queue_positions)
+
+    def submit(self, text: str, profile_name: str, timeout: float = None, messages=None,
+               priority: int = INTERACTIVE) -> int:
+        """
+        Queue a query and return its request id.
+        `messages` is the conversation history to send (see core.context_builder).
+        With `timeout` (seconds) the request is cancelled if it has not completed by then.
+        `priority` is a core.scheduler priority (INTERACTIVE, BACKGROUND or BATCH).
+        """
+        request_id = next(self._ids)
+        task = _RequestTask(request_id, text, profile_name, self._signals, self.pool,
+                            messages, priority)
+        self._pending[request_id] = task
+        self.pool.start(task)
+        if timeout:
+            QTimer.singleShot(int(timeout * 1000), lambda: self.cancel(request_id, "timeout"))
+        return request_id
+
+    def submit_fanout(self, text: str, profile_names, timeout: float = None,
+                      budget: float = None, messages=None) -> list:
+        """
+        Send the same query to several providers concurrently.
+        `timeout` applies to each provider; `budget` is the wall-clock limit
+        for the whole group, after which unfinished requests are cancelled.
+        Returns the request ids in the order of `profile_names`.
+        """
+        request_ids = [self.submit(text, name, timeout, messages) for name in profile_names]
+        if budget:
+            QTimer.singleShot(int(budget * 1000), lambda: self._expire(request_ids, "budget"))
+        return request_ids
+
+    def _expire(self, request_ids, reason):
+        for request_id in request_ids:
+            self.cancel(request_id, reason)
+
+    def cancel(self, request_id: int, reason: str = "cancelled") -> None:
+        """
+        Cancel a request. A request still queued is removed from the pool;
+        one already streaming stops at its next chunk and its reply is discarded.
+        """
+        task = self._pending.pop(request_id, None)
+        if task is None:
+            return
+        task.cancelled = True
+        ticket = task.ticket
+        if ticket is not None and not get_scheduler().cancel(ticket):
+            # Already admitted: if it never got to run, give its slot back
+            if self.pool.tryTake(task):
+                get_scheduler().release(ticket)
+        else:
+            self.pool.tryTake(task)
+        self.request_cancelled.emit(request_id, reason)
+
+    def cancel_all(self) -> None:
+        for request_id in list(self._pending):
+            self.cancel(request_id)
+
+    def is_pending(self, request_id: int) -> bool:
+        return request_id in self._pending
+
+    def queue_position(self, request_id: int) -> int:
+        """Requests ahead of this one in the scheduler (0 once started or when unknown)."""
+        task = self._pending.get(request_id)
+        if task is None or task.ticket is None:
+            return 0
+        return get_scheduler().queue_position(task.ticket)
+
+    def _report_queue_positions(self, *_):
+        waiting = False
+        for request_id, task in list(self._pending.items()):
+            if task.ticket is not None and task.ticket.started_at is None:
+                waiting = True
+                self.request_queued.emit(request_id, get_scheduler().queue_position(task.ticket))
+        if waiting and not self._queue_timer.isActive():
+            self._queue_timer.start()
+        elif not waiting:
+            self._queue_timer.stop()
+
+    def _on_started(self, request_id: int):
+        if request_id in self._pending:
+            self.request_started.emit(request_id)
+
+    def _on_chunk(self, request_id: int, chunk: str):
+        if request_id in self._pending:
+            self.chunk_received.emit(request_id, chunk)
+
+    def _on_finished(self, request_id: int, reply: str, cached: bool):
+        if self._pending.pop(request_id, None) is None:
+            return  # Cancelled while running
+        self.reply_ready.emit(request_id, reply, cached)
@@ -0,0 +1,200 @@
+# core/response_cache.py
+
+"""
+Opt-in, content-addressed cache for provider replies.
+
+Entries are keyed by a hash of (profile, model, normalized prompt or
+message history). A small in-memory LRU sits in front of a bounded
+SQLite table under sessions/. Entries expire after a TTL, and the
+oldest ones are evicted once the table grows past its size limit.
+
+Enable it with FOXCHAT_RESPONSE_CACHE=1 in .env; individual profiles
+can be excluded from the API list context menu.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from core.file_manager import DATA_DIR, ensure_data_dir, load_cache_bypass, save_cache_bypass
+
+CACHE_DB_FILE = os.path.join(DATA_DIR, "response_cache.sqlite3")
+
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_MAX_DISK_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def cache_enabled() -> bool:
+    """The cache is opt-in via FOXCHAT_RESPONSE_CACHE (read lazily so .env applies)."""
+    return os.getenv("FOXCHAT_RESPONSE_CACHE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+_bypassed_profiles = None  # Loaded from disk on first use
+
+
+def is_bypassed(profile_name: str) -> bool:
+    global _bypassed_profiles
+    if _bypassed_profiles is None:
+        _bypassed_profiles = {name.strip().lower() for name in load_cache_bypass()}
+    return profile_name.strip().lower() in _bypassed_profiles
+
+
+def set_bypassed(profile_name: str, bypassed: bool) -> None:
+    """Exclude (or re-include) a profile from the cache and persist the choice."""
+    is_bypassed(profile_name)  # Make sure the saved set is loaded
+    key = profile_name.strip().lower()
+    if bypassed:
+        _bypassed_profiles.add(key)
+    else:
+        _bypassed_profiles.discard(key)
+    save_cache_bypass(sorted(_bypassed_profiles))
+
+
+def cache_allowed_for(profile_name: str) -> bool:
+    """True when the cache is enabled and the profile is not bypassed."""
+    return cache_enabled() and not is_bypassed(profile_name)
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize line endings and surrounding/trailing whitespace, keeping inner layout."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def make_key(profile_name: str, model: str, content) -> str:
+    """
+    Build a cache key. `content` is either a prompt string or a list of
+    {"role", "content"} message dicts.
+    """
+    if isinstance(content, str):
+        normalized = normalize_prompt(content)
+    else:
+        normalized = [
+            {"role": m["role"], "content": normalize_prompt(m["content"])} for m in content
+        ]
+    material = json.dumps(
+        [profile_name.strip().lower(), model, normalized],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) reply cache. Safe to use from worker threads."""
+
+    def __init__(self, path: str = CACHE_DB_FILE,
+                 memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 max_disk_entries: int = DEFAULT_MAX_DISK_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()  # key -> (reply, created_at)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes_since_evict = 0
+
+    # ------------------- Public API ------------------- #
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                reply, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return reply
+                del self._memory[key]
+
+            row = self._db().execute(
+                "SELECT reply, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            reply, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._db().execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db().commit()
+                return None
+            self._remember(key, reply, created_at)
+            return reply
+
+    def put(self, key: str, profile_name: str, reply: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, reply, now)
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, profile, reply, created_at) VALUES (?, ?, ?, ?)",
+                (key, profile_name, reply, now)
+            )
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 50:
+                self._evict(now)
+            db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._db().execute("DELETE FROM responses")
+            self._db().commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------- Internals ------------------- #
+    def _remember(self, key, reply, created_at):
+        self._memory[key] = (reply, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            ensure_data_dir()
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, profile TEXT NOT NULL,"
+                " reply TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_created ON responses(created_at)"
+            )
+            self._evict(time.time())
+            self._conn.commit()
+        return self._conn
+
+    def _evict(self, now):
+        """Drop expired rows, then the oldest rows beyond the size limit."""
+        self._writes_since_evict = 0
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            " SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Shared cache instance, created on first use."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
@@ -0,0 +1,281 @@
+# core/scheduler.py
+
+"""
+Per-provider rate limiting and priority scheduling for provider requests.
+
+Every dispatch goes through a RequestScheduler, which holds it in a
+priority queue until both a concurrency slot and a token from the
+provider's token bucket are available. Interactive messages go ahead of
+background and batch work. A 429 from a provider pauses that provider
+(honouring Retry-After) and halves its rate, which then recovers
+gradually on successful requests.
+
+The scheduler only decides *when* a job starts; the job itself hands the
+work to a thread pool and must release its ticket when done (see
+`Ticket.running()`).
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+from core.config import SCHEDULER_MAX_CONCURRENT, PROVIDER_RATE_LIMITS, DEFAULT_RATE_LIMIT
+
+# Priorities (lower runs first)
+INTERACTIVE = 0
+BACKGROUND = 1
+BATCH = 2
+
+# Pause applied after a 429 without a Retry-After header (seconds)
+DEFAULT_RATE_LIMIT_PAUSE = 10.0
+
+_current = threading.local()  # Ticket being run by this worker thread
+
+
+class TokenBucket:
+    """Token bucket with adaptive rate: halves on 429, recovers on success."""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f"Rate limit needs rate > 0 and burst >= 1, got ({rate}, {burst})")
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def penalize(self, now, retry_after: Optional[float]) -> None:
+        self.blocked_until = max(self.blocked_until, now + (retry_after or DEFAULT_RATE_LIMIT_PAUSE))
+        self.rate = max(self.rate / 2, self.base_rate / 8)
+        self.tokens = 0.0
+
+    def reward(self) -> None:
+        self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1)
+
+
+class Ticket:
+    """A scheduled request. Ordered by (priority, submission order)."""
+
+    __slots__ = ("id", "provider", "priority", "job", "enqueued_at", "started_at",
+                 "cancelled", "rate_limited", "_scheduler")
+
+    def __init__(self, ticket_id, provider, priority, job, scheduler):
+        self.id = ticket_id
+        self.provider = provider
+        self.priority = priority
+        self.job = job
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.cancelled = False
+        self.rate_limited = False
+        self._scheduler = scheduler
+
+    def __lt__(self, other):
+        return (self.priority, self.id) < (other.priority, other.id)
+
+    @property
+    def wait_time(self) -> float:
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    @contextmanager
+    def running(self):
+        """Wrap the actual provider call: frees the slot afterwards and routes 429 reports here."""
+        _current.ticket = self
+        try:
+            yield self
+        finally:
+            _current.ticket = None
+            self._scheduler.release(self)
+
+
+class RequestScheduler:
+    def __init__(self, max_concurrent: int = SCHEDULER_MAX_CONCURRENT,
+                 rate_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+                 default_rate_limit: Tuple[float, int] = DEFAULT_RATE_LIMIT):
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent must be at least 1, got {max_concurrent}")
+        self.max_concurrent = max_concurrent
+        self.rate_limits = {k.lower(): v for k, v in (rate_limits or PROVIDER_RATE_LIMITS).items()}
+        self.default_rate_limit = default_rate_limit
+        TokenBucket(*default_rate_limit)  # Reject a bad default here rather than on the dispatcher thread
+
+        self._queue = []  # heap of Tickets
+        self._buckets: Dict[str, TokenBucket] = {
+            provider: TokenBucket(rate, burst) for provider, (rate, burst) in self.rate_limits.items()
+        }
+        self._running = 0
+        self._ids = itertools.count(1)
+        self._avg_wait = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._dispatch_loop, name="RequestScheduler", daemon=True)
+        self._thread.start()
+
+    # ------------------- Public API ------------------- #
+    def submit(self, provider: str, job: Callable[["Ticket"], None], priority: int = INTERACTIVE) -> Ticket:
+        """
+        Queue `job(ticket)` for `provider`. The job is called from the
+        dispatcher thread and must hand the work off (e.g. to a thread pool)
+        and run it inside `ticket.running()`.
+        """
+        with self._cond:
+            ticket = Ticket(next(self._ids), provider.strip().lower(), priority, job, self)
+            heapq.heappush(self._queue, ticket)
+            self._cond.notify()
+            return ticket
+
+    def set_max_concurrent(self, max_concurrent: int) -> None:
+        """Change the concurrency cap; queued tickets start right away if it grew."""
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent must be at least 1, got {max_concurrent}")
+        with self._cond:
+            self.max_concurrent = max_concurrent
+            self._cond.notify()
+
+    def cancel(self, ticket: Ticket) -> bool:
+        """Remove a ticket that has not started yet. Returns False if it already started."""
+        with self._cond:
+            if ticket.started_at is not None:
+                return False
+            ticket.cancelled = True
+            self._cond.notify()
+            return True
+
+    def release(self, ticket: Ticket) -> None:
+        """Free the concurrency slot of a started ticket (idempotent)."""
+        with self._cond:
+            if ticket.job is None:
+                return
+            ticket.job = None
+            self._running -= 1
+            if not ticket.rate_limited:
+                self._bucket(ticket.provider).reward()
+            self._cond.notify()
+
+    def queue_position(self, ticket: Ticket) -> int:
+        """How many queued tickets are ahead of this one (0 if it has started)."""
+        with self._cond:
+            if ticket.started_at is not None:
+                return 0
+            return sum(1 for t in self._queue if not t.cancelled and t < ticket)
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = [t for t in self._queue if not t.cancelled]
+            now = time.monotonic()
+            return {
+                "queue_depth": len(queued),
+                "running": self._running,
+                "avg_wait": self._avg_wait,
+                "oldest_wait": max((now - t.enqueued_at for t in queued), default=0.0),
+            }
+
+    def report_rate_limited(self, provider: Optional[str] = None, retry_after: Optional[float] = None) -> None:
+        """
+        Feed a provider 429 back into its bucket. Without `provider`, the
+        ticket running on the calling thread is used.
+        """
+        ticket = getattr(_current, "ticket", None)
+        if provider is None:
+            if ticket is None:
+                return
+            provider = ticket.provider
+        with self._cond:
+            if ticket is not None and ticket.provider == provider.lower():
+                ticket.rate_limited = True
+            self._bucket(provider.lower()).penalize(time.monotonic(), retry_after)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    # ------------------- Dispatcher ------------------- #
+    def _bucket(self, provider: str) -> TokenBucket:
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            rate, burst = self.rate_limits.get(provider, self.default_rate_limit)
+            bucket = self._buckets[provider] = TokenBucket(rate, burst)
+        return bucket
+
+    def _next_ready(self, now):
+        """Pop the highest-priority ticket whose provider has a token; else return the shortest wait."""
+        while self._queue and self._queue[0].cancelled:
+            heapq.heappop(self._queue)
+        if self._running >= self.max_concurrent:
+            return None, None  # Woken by release()
+
+        shortest_wait = None
+        blocked = set()
+        for ticket in sorted(self._queue):
+            if ticket.cancelled or ticket.provider in blocked:
+                continue
+            wait = self._bucket(ticket.provider).wait_time(now)
+            if wait <= 0:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                return ticket, None
+            # Keep FIFO order within a provider, but let other providers through
+            blocked.add(ticket.provider)
+            shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+        return None, shortest_wait
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                ticket, wait = self._next_ready(time.monotonic())
+                if ticket is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+                now = time.monotonic()
+                self._bucket(ticket.provider).take(now)
+                ticket.started_at = now
+                self._running += 1
+                self._avg_wait = 0.8 * self._avg_wait + 0.2 * ticket.wait_time
+                job = ticket.job
+            try:
+                job(ticket)
+            except Exception:
+                self.release(ticket)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Shared scheduler, created on first use and wired to HTTP 429 reports."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            from core import http_client
+            _default_scheduler = RequestScheduler()
+            http_client.add_rate_limit_listener(
+                lambda url, retry_after: _default_scheduler.report_rate_limited(retry_after=retry_after)
+            )
+        return _default_scheduler
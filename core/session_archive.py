@@ -0,0 +1,239 @@
+# core/session_archive.py
+
+"""
+Cold storage for idle sessions.
+
+Sessions with no activity for ARCHIVE_IDLE_DAYS are moved out of the
+session store into one compressed blob each under sessions/archive/
+(zstd when the `zstandard` package is installed, otherwise zlib; lzma
+on request). A small index keeps their names, message counts and
+last-activity times, so the sidebar can still list them. Opening an
+archived session reads it from here and restores it into the store in
+the background; renaming or writing to one restores it first.
+
+Archived sessions stay searchable: the store keeps their words in its
+search index (`index_archived`), and snippets are read from here.
+"""
+
+import json
+import logging
+import lzma
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from core.message import Message
+from core.session_writer import atomic_write
+
+MAGIC = b"FXA1"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+# codec name -> (file extension, compress, decompress)
+CODECS = {
+    "zlib": (".zz", lambda data: zlib.compress(data, 6), zlib.decompress),
+    "lzma": (".xz", lambda data: lzma.compress(data, preset=6), lzma.decompress),
+    "zstd": (
+        ".zst",
+        lambda data: _zstd().ZstdCompressor(level=10).compress(data),
+        lambda data: _zstd().ZstdDecompressor().decompress(data),
+    ),
+}
+
+
+def pick_codec(preferred: str = "auto") -> str:
+    """Resolve "auto" (zstd if installed, else zlib) and fall back to zlib if zstd is missing."""
+    if preferred == "auto" or preferred == "zstd":
+        return "zstd" if _zstd() is not None else "zlib"
+    if preferred not in CODECS:
+        raise ValueError(f"Unknown archive codec {preferred!r}")
+    return preferred
+
+
+def encode_blob(messages, codec: str) -> bytes:
+    payload = "\n".join(json.dumps(Message.decode(m).encode(), ensure_ascii=False) for m in messages)
+    name = codec.encode("ascii")
+    return MAGIC + bytes([len(name)]) + name + CODECS[codec][1](payload.encode("utf-8"))
+
+
+def decode_blob(blob: bytes) -> List[Message]:
+    if not blob.startswith(MAGIC):
+        raise ValueError("Not a FoxChat session archive")
+    name_length = blob[len(MAGIC)]
+    start = len(MAGIC) + 1
+    codec = blob[start:start + name_length].decode("ascii")
+    payload = CODECS[codec][2](blob[start + name_length:]).decode("utf-8")
+    return [Message.decode(json.loads(line)) for line in payload.splitlines() if line]
+
+
+class SessionArchive:
+    """
+    Archive directory plus its index.json:
+    {mode: {name: {"file", "count", "updated", "bytes" (compressed), "size" (text)}}}.
+    Methods that touch the store are meant to run on the writer thread;
+    the lock only guards the index, so readers never wait on compression.
+    """
+
+    def __init__(self, directory: str, codec: str = "auto"):
+        self.directory = directory
+        self.codec = codec
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.RLock()
+        self._index: Optional[Dict[str, Dict[str, dict]]] = None
+
+    # ------------------- Index ------------------- #
+    def _entries(self, mode: str) -> Dict[str, dict]:
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {}
+            except json.JSONDecodeError as e:
+                logging.error("Archive index %s is unreadable: %s", self.index_path, e)
+                self._index = {}
+        return self._index.setdefault(mode, {})
+
+    def _save_index(self) -> None:
+        atomic_write(self.index_path, json.dumps(self._index, ensure_ascii=False, indent=1).encode("utf-8"))
+
+    def names(self, mode: str) -> List[str]:
+        with self._lock:
+            return list(self._entries(mode))
+
+    def entry(self, mode: str, name: str) -> Optional[dict]:
+        with self._lock:
+            return self._entries(mode).get(name)
+
+    def is_archived(self, mode: str, name: str) -> bool:
+        return self.entry(mode, name) is not None
+
+    # ------------------- Reading ------------------- #
+    def read_if_archived(self, mode: str, name: str) -> Optional[List[Message]]:
+        """Decompress an archived session without restoring it; None if it is not (or no longer) archived."""
+        entry = self.entry(mode, name)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, entry["file"]), "rb") as f:
+                return decode_blob(f.read())
+        except FileNotFoundError:
+            return None  # Restored meanwhile
+
+    def read(self, mode: str, name: str) -> List[Message]:
+        """Decompress an archived session without restoring it."""
+        return self.read_if_archived(mode, name) or []
+
+    # ------------------- Archiving ------------------- #
+    def archive(self, store, mode: str, name: str, updated: float) -> None:
+        """
+        Compress a session out of `store`, keeping its words in the store's
+        search index. The index is written before the store row is dropped.
+        """
+        messages = store.load_messages(mode, name)
+        codec = pick_codec(self.codec)
+        blob = encode_blob(messages, codec)
+        filename = os.path.join(_slug(mode), f"{int(time.time() * 1000):x}-{_slug(name)[:40]}{CODECS[codec][0]}")
+        atomic_write(os.path.join(self.directory, filename), blob)
+        with self._lock:
+            self._entries(mode)[name] = {
+                "file": filename, "count": len(messages), "updated": updated, "bytes": len(blob),
+                "size": sum(len(m.text.encode("utf-8")) for m in messages),
+            }
+            self._save_index()
+        with store.batch():
+            store.index_archived(mode, name, messages)
+            store.delete_session(mode, name)
+
+    def restore(self, store, mode: str, name: str) -> bool:
+        """Move an archived session back into `store`. Returns False if it was not archived."""
+        entry = self.entry(mode, name)
+        if entry is None:
+            return False
+        messages = self.read(mode, name)
+        with store.batch():
+            store.unindex_archived(mode, name, messages)
+            # A crash between writing the index and dropping the store row leaves both copies
+            if name not in store.list_sessions(mode) or store.count_messages(mode, name) != entry["count"]:
+                store.delete_session(mode, name)
+                store.create_session(mode, name)
+                for message in messages:
+                    store.append_message(mode, name, message)
+        with self._lock:
+            self._drop(mode, name)
+        return True
+
+    def discard(self, store, mode: str, name: str) -> List[Message]:
+        """Forget an archived session (it was deleted). Returns its messages ([] if it was not archived)."""
+        messages = self.read(mode, name)
+        store.unindex_archived(mode, name, messages)
+        with self._lock:
+            if self._entries(mode).get(name) is not None:
+                self._drop(mode, name)
+        return messages
+
+    def index(self, store, mode: str, name: str) -> None:
+        """(Re)build the store's search index for an archived session, e.g. one archived before it had one."""
+        messages = self.read_if_archived(mode, name)
+        if messages is not None:
+            store.index_archived(mode, name, messages)
+            self._record_size(mode, name, messages)
+
+    def unmeasured(self, mode: str) -> List[str]:
+        """Archived sessions whose text size is unknown (archived before it was recorded)."""
+        with self._lock:
+            return [name for name, entry in self._entries(mode).items() if "size" not in entry]
+
+    def measure(self, mode: str, name: str) -> None:
+        """Record the text size of an archived session that lacks it."""
+        messages = self.read_if_archived(mode, name)
+        if messages is not None:
+            self._record_size(mode, name, messages)
+
+    def _record_size(self, mode: str, name: str, messages) -> None:
+        with self._lock:
+            entry = self._entries(mode).get(name)
+            if entry is not None and "size" not in entry:
+                entry["size"] = sum(len(m.text.encode("utf-8")) for m in messages)
+                self._save_index()
+
+    def _drop(self, mode: str, name: str) -> None:
+        entry = self._entries(mode).pop(name)
+        self._save_index()
+        try:
+            os.remove(os.path.join(self.directory, entry["file"]))
+        except FileNotFoundError:
+            pass
+
+    def idle_sessions(self, store, mode: str, idle_seconds: float, keep=()) -> List[str]:
+        """Sessions of `mode` in the store idle for longer than `idle_seconds`, except `keep`."""
+        cutoff = time.time() - idle_seconds
+        return [
+            name for name, updated in store.last_activity(mode).items()
+            if updated and updated < cutoff and name not in keep
+        ]
+
+    def archive_if_idle(self, store, mode: str, name: str, idle_seconds: float) -> bool:
+        """Archive one session if it is still idle (it may have been used since it was picked)."""
+        updated = store.last_activity(mode).get(name)
+        if not updated or updated >= time.time() - idle_seconds or self.is_archived(mode, name):
+            return False
+        try:
+            self.archive(store, mode, name, updated)
+            return True
+        except (OSError, ValueError) as e:
+            logging.error("Archiving session %r failed: %s", name, e)
+            return False
+
+
+def _slug(text: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in text.strip().lower())
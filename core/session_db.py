@@ -0,0 +1,497 @@
+# core/session_db.py
+
+"""
+SQLite session store (sessions/sessions.sqlite3).
+
+Sessions and messages live in two indexed tables, so the sidebar only
+reads session names and a session's messages are read when it is
+opened, one page at a time. The database runs in WAL mode with
+separate read and write connections, so the GUI's reads never wait on
+a commit in progress on the writer thread. `batch()` groups writes into
+one transaction.
+
+Message bodies are also indexed in an FTS5 table kept in step by
+triggers, so `search` ranks hits across all history without scanning
+(it falls back to LIKE if this SQLite build lacks FTS5). Sessions moved
+to the archive (core.session_archive) keep their words in a separate,
+contentless FTS5 table, so `search_archived` still finds them while
+their text lives only in the compressed archive.
+
+Data from the JSON/journal files is imported once per mode by
+`migrate`, which core.file_manager runs on its writer thread before the
+mode is first read; reads only fall back to importing themselves when
+nobody did (e.g. the export/import CLI).
+"""
+
+import html
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from core.message import Message, SessionInfo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (mode, name)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+    uid INTEGER,
+    created_at REAL,
+    is_user INTEGER NOT NULL,
+    sender TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+CREATE INDEX IF NOT EXISTS messages_by_time ON messages (created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS archived_messages (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    session TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS archived_messages_by_session ON archived_messages (mode, session, position);
+"""
+
+# External-content FTS index over messages.body; triggers keep it in step
+# (ON DELETE CASCADE from sessions fires the delete trigger too)
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE messages_fts USING fts5(
+    body, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, body) VALUES (new.id, new.body);
+END;
+CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, body) VALUES ('delete', old.id, old.body);
+END;
+INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');
+"""
+
+# Words of archived messages (rowid = archived_messages.id). Contentless, so
+# deleting a row needs its original text, which the archive still holds.
+ARCHIVE_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS archived_fts USING fts5(
+    body, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Snippet highlight markers, swapped for <b></b> after HTML-escaping
+_HIT_START, _HIT_END = "\x02", "\x03"
+SNIPPET_TOKENS = 12
+
+
+def to_fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight_snippet(snippet: str) -> str:
+    """HTML-escape a snippet and turn the hit markers into bold tags."""
+    return html.escape(snippet).replace(_HIT_START, "<b>").replace(_HIT_END, "</b>")
+
+
+def make_snippet(text: str, query: str, width: int = 80) -> str:
+    """Snippet HTML around the first case-insensitive occurrence of `query` (non-FTS search)."""
+    at = text.lower().find(query.lower())
+    if at < 0:
+        return html.escape(text[:width])
+    start = max(0, at - width // 2)
+    end = min(len(text), at + len(query) + width // 2)
+    snippet = (text[start:at] + _HIT_START + text[at:at + len(query)] + _HIT_END + text[at + len(query):end])
+    return highlight_snippet(("…" if start else "") + snippet + ("…" if end < len(text) else ""))
+
+
+def make_word_snippet(text: str, query: str, width: int = 80) -> str:
+    """Snippet HTML around the first word of `query` found in `text` (FTS hits read from the archive)."""
+    lowered = text.lower()
+    words = [word for word in re.findall(r"\w+", query) if word.lower() in lowered]
+    return make_snippet(text, words[0] if words else query.strip(), width)
+
+
+class SessionDatabase:
+    """
+    All modes share one database. `legacy_loader(mode)` returns the
+    {name: [messages]} data to import the first time a mode is used.
+    """
+
+    def __init__(self, path: str, legacy_loader: Optional[Callable[[str], Dict[str, Any]]] = None):
+        self.path = path
+        self._legacy_loader = legacy_loader
+        self._migrated = set()  # Modes whose import is committed
+        self._migrating = set()  # Modes imported in the open transaction
+        self._write_lock = threading.RLock()
+        self._read_lock = threading.Lock()
+        self._batch_depth = 0
+        self._conn = self._connect()
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+            if "uid" not in columns:  # Databases created before messages had ids
+                self._conn.execute("ALTER TABLE messages ADD COLUMN uid INTEGER")
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+            if "bytes" not in columns:  # Databases created before the size column
+                self._conn.execute("ALTER TABLE sessions ADD COLUMN bytes INTEGER NOT NULL DEFAULT 0")
+                self._conn.execute(
+                    "UPDATE sessions SET bytes = (SELECT COALESCE(SUM(LENGTH(CAST(body AS BLOB))), 0) "
+                    "FROM messages WHERE session_id = sessions.id)"
+                )
+        self.fts_enabled = self._ensure_fts()
+        self._reader = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    # ------------------- Reads ------------------- #
+    def list_sessions(self, mode: str) -> List[str]:
+        """Session names in creation order."""
+        self._ensure_migrated(mode)
+        with self._read_lock:
+            rows = self._reader.execute("SELECT name FROM sessions WHERE mode = ? ORDER BY id", (mode,))
+            return [name for (name,) in rows]
+
+    def count_messages(self, mode: str, name: str) -> int:
+        self._ensure_migrated(mode)
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT message_count FROM sessions WHERE mode = ? AND name = ?", (mode, name)
+            ).fetchone()
+            return row[0] if row else 0
+
+    def last_activity(self, mode: str) -> Dict[str, float]:
+        """Session name -> time of its last change (creation or message)."""
+        self._ensure_migrated(mode)
+        with self._read_lock:
+            return dict(self._reader.execute("SELECT name, updated_at FROM sessions WHERE mode = ?", (mode,)))
+
+    def session_info(self, mode: str) -> List[SessionInfo]:
+        """Name, message count, last activity and size of every session, in creation order."""
+        self._ensure_migrated(mode)
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT name, message_count, updated_at, bytes FROM sessions WHERE mode = ? ORDER BY id", (mode,)
+            )
+            return [SessionInfo(*row) for row in rows]
+
+    def load_messages(self, mode: str, name: str, start: int = 0, end: Optional[int] = None) -> List[Message]:
+        """Messages [start, end) of a session, oldest first."""
+        self._ensure_migrated(mode)
+        with self._read_lock:
+            session_id = self._session_id(self._reader, mode, name)
+            if session_id is None:
+                return []
+            limit = -1 if end is None else max(0, end - start)
+            rows = self._reader.execute(
+                "SELECT body, is_user, sender, COALESCE(uid, id), COALESCE(created_at, 0) FROM messages "
+                "WHERE session_id = ? ORDER BY id LIMIT ? OFFSET ?", (session_id, limit, start)
+            )
+            return [
+                Message(body, is_user, sender, id=uid, timestamp=created_at)
+                for body, is_user, sender, uid, created_at in rows
+            ]
+
+    def message_ids(self, mode: str, name: str) -> Set[int]:
+        """Ids of a session's messages, including writes not committed yet (imports skip these)."""
+        self._ensure_migrated(mode)
+        with self.batch():
+            session_id = self._session_id(self._conn, mode, name)
+            if session_id is None:
+                return set()
+            rows = self._conn.execute("SELECT COALESCE(uid, id) FROM messages WHERE session_id = ?", (session_id,))
+            return {uid for (uid,) in rows}
+
+    def load_sessions(self, mode: str) -> Dict[str, List[Message]]:
+        """Every session of a mode with all its messages (export, full snapshots)."""
+        return {name: self.load_messages(mode, name) for name in self.list_sessions(mode)}
+
+    def search(self, mode: str, query: str, limit: int = 50) -> List[tuple]:
+        """
+        Best-matching messages of a mode as (session, message index, snippet
+        HTML) tuples, best first. The index counts from the session's first
+        message.
+        """
+        self._ensure_migrated(mode)
+        with self._read_lock:
+            if self.fts_enabled:
+                fts_query = to_fts_query(query)
+                if not fts_query:
+                    return []
+                rows = self._reader.execute(
+                    "SELECT s.name, m.session_id, m.id, "
+                    "snippet(messages_fts, 0, ?, ?, '…', ?) "
+                    "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                    "JOIN sessions s ON s.id = m.session_id "
+                    "WHERE messages_fts MATCH ? AND s.mode = ? ORDER BY rank LIMIT ?",
+                    (_HIT_START, _HIT_END, SNIPPET_TOKENS, fts_query, mode, limit)
+                ).fetchall()
+            else:
+                query = query.strip()
+                if not query:
+                    return []
+                rows = self._reader.execute(
+                    "SELECT s.name, m.session_id, m.id, m.body FROM messages m "
+                    "JOIN sessions s ON s.id = m.session_id "
+                    "WHERE s.mode = ? AND m.body LIKE ? ORDER BY m.id DESC LIMIT ?",
+                    (mode, f"%{query}%", limit)
+                ).fetchall()
+                return [
+                    (name, self._message_index(session_id, message_id), make_snippet(body, query))
+                    for name, session_id, message_id, body in rows
+                ]
+            return [
+                (name, self._message_index(session_id, message_id), highlight_snippet(snippet))
+                for name, session_id, message_id, snippet in rows
+            ]
+
+    def search_archived(self, mode: str, query: str, limit: int = 50) -> Optional[List[tuple]]:
+        """
+        Best-matching archived messages of a mode as (session, message
+        index) pairs, best first; the caller reads snippets from the
+        archive. None when this SQLite build lacks FTS5.
+        """
+        if not self.fts_enabled:
+            return None
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        with self._read_lock:
+            return self._reader.execute(
+                "SELECT a.session, a.position FROM archived_fts JOIN archived_messages a ON a.id = archived_fts.rowid "
+                "WHERE archived_fts MATCH ? AND a.mode = ? ORDER BY rank LIMIT ?", (fts_query, mode, limit)
+            ).fetchall()
+
+    def archived_sessions_indexed(self, mode: str) -> Optional[List[str]]:
+        """Archived sessions of a mode with words in the archive index (None without FTS5)."""
+        if not self.fts_enabled:
+            return None
+        with self._read_lock:
+            rows = self._reader.execute("SELECT DISTINCT session FROM archived_messages WHERE mode = ?", (mode,))
+            return [name for (name,) in rows]
+
+    # ------------------- Writes ------------------- #
+    @contextmanager
+    def batch(self):
+        """Run the enclosed writes in one transaction (nested batches join the outer one)."""
+        with self._write_lock:
+            self._batch_depth += 1
+            try:
+                yield self
+                if self._batch_depth == 1:
+                    self._conn.commit()
+                    self._migrated |= self._migrating
+                    self._migrating.clear()
+            except BaseException:
+                if self._batch_depth == 1:
+                    self._conn.rollback()
+                    self._migrating.clear()
+                raise
+            finally:
+                self._batch_depth -= 1
+
+    def migrate(self, mode: str) -> None:
+        """
+        Import the mode's JSON/journal data unless this database already
+        has. Slow for a long history, so run it off the GUI thread. The mode
+        counts as migrated once the transaction holding the import commits;
+        a failed import is rolled back and retried on the next call.
+        """
+        if mode in self._migrated:
+            return
+        with self.batch():
+            if mode in self._migrated or mode in self._migrating:
+                return
+            key = f"migrated:{mode}"
+            if not self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                # A savepoint, so a failure doesn't leave half an import in the enclosing batch
+                self._conn.execute("SAVEPOINT migrate")
+                try:
+                    legacy = self._legacy_loader(mode) if self._legacy_loader else None
+                    if legacy:
+                        self._bulk_insert(mode, legacy)
+                    self._set_meta(key, "1")
+                except BaseException:
+                    self._conn.execute("ROLLBACK TO migrate")
+                    self._conn.execute("RELEASE migrate")
+                    raise
+                self._conn.execute("RELEASE migrate")
+            self._migrating.add(mode)
+
+    def create_session(self, mode: str, name: str) -> None:
+        self._ensure_migrated(mode)
+        with self.batch():
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sessions (mode, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (mode, name, now, now)
+            )
+
+    def append_message(self, mode: str, name: str, message) -> None:
+        message = Message.decode(message)
+        self._ensure_migrated(mode)
+        with self.batch():
+            now = time.time()
+            session_id = self._session_id(self._conn, mode, name) or self._insert_session(mode, name, now)
+            self._conn.execute(
+                "INSERT INTO messages (session_id, uid, created_at, is_user, sender, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, message.id, message.timestamp, int(message.is_user), message.sender, message.text)
+            )
+            self._conn.execute(
+                "UPDATE sessions SET message_count = message_count + 1, bytes = bytes + ?, updated_at = ? "
+                "WHERE id = ?", (len(message.text.encode("utf-8")), now, session_id)
+            )
+
+    def append_messages(self, mode: str, name: str, messages) -> None:
+        """Bulk-append messages to a session (imports): one INSERT batch, one count update."""
+        self._ensure_migrated(mode)
+        with self.batch():
+            now = time.time()
+            session_id = self._session_id(self._conn, mode, name) or self._insert_session(mode, name, now)
+            rows = []
+            for item in messages:
+                m = Message.decode(item)
+                rows.append((session_id, m.id, m.timestamp or None, int(m.is_user), m.sender, m.text))
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, uid, created_at, is_user, sender, body) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute(
+                "UPDATE sessions SET message_count = message_count + ?, bytes = bytes + ?, updated_at = ? "
+                "WHERE id = ?", (len(rows), sum(len(row[5].encode("utf-8")) for row in rows), now, session_id)
+            )
+
+    def rename_session(self, mode: str, old_name: str, new_name: str) -> None:
+        self._ensure_migrated(mode)
+        with self.batch():
+            self._conn.execute(
+                "UPDATE sessions SET name = ? WHERE mode = ? AND name = ?", (new_name, mode, old_name)
+            )
+
+    def delete_session(self, mode: str, name: str) -> None:
+        self._ensure_migrated(mode)
+        with self.batch():
+            self._conn.execute("DELETE FROM sessions WHERE mode = ? AND name = ?", (mode, name))
+
+    def index_archived(self, mode: str, name: str, messages) -> None:
+        """Keep an archived session searchable (call in the batch that deletes it)."""
+        if not self.fts_enabled:
+            return
+        with self.batch():
+            self.unindex_archived(mode, name, messages)
+            for position, message in enumerate(messages):
+                cursor = self._conn.execute(
+                    "INSERT INTO archived_messages (mode, session, position) VALUES (?, ?, ?)", (mode, name, position)
+                )
+                self._conn.execute(
+                    "INSERT INTO archived_fts (rowid, body) VALUES (?, ?)", (cursor.lastrowid, Message.decode(message).text)
+                )
+
+    def unindex_archived(self, mode: str, name: str, messages) -> None:
+        """Drop an archived session's words; `messages` must be what `index_archived` was given."""
+        if not self.fts_enabled:
+            return
+        with self.batch():
+            rows = self._conn.execute(
+                "SELECT id, position FROM archived_messages WHERE mode = ? AND session = ?", (mode, name)
+            ).fetchall()
+            for row_id, position in rows:
+                if position < len(messages):
+                    self._conn.execute(
+                        "INSERT INTO archived_fts (archived_fts, rowid, body) VALUES ('delete', ?, ?)",
+                        (row_id, Message.decode(messages[position]).text)
+                    )
+            self._conn.execute("DELETE FROM archived_messages WHERE mode = ? AND session = ?", (mode, name))
+
+    def replace_sessions(self, mode: str, sessions: Dict[str, Any]) -> None:
+        """Replace every session of a mode in one transaction."""
+        with self.batch():
+            self._migrated.add(mode)
+            self._set_meta(f"migrated:{mode}", "1")
+            self._conn.execute("DELETE FROM sessions WHERE mode = ?", (mode,))
+            self._bulk_insert(mode, sessions)
+
+    def close(self) -> None:
+        with self._write_lock, self._read_lock:
+            self._conn.close()
+            self._reader.close()
+
+    # ------------------- Internals ------------------- #
+    @staticmethod
+    def _session_id(conn: sqlite3.Connection, mode: str, name: str) -> Optional[int]:
+        row = conn.execute("SELECT id FROM sessions WHERE mode = ? AND name = ?", (mode, name)).fetchone()
+        return row[0] if row else None
+
+    def _insert_session(self, mode: str, name: str, now: float) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO sessions (mode, name, created_at, updated_at) VALUES (?, ?, ?, ?)", (mode, name, now, now)
+        )
+        return cursor.lastrowid
+
+    def _bulk_insert(self, mode: str, sessions: Dict[str, Any]) -> None:
+        now = time.time()
+        for name, messages in sessions.items():
+            session_id = self._insert_session(mode, name, now)
+            rows = []
+            for position, item in enumerate(messages):
+                m = Message.decode(item, position)
+                rows.append((session_id, m.id, m.timestamp or None, int(m.is_user), m.sender, m.text))
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, uid, created_at, is_user, sender, body) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            # Last activity is the newest message's time (untimestamped legacy data counts as now)
+            updated = max((row[2] for row in rows if row[2]), default=now)
+            self._conn.execute(
+                "UPDATE sessions SET message_count = ?, bytes = ?, updated_at = ? WHERE id = ?",
+                (len(rows), sum(len(row[5].encode("utf-8")) for row in rows), updated, session_id)
+            )
+
+    def _message_index(self, session_id: int, message_id: int) -> int:
+        return self._reader.execute(
+            "SELECT COUNT(*) FROM messages WHERE session_id = ? AND id < ?", (session_id, message_id)
+        ).fetchone()[0]
+
+    def _ensure_fts(self) -> bool:
+        """Create (and backfill) the FTS indexes if missing. False when FTS5 is unavailable."""
+        try:
+            if not self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone():
+                with self._conn:
+                    self._conn.executescript("BEGIN;" + FTS_SCHEMA + "COMMIT;")
+            with self._conn:
+                self._conn.executescript(ARCHIVE_FTS_SCHEMA)
+            return True
+        except sqlite3.OperationalError:
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            return False
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _ensure_migrated(self, mode: str) -> None:
+        """Fallback for callers that didn't run `migrate` first (a set lookup once it has run)."""
+        if mode not in self._migrated:
+            self.migrate(mode)
@@ -0,0 +1,411 @@
+# core/session_journal.py
+
+"""
+Append-only journal for chat sessions.
+
+Each change (new session, new message, rename, delete) is one JSON line
+appended to `<mode>_sessions.journal`, so saving a reply costs a few
+hundred bytes instead of rewriting every session. Loading replays the
+journal. Once enough records pile up, the journal is compacted in the
+background into a single snapshot record and atomically swapped in;
+records appended meanwhile are carried over.
+
+A crash can leave a torn (partial) last line. It is dropped and the
+file truncated back to the last complete record, rather than losing the
+whole file.
+"""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from core.message import Message, SessionInfo
+from core.session_writer import atomic_write
+
+# Records appended since the last snapshot before a background compaction starts
+DEFAULT_COMPACT_THRESHOLD = 500
+
+
+def _encode(record: dict) -> bytes:
+    if record.get("op") == "snapshot":
+        record = dict(record, sessions={
+            name: [Message.decode(m, position).encode() for position, m in enumerate(messages)]
+            for name, messages in record["sessions"].items()
+        })
+    elif record.get("op") == "append":
+        record = dict(record, message=Message.decode(record["message"]).encode())
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def apply_record(sessions: Dict[str, list], record: dict) -> None:
+    """Apply one journal record to an in-memory {name: [Message]} dict."""
+    op = record.get("op")
+    if op == "snapshot":
+        sessions.clear()
+        sessions.update({
+            name: [Message.decode(m, position) for position, m in enumerate(messages)]
+            for name, messages in record["sessions"].items()
+        })
+    elif op == "create":
+        sessions.setdefault(record["session"], [])
+    elif op == "append":
+        messages = sessions.setdefault(record["session"], [])
+        messages.append(Message.decode(record["message"], len(messages)))
+    elif op == "rename":
+        if record["session"] in sessions:
+            sessions[record["to"]] = sessions.pop(record["session"])
+    elif op == "delete":
+        sessions.pop(record["session"], None)
+    else:
+        raise ValueError(f"Unknown journal op {op!r}")
+
+
+def replay(data: bytes, path: str = "<journal>"):
+    """
+    Replay raw journal bytes. Returns (sessions, records, good_length):
+    the rebuilt state, the number of records applied, and the length of
+    the prefix made of complete lines (anything after it is a torn write).
+    """
+    sessions: Dict[str, list] = {}
+    records = 0
+    position = 0
+    good_length = 0
+    while position < len(data):
+        end = data.find(b"\n", position)
+        if end == -1:
+            break  # Torn last record: no terminating newline
+        line = data[position:end]
+        position = good_length = end + 1
+        if not line.strip():
+            continue
+        try:
+            apply_record(sessions, json.loads(line))
+            records += 1
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logging.warning("Skipping corrupt record in %s at byte %d: %s", path, position - len(line) - 1, e)
+    return sessions, records, good_length
+
+
+class SessionJournal:
+    """
+    Journal for one chat mode. Thread-safe. Appends are flushed right away
+    unless `autoflush` is off, in which case `sync()` flushes and fsyncs.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._file = None
+        self._records_since_snapshot = 0
+        self._compacting = False
+        self.autoflush = True
+
+    # ------------------- Public API ------------------- #
+    def load(self) -> Dict[str, List[Any]]:
+        """Replay the journal, repairing a torn tail (migrates the legacy JSON file once)."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                legacy = self._load_legacy()
+                if legacy is None:
+                    return {}
+                self._write_snapshot_file(legacy)
+                sessions = {}
+                apply_record(sessions, {"op": "snapshot", "sessions": legacy})
+                return sessions
+
+            with open(self.path, "rb") as f:
+                data = f.read()
+            sessions, records, good_length = replay(data, self.path)
+            if good_length < len(data):
+                logging.warning("Dropping torn last record of %s (%d bytes)", self.path, len(data) - good_length)
+                self._close()
+                with open(self.path, "r+b") as f:
+                    f.truncate(good_length)
+            self._records_since_snapshot = records
+        self._maybe_compact()
+        return sessions
+
+    def create(self, session: str) -> None:
+        self._append({"op": "create", "session": session})
+
+    def append(self, session: str, message) -> None:
+        self._append({"op": "append", "session": session, "message": message})
+
+    def rename(self, session: str, new_name: str) -> None:
+        self._append({"op": "rename", "session": session, "to": new_name})
+
+    def delete(self, session: str) -> None:
+        self._append({"op": "delete", "session": session})
+
+    def replace_all(self, sessions: Dict[str, Any]) -> None:
+        """Overwrite the journal with a snapshot of `sessions`."""
+        with self._lock:
+            self._close()
+            self._write_snapshot_file(sessions)
+
+    def compact(self) -> None:
+        """
+        Rewrite the journal as one snapshot record. Replaying and writing
+        happen outside the lock; only the final catch-up and swap hold it.
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            if self._file:
+                self._file.flush()
+            cutoff = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            sessions, _, _ = replay(f.read(cutoff), self.path)
+
+        tmp_path = self.path + ".compact"
+        with open(tmp_path, "wb") as out:
+            out.write(_encode({"op": "snapshot", "sessions": sessions}))
+            with self._lock:
+                # Carry over whatever was appended while we were replaying
+                if self._file:
+                    self._file.flush()
+                with open(self.path, "rb") as f:
+                    f.seek(cutoff)
+                    tail = f.read()
+                out.write(tail)
+                out.flush()
+                os.fsync(out.fileno())
+                self._close()
+                os.replace(tmp_path, self.path)
+                self._records_since_snapshot = tail.count(b"\n")
+
+    def sync(self) -> None:
+        """Flush buffered appends and fsync them to disk."""
+        with self._lock:
+            if self._file:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    # ------------------- Internals ------------------- #
+    def _append(self, record: dict) -> None:
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "ab")
+            self._file.write(_encode(record))
+            if self.autoflush:
+                self._file.flush()
+            self._records_since_snapshot += 1
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        with self._lock:
+            if self._compacting or self._records_since_snapshot < self.compact_threshold:
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, name="JournalCompaction", daemon=True).start()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact()
+        except OSError as e:
+            logging.error("Journal compaction of %s failed: %s", self.path, e)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write_snapshot_file(self, sessions: Dict[str, Any]) -> None:
+        atomic_write(self.path, _encode({"op": "snapshot", "sessions": sessions}))
+        self._records_since_snapshot = 0
+
+    def _load_legacy(self) -> Optional[Dict[str, Any]]:
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return None
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except json.JSONDecodeError as e:
+            logging.error("Could not migrate %s: %s", self.legacy_path, e)
+            return None
+
+
+class JournalSessionStore:
+    """
+    Session store backed by one SessionJournal per mode. The journal has
+    to be replayed in full anyway, so the replayed state is kept in memory
+    and paged reads are served from it.
+    """
+
+    def __init__(self, journal_for: Callable[[str], SessionJournal]):
+        self._journal_for = journal_for
+        self._journals: Dict[str, SessionJournal] = {}
+        self._state: Dict[str, Dict[str, list]] = {}
+        self._sizes: Dict[str, Dict[str, int]] = {}  # mode -> session -> UTF-8 bytes of its texts
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+
+    def _open(self, mode: str):
+        if mode not in self._state:
+            journal = self._journals[mode] = self._journal_for(mode)
+            journal.autoflush = not self._batch_depth
+            self._state[mode] = journal.load()
+            self._recount(mode)
+        return self._journals[mode], self._state[mode]
+
+    def _recount(self, mode: str) -> None:
+        self._sizes[mode] = {
+            name: sum(len(m.text.encode("utf-8")) for m in messages) for name, messages in self._state[mode].items()
+        }
+
+    @contextmanager
+    def batch(self):
+        """
+        Buffer the enclosed appends, then flush and fsync each journal once.
+        The fsync runs outside the lock, so reads don't wait on the disk.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            for journal in self._journals.values():
+                journal.autoflush = False
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                journals = [] if self._batch_depth else list(self._journals.values())
+                for journal in journals:
+                    journal.autoflush = True
+            for journal in journals:
+                journal.sync()
+
+    def migrate(self, mode: str) -> None:
+        """Replay the mode's journal (importing its legacy JSON once), so later reads find it in memory."""
+        with self._lock:
+            self._open(mode)
+
+    def list_sessions(self, mode: str) -> List[str]:
+        with self._lock:
+            return list(self._open(mode)[1])
+
+    def count_messages(self, mode: str, name: str) -> int:
+        with self._lock:
+            return len(self._open(mode)[1].get(name, ()))
+
+    def last_activity(self, mode: str) -> Dict[str, float]:
+        """Session name -> timestamp of its newest message (0 when unknown, e.g. legacy messages)."""
+        with self._lock:
+            return {
+                name: max((m.timestamp for m in messages), default=0.0)
+                for name, messages in self._open(mode)[1].items()
+            }
+
+    def session_info(self, mode: str) -> List[SessionInfo]:
+        with self._lock:
+            sessions = self._open(mode)[1]
+            sizes = self._sizes[mode]
+            return [
+                SessionInfo(name, len(messages), messages[-1].timestamp if messages else 0.0, sizes.get(name, 0))
+                for name, messages in sessions.items()
+            ]
+
+    def load_messages(self, mode: str, name: str, start: int = 0, end: Optional[int] = None) -> List[Message]:
+        with self._lock:
+            return self._open(mode)[1].get(name, [])[start:end]
+
+    def message_ids(self, mode: str, name: str) -> Set[int]:
+        with self._lock:
+            return {m.id for m in self._open(mode)[1].get(name, ())}
+
+    def load_sessions(self, mode: str) -> Dict[str, List[Message]]:
+        with self._lock:
+            return {name: list(messages) for name, messages in self._open(mode)[1].items()}
+
+    def search(self, mode: str, query: str, limit: int = 50) -> List[tuple]:
+        """Case-insensitive substring scan over the in-memory state (the SQLite backend is indexed)."""
+        from core.session_db import make_snippet
+
+        needle = query.strip().lower()
+        if not needle:
+            return []
+        hits = []
+        with self._lock:
+            for name, messages in self._open(mode)[1].items():
+                for index, message in enumerate(messages):
+                    count = message.text.lower().count(needle)
+                    if count:
+                        hits.append((-count, name, index, message.text))
+        hits.sort(key=lambda hit: hit[0])
+        return [(name, index, make_snippet(text, query.strip())) for _, name, index, text in hits[:limit]]
+
+    # The journal keeps no search index: archived sessions are scanned in the archive
+    def search_archived(self, mode: str, query: str, limit: int = 50) -> Optional[List[tuple]]:
+        return None
+
+    def archived_sessions_indexed(self, mode: str) -> Optional[List[str]]:
+        return None
+
+    def index_archived(self, mode: str, name: str, messages) -> None:
+        pass
+
+    def unindex_archived(self, mode: str, name: str, messages) -> None:
+        pass
+
+    def create_session(self, mode: str, name: str) -> None:
+        with self._lock:
+            journal, sessions = self._open(mode)
+            apply_record(sessions, {"op": "create", "session": name})
+            journal.create(name)
+
+    def append_message(self, mode: str, name: str, message) -> None:
+        message = Message.decode(message)
+        with self._lock:
+            journal, sessions = self._open(mode)
+            apply_record(sessions, {"op": "append", "session": name, "message": message})
+            journal.append(name, message)
+            sizes = self._sizes[mode]
+            sizes[name] = sizes.get(name, 0) + len(message.text.encode("utf-8"))
+
+    def append_messages(self, mode: str, name: str, messages) -> None:
+        with self._lock:
+            for message in messages:
+                self.append_message(mode, name, message)
+
+    def rename_session(self, mode: str, old_name: str, new_name: str) -> None:
+        with self._lock:
+            journal, sessions = self._open(mode)
+            apply_record(sessions, {"op": "rename", "session": old_name, "to": new_name})
+            journal.rename(old_name, new_name)
+            if old_name in self._sizes[mode]:
+                self._sizes[mode][new_name] = self._sizes[mode].pop(old_name)
+
+    def delete_session(self, mode: str, name: str) -> None:
+        with self._lock:
+            journal, sessions = self._open(mode)
+            apply_record(sessions, {"op": "delete", "session": name})
+            journal.delete(name)
+            self._sizes[mode].pop(name, None)
+
+    def replace_sessions(self, mode: str, sessions: Dict[str, Any]) -> None:
+        with self._lock:
+            journal, state = self._open(mode)
+            apply_record(state, {"op": "snapshot", "sessions": sessions})
+            journal.replace_all(sessions)
+            self._recount(mode)
+
+    def close(self) -> None:
+        with self._lock:
+            for journal in self._journals.values():
+                journal.close()
+            self._journals.clear()
+            self._state.clear()
+            self._sizes.clear()
@@ -0,0 +1,167 @@
+# core/session_transfer.py
+
+"""
+Streaming export/import of chat history as JSONL (`python -m FoxChat
+export` / `import`).
+
+Each line is one message:
+{"mode", "session", "id", "timestamp", "is_user", "sender", "text"}.
+Export pages through each session instead of loading whole modes;
+import reads one line at a time and hands messages to the configured
+backend in batches of IMPORT_BATCH_SIZE, each written as one
+transaction while the next batch is parsed. Memory stays bounded by the
+page/batch size either way.
+
+Imports merge on (mode, session, id): records whose id the session
+already holds are skipped, so re-importing an export is a no-op.
+Records without an id get a fresh one and are always imported.
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+from core import file_manager
+from core.config import CHAT_MODES
+from core.message import Message
+
+EXPORT_PAGE_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+
+
+def parse_date(text: Optional[str]) -> Optional[float]:
+    """`YYYY-MM-DD` or an ISO datetime (local time) -> epoch seconds."""
+    if not text:
+        return None
+    return datetime.fromisoformat(text).timestamp()
+
+
+class MessageFilter:
+    """Mode/session/date filter shared by export and import; empty criteria match everything."""
+
+    def __init__(self, modes=(), sessions=(), since: Optional[float] = None, until: Optional[float] = None):
+        self.modes = set(modes)
+        self.sessions = set(sessions)
+        self.since = since
+        self.until = until
+
+    def wants_mode(self, mode: str) -> bool:
+        return not self.modes or mode in self.modes
+
+    def wants_session(self, session: str) -> bool:
+        return not self.sessions or session in self.sessions
+
+    def wants_time(self, timestamp: float) -> bool:
+        # Legacy messages have no timestamp (0), so a date filter skips them
+        if self.since is not None and timestamp < self.since:
+            return False
+        if self.until is not None and timestamp >= self.until:
+            return False
+        return True
+
+
+def to_record(mode: str, session: str, message: Message) -> dict:
+    return {
+        "mode": mode, "session": session, "id": message.id, "timestamp": message.timestamp,
+        "is_user": message.is_user, "sender": message.sender, "text": message.text,
+    }
+
+
+def from_record(record: dict) -> Tuple[str, str, Message]:
+    message = Message(record["text"], record.get("is_user", False), record.get("sender"),
+                      id=record.get("id"), timestamp=record.get("timestamp"))
+    return record["mode"], record["session"], message
+
+
+def iter_messages(selection: MessageFilter) -> Iterator[Tuple[str, str, Message]]:
+    """(mode, session, message) for every stored message matching `selection`."""
+    modes = selection.modes or CHAT_MODES
+    for mode in modes:
+        for session in file_manager.list_sessions(mode):
+            if not selection.wants_session(session):
+                continue
+            for message in file_manager.iter_session_messages(mode, session, EXPORT_PAGE_SIZE):
+                if selection.wants_time(message.timestamp):
+                    yield mode, session, message
+
+
+def export_jsonl(out: IO[str], selection: MessageFilter) -> int:
+    """Write matching messages to `out` as JSONL. Returns the number written."""
+    count = 0
+    for mode, session, message in iter_messages(selection):
+        out.write(json.dumps(to_record(mode, session, message), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def read_jsonl(lines: Iterable[str], source: str = "<input>") -> Iterator[Tuple[str, str, Message]]:
+    """Parse JSONL lazily; malformed lines are reported to stderr and skipped."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield from_record(json.loads(line))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"{source}:{number}: skipped ({e})", file=sys.stderr)
+
+
+def import_jsonl(lines: Iterable[str], selection: MessageFilter, source: str = "<input>") -> Tuple[int, int]:
+    """
+    Append matching messages from JSONL to the configured backend, skipping
+    ones already stored. Returns (imported, skipped as already present).
+    """
+    totals = [0, 0]
+
+    def report(imported, skipped):
+        totals[0] += imported
+        totals[1] += skipped
+
+    pending = {}  # mode -> [(session, message)]
+    pending_count = 0
+    for mode, session, message in read_jsonl(lines, source):
+        if not (selection.wants_mode(mode) and selection.wants_session(session)
+                and selection.wants_time(message.timestamp)):
+            continue
+        pending.setdefault(mode, []).append((session, message))
+        pending_count += 1
+        if pending_count >= IMPORT_BATCH_SIZE:
+            _import_batch(pending, report)
+            pending, pending_count = {}, 0
+    _import_batch(pending, report)
+    file_manager.flush_writes()
+    return totals[0], totals[1]
+
+
+def _import_batch(pending: dict, report) -> None:
+    # Parsing overlaps with the writer, but at most one batch waits in its queue
+    file_manager.flush_writes()
+    for mode, items in pending.items():
+        file_manager.import_messages(mode, items, report)
+
+
+def run(command: str, path: str, selection: MessageFilter) -> int:
+    """Run `export` or `import` against `path` ("-" for stdout/stdin) and report throughput on stderr."""
+    start = time.perf_counter()
+    skipped = 0
+    if command == "export":
+        if path == "-":
+            count = export_jsonl(sys.stdout, selection)
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                count = export_jsonl(f, selection)
+        verb = "Exported"
+    else:
+        if path == "-":
+            count, skipped = import_jsonl(sys.stdin, selection, "<stdin>")
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                count, skipped = import_jsonl(f, selection, path)
+        verb = "Imported"
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"{verb} {count} messages in {elapsed:.2f} s ({rate:,.0f} messages/sec)", file=sys.stderr)
+    if skipped:
+        print(f"Skipped {skipped} messages already present", file=sys.stderr)
+    return 0
@@ -0,0 +1,210 @@
+# core/session_writer.py
+
+"""
+Background writer for session data and small JSON files.
+
+Store changes (new messages, renames, deletes) are queued and applied
+by one writer thread. A burst is coalesced: the thread waits a short
+interval after the first queued change, then applies everything queued
+in one batch (one SQLite transaction, or one journal flush + fsync).
+Whole-file writes are coalesced by path, so only the latest content is
+written, atomically via temp file + fsync + rename.
+
+Changes can be tagged with keys (e.g. a mode and a session), so a
+reader waits only for the queued changes it would see (`flush(keys)`),
+and queued file contents are readable before they hit the disk
+(`pending_file`). Background changes (e.g. archiving idle sessions)
+run one at a time, each in its own batch, and only while nothing else
+is queued, so they never hold up regular writes.
+
+`flush()` blocks until everything queued so far is on disk, background
+changes aside; it runs at interpreter exit and should be called when
+the app quits. Background changes still queued on exit are dropped.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Seconds to gather a burst of changes into one write
+DEFAULT_WRITE_INTERVAL = 0.25
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write `data` to `path` so readers see either the old or the new file, never a torn one."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself (POSIX)
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class SessionWriter:
+    """
+    `store` must provide a `batch()` context manager; queued changes are
+    callables taking the store.
+    """
+
+    def __init__(self, store, interval: float = DEFAULT_WRITE_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._changes: List[Tuple[int, Callable, tuple]] = []  # (sequence, change, keys)
+        self._files: Dict[str, Tuple[int, bytes]] = {}  # path -> (sequence, data)
+        self._background = deque()  # Changes run while nothing else is queued
+        self._writing: Dict[str, bytes] = {}  # Files taken by the writer thread, not yet on disk
+        self._cond = threading.Condition()
+        self._sequence = 0
+        self._unwritten: Set[int] = set()  # Sequence numbers queued or being written
+        self._by_key: Dict[Hashable, Set[int]] = {}  # key -> its unwritten sequence numbers
+        self._flush_requested = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="SessionWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------- Public API ------------------- #
+    def submit(self, change: Callable, keys: Iterable[Hashable] = ()) -> None:
+        """
+        Queue `change(store)`; changes are applied in submission order.
+        `keys` name what the change touches, for `flush(keys)`.
+        """
+        keys = tuple(keys)
+        with self._cond:
+            sequence = self._next_sequence()
+            self._changes.append((sequence, change, keys))
+            for key in keys:
+                self._by_key.setdefault(key, set()).add(sequence)
+            self._cond.notify_all()
+
+    def submit_background(self, change: Callable) -> None:
+        """
+        Queue a low-priority `change(store)`. It runs after every regular
+        change queued before it starts, in order with other background
+        changes, and no flush waits for it.
+        """
+        with self._cond:
+            self._background.append(change)
+            self._cond.notify_all()
+
+    def write_file(self, path: str, data: bytes) -> None:
+        """Queue an atomic whole-file write; a later write to the same path replaces it."""
+        with self._cond:
+            queued = self._files.get(path)
+            self._files[path] = (queued[0] if queued else self._next_sequence(), data)
+            self._cond.notify_all()
+
+    def pending_file(self, path: str) -> Optional[bytes]:
+        """Contents queued for `path` but not on disk yet, or None."""
+        with self._cond:
+            if path in self._files:
+                return self._files[path][1]
+            return self._writing.get(path)
+
+    @property
+    def pending(self) -> bool:
+        with self._cond:
+            return bool(self._unwritten)
+
+    def flush(self, timeout: float = None, keys: Optional[Iterable[Hashable]] = None) -> bool:
+        """
+        Block until everything queued before this call is written, or with
+        `keys`, only the changes tagged with one of them (returns at once if
+        there are none). False on timeout.
+        """
+        with self._cond:
+            if keys is None:
+                waiting = set(self._unwritten)
+            else:
+                waiting = set().union(*(self._by_key.get(key, ()) for key in keys))
+            if not waiting:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: waiting.isdisjoint(self._unwritten) or (self._closed and
+                                       not self._thread.is_alive()), timeout)
+
+    def close(self) -> None:
+        """Flush and stop the writer thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    # ------------------- Writer thread ------------------- #
+    def _next_sequence(self) -> int:
+        self._sequence += 1
+        self._unwritten.add(self._sequence)
+        return self._sequence
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._changes or self._files or self._background or self._closed)
+                if not (self._changes or self._files):
+                    if self._closed:
+                        return
+                    changes, files = [(None, self._background.popleft(), ())], {}
+                else:
+                    # Let the burst build up, unless someone is waiting on a flush
+                    deadline = time.monotonic() + self.interval
+                    while not (self._flush_requested or self._closed):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    changes, self._changes = self._changes, []
+                    files, self._files = self._files, {}
+                    self._flush_requested = False
+                self._writing = {path: data for path, (_sequence, data) in files.items()}
+
+            self._write([change for _sequence, change, _keys in changes], self._writing)
+
+            with self._cond:
+                for sequence, _change, keys in changes:
+                    self._unwritten.discard(sequence)
+                    for key in keys:
+                        waiting = self._by_key[key]
+                        waiting.discard(sequence)
+                        if not waiting:
+                            del self._by_key[key]
+                for sequence, _data in files.values():
+                    self._unwritten.discard(sequence)
+                self._writing = {}
+                self._cond.notify_all()
+
+    def _write(self, changes, files):
+        if changes:
+            try:
+                with self.store.batch():
+                    for change in changes:
+                        try:
+                            change(self.store)
+                        except Exception as e:
+                            logging.error("Session change failed: %s", e)
+            except Exception as e:
+                logging.error("Writing %d session change(s) failed: %s", len(changes), e)
+        for path, data in files.items():
+            try:
+                atomic_write(path, data)
+            except OSError as e:
+                logging.error("Writing %s failed: %s", path, e)
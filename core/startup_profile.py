@@ -0,0 +1,127 @@
+# core/startup_profile.py
+
+"""
+Cold-start profiling for `--startup-profile`.
+
+Times every module import (self time, i.e. excluding nested imports)
+plus named phases of startup up to the main window's first paint, and
+prints a breakdown to stderr. Installed before anything else is
+imported; nothing here touches Qt until first paint is hooked.
+"""
+
+import sys
+import time
+from importlib.abc import MetaPathFinder
+
+
+class _TimedLoader:
+    """
+    Delegating loader that times `create_module` + `exec_module`
+    (extension modules such as PyQt6 do their work in create_module).
+    """
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+        self._create_time = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        start = time.perf_counter()
+        try:
+            return self._loader.create_module(spec)
+        finally:
+            self._create_time = time.perf_counter() - start
+            if self._profiler._stack:
+                self._profiler._stack[-1] += self._create_time
+
+    def exec_module(self, module):
+        profiler = self._profiler
+        profiler._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = profiler._stack.pop()
+            if profiler._stack:
+                profiler._stack[-1] += elapsed
+            total = elapsed + self._create_time
+            profiler.imports[module.__name__] = (total - children, total)
+
+
+class _TimingFinder(MetaPathFinder):
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self._profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (label, seconds since start)
+        self.imports = {}  # module -> (self seconds, cumulative seconds)
+        self._stack = []
+        self._finder = _TimingFinder(self)
+
+    def install(self):
+        sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    def mark(self, label: str):
+        self.phases.append((label, time.perf_counter() - self.started))
+
+    def watch_first_paint(self, widget, on_done=None):
+        """Mark "first paint" when `widget` first paints, then print the report."""
+        from PyQt6.QtCore import QEvent, QObject, QTimer
+
+        profiler = self
+
+        class _FirstPaintFilter(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Type.Paint:
+                    obj.removeEventFilter(self)
+                    # Report once the paint has been handled
+                    QTimer.singleShot(0, lambda: profiler._finish(on_done))
+                return False
+
+        self._paint_filter = _FirstPaintFilter(widget)
+        widget.installEventFilter(self._paint_filter)
+
+    def _finish(self, on_done):
+        self.mark("first paint")
+        self.uninstall()
+        self.report()
+        if on_done:
+            on_done()
+
+    def report(self, top: int = 15, stream=None):
+        stream = stream or sys.stderr
+        print("FoxChat startup profile", file=stream)
+        print("-" * 56, file=stream)
+        previous = 0.0
+        for label, at in self.phases:
+            print(f"  {label:<32} {at * 1000:8.1f} ms  (+{(at - previous) * 1000:.1f})", file=stream)
+            previous = at
+
+        total_imports = sum(self_time for self_time, _ in self.imports.values())
+        print(f"\n  Imports: {len(self.imports)} modules, {total_imports * 1000:.1f} ms", file=stream)
+        print(f"  {'module':<40} {'self':>7} {'cumul':>8}", file=stream)
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        for name, (self_time, cumulative) in slowest:
+            print(f"  {name:<40} {self_time * 1000:6.1f}ms {cumulative * 1000:7.1f}ms", file=stream)
@@ -0,0 +1,40 @@
+# tests/conftest.py
+
+"""Make the project importable when pytest is run from anywhere; shared fixtures."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """The QApplication: widgets need one, queued signals need its event loop."""
+    from PyQt6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """core.file_manager pointed at an empty data directory, with its own store, writer, archive and blobs."""
+    from core import file_manager
+    from core.blob_store import BlobStore
+    from core.session_archive import SessionArchive
+
+    monkeypatch.setattr(file_manager, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(file_manager, "SESSION_DB_FILE", str(tmp_path / "sessions.sqlite3"))
+    monkeypatch.setattr(file_manager, "_store", None)
+    monkeypatch.setattr(file_manager, "_writer", None)
+    monkeypatch.setattr(file_manager, "_migrations", set())
+    monkeypatch.setattr(file_manager, "_archive", SessionArchive(str(tmp_path / "archive")))
+    monkeypatch.setattr(file_manager, "_blobs", BlobStore(str(tmp_path / "blobs")))
+    yield file_manager
+    if file_manager._writer is not None:
+        file_manager._writer.close()
+    if file_manager._store is not None:
+        file_manager._store.close()
@@ -0,0 +1,85 @@
+# tests/test_batch_runner.py
+
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from core import batch_runner
+from core.batch_runner import BatchRunner, read_prompts
+from core.scheduler import RequestScheduler
+
+
+def test_read_prompts_accepts_text_and_json_lines(capsys):
+    lines = ["plain prompt\n", "\n", '{"prompt": "json prompt", "id": "x1", "profile": "other"}\n',
+             '{"id": "no prompt"}\n', "{not json\n"]
+    items = list(read_prompts(lines, "deepseek", "prompts.txt"))
+    assert [(i.index, i.prompt, i.profile, i.id) for i in items] == [
+        (0, "plain prompt", "deepseek", None), (1, "json prompt", "other", "x1"),
+    ]
+    errors = capsys.readouterr().err
+    assert "prompts.txt:4: skipped" in errors
+    assert "prompts.txt:5: skipped" in errors
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RequestScheduler(max_concurrent=1, rate_limits={"deepseek": (1000, 1000)},
+                                 default_rate_limit=(1000, 1000))
+    monkeypatch.setattr(batch_runner, "get_scheduler", lambda: scheduler)
+    yield scheduler
+    scheduler.close()
+
+
+def _run(items, concurrency=3, **kwargs):
+    out = io.StringIO()
+    runner = BatchRunner(out, concurrency, **kwargs)
+    total = runner.run(read_prompts(items, "deepseek"))
+    return runner, total, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_every_prompt_gets_one_result_within_the_concurrency_cap(scheduler, monkeypatch):
+    lock = threading.Lock()
+    active = [0, 0]  # current, peak
+
+    def query_api(prompt, profile):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return prompt.upper()
+
+    monkeypatch.setattr(batch_runner, "query_api", query_api)
+    runner, total, results = _run([f"p{i}" for i in range(20)], concurrency=3)
+    assert total == runner.completed == 20
+    assert sorted(r["index"] for r in results) == list(range(20))
+    assert all(r["reply"] == r["prompt"].upper() and not r["error"] for r in results)
+    assert 1 < active[1] <= 3
+    assert scheduler.max_concurrent == 3
+
+
+def test_errors_are_recorded_not_raised(scheduler, monkeypatch):
+    def query_api(prompt, profile):
+        if prompt == "boom":
+            raise RuntimeError("provider down")
+        return "❌ Rate limited" if prompt == "limited" else "ok"
+
+    monkeypatch.setattr(batch_runner, "query_api", query_api)
+    runner, total, results = _run(["fine", "boom", "limited"])
+    by_prompt = {r["prompt"]: r for r in results}
+    assert total == 3
+    assert runner.errors == 2
+    assert "provider down" in by_prompt["boom"]["reply"]
+    assert by_prompt["boom"]["error"] and by_prompt["limited"]["error"]
+    assert not by_prompt["fine"]["error"]
+
+
+def test_pairs_are_saved_to_a_session(scheduler, monkeypatch, data_dir):
+    monkeypatch.setattr(batch_runner, "query_api", lambda prompt, profile: "re: " + prompt)
+    _run(["one", "two"], concurrency=1, session="batch")
+    texts = [m.text for m in data_dir.load_session_messages("AI Chat", "batch")]
+    assert sorted(zip(texts[::2], texts[1::2])) == [("one", "re: one"), ("two", "re: two")]
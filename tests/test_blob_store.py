@@ -0,0 +1,107 @@
+# tests/test_blob_store.py
+
+import json
+import os
+
+import pytest
+
+from core.blob_store import BlobStore, display_name, split_ref
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+def _file(tmp_path, name, data=b"same bytes"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_same_content_under_different_names_is_stored_once(store, tmp_path):
+    a = store.ingest(_file(tmp_path, "a.txt"))
+    b = store.ingest(_file(tmp_path, "b.md"))
+    digest = split_ref(a)[0]
+    assert split_ref(b) == (digest, "b.md")
+    assert store.refcount(digest) == 2
+    assert os.listdir(os.path.dirname(store.path(a))) == [digest]
+    assert (display_name(a), display_name(b)) == ("a.txt", "b.md")
+
+
+def test_blob_is_removed_with_its_last_reference(store, tmp_path):
+    a = store.ingest(_file(tmp_path, "a.txt"))
+    b = store.ingest(_file(tmp_path, "b.md"))
+    assert store.extracted_text(b) == "same bytes"
+    assert store.open_path(a).endswith(".open.txt")
+    assert store.release([a]) == 0
+    assert os.path.exists(store.path(b))
+    assert store.release([b]) == 1
+    folder = os.path.dirname(store.path(a))
+    assert not os.path.exists(folder)
+    assert os.listdir(store.directory) == ["index.json"]
+
+
+def test_open_path_keeps_the_original_extension(store, tmp_path):
+    ref = store.ingest(_file(tmp_path, "notes.md", b"# hi"))
+    opened = store.open_path(ref)
+    assert opened.endswith(".md")
+    with open(opened, "rb") as f:
+        assert f.read() == b"# hi"
+
+
+def test_blob_stored_with_an_extension_is_still_found_and_moved(store, tmp_path):
+    ref = store.ingest(_file(tmp_path, "a.txt"))
+    digest = split_ref(ref)[0]
+    # As an older version laid it out
+    os.rename(store.path(ref), store.path(ref) + ".txt")
+    store._entries()[digest]["ext"] = ".txt"
+    assert store.path(ref).endswith(digest + ".txt")
+    store.ingest(_file(tmp_path, "again.txt"))
+    assert store.path(ref).endswith(digest)
+    assert os.listdir(os.path.dirname(store.path(ref))) == [digest]
+
+
+def test_plain_paths_pass_through(store, tmp_path):
+    path = _file(tmp_path, "old.txt")
+    assert store.path(path) == path
+    assert store.derived_path(path, "thumb") is None
+    store.retain([path])
+    assert store.release([path]) == 0
+
+
+@pytest.mark.parametrize("ref", ["blob:/x.txt", "blob:../../x.txt", "blob:" + "A" * 64 + "/x", "blob:abc/x.txt"])
+def test_crafted_refs_are_rejected(store, tmp_path, ref):
+    with pytest.raises(ValueError):
+        split_ref(ref)
+    kept = store.ingest(_file(tmp_path, "keep.txt"))
+    outside = _file(tmp_path, "outside.txt")
+
+    store.retain([ref])
+    assert store.release([ref, ref]) == 0
+    assert store.path(ref) == ""
+    assert store.derived_path(ref, "thumb") is None
+    assert store.open_path(ref) == ""
+    assert store.extracted_text(ref) is None
+    assert display_name(ref) == ref.partition("/")[2]
+
+    assert os.path.exists(store.path(kept))
+    assert os.path.exists(store.index_path)
+    assert os.path.exists(outside)
+
+
+def test_invalid_index_entries_never_delete_files(store, tmp_path):
+    kept = store.ingest(_file(tmp_path, "keep.txt"))
+    with open(store.index_path, "r", encoding="utf-8") as f:
+        index = json.load(f)
+    index[""] = {"refs": 0, "size": 0}
+    index[".."] = {"refs": 0, "size": 0}
+    with open(store.index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    reopened = BlobStore(store.directory)
+    assert reopened.collect_garbage() == 2
+    assert os.path.exists(reopened.path(kept))
+    assert os.path.exists(reopened.index_path)
+    with open(reopened.index_path, "r", encoding="utf-8") as f:
+        assert list(json.load(f)) == [split_ref(kept)[0]]
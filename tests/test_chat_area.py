@@ -0,0 +1,39 @@
+# tests/test_chat_area.py
+
+import pytest
+
+
+@pytest.fixture
+def chat(qapp, data_dir, tmp_path, monkeypatch):
+    from advanced import markdown_renderer
+    from ui.chat_area import ChatArea
+
+    monkeypatch.setattr(markdown_renderer, "_cache", markdown_renderer.RenderCache(
+        str(tmp_path / "render_cache.sqlite3"), persist=lambda save: None
+    ))
+
+    area = ChatArea()
+    area.resize(600, 400)
+    yield area
+    area.deleteLater()
+    qapp.processEvents()
+
+
+def test_finished_stream_is_rendered_once_and_kept(chat, monkeypatch):
+    from ui import chat_area
+
+    rendered = []
+    render = chat_area.render_markdown
+    monkeypatch.setattr(chat_area, "render_markdown", lambda text: rendered.append(text) or render(text))
+
+    chat.begin_streaming_message(1, "Bot")
+    chat.append_stream_chunk(1, "first\n\nsec")
+    chat._flush_streams()
+    chat.finish_streaming_message(1, content="first\n\nsecond")
+
+    row = chat.model.rows[-1]
+    bubble = row.bubbles[0]
+    assert not row.live and bubble.document is None
+    assert bubble.html == "<p>first</p>\n<p>second</p>"
+    chat.delegate.measure(row, chat.view.viewport().width())
+    assert rendered == ["first\n\nsecond"]
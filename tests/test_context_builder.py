@@ -0,0 +1,64 @@
+# tests/test_context_builder.py
+
+from core.context_builder import ContextBuilder, PinnedSystemPrompt, SlidingWindow, to_chat_messages
+from core.message import Message
+
+
+def _count_words(text):
+    return len(text.split())
+
+
+def _session(*texts):
+    """Alternating user/assistant turns."""
+    return [Message(text, number % 2 == 0, None if number % 2 == 0 else "Bot") for number, text in enumerate(texts)]
+
+
+def test_error_replies_are_left_out():
+    messages = [("hi", True, None), ("❌ Request failed", False, "Bot"), ("⚠️ Rate limited", False, "Bot"),
+                ("hello", False, "Bot")]
+    assert to_chat_messages(messages) == [
+        {"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"},
+    ]
+
+
+def test_sliding_window_keeps_the_newest_turns_that_fit():
+    builder = ContextBuilder(budget=5, strategy=SlidingWindow(), count_tokens=_count_words)
+    history = builder.build(_session("one two three", "four five", "six", "seven eight"))
+    assert [m["content"] for m in history] == ["four five", "six", "seven eight"]
+    assert [m["role"] for m in history] == ["assistant", "user", "assistant"]
+
+
+def test_latest_message_is_sent_even_over_budget():
+    builder = ContextBuilder(budget=1, strategy=SlidingWindow(), count_tokens=_count_words)
+    assert [m["content"] for m in builder.build(_session("old", "a very long question"))] == ["a very long question"]
+
+
+def test_pinned_system_prompt_comes_first_and_uses_the_budget():
+    builder = ContextBuilder(budget=5, strategy=PinnedSystemPrompt("be brief"), count_tokens=_count_words)
+    history = builder.build(_session("one two", "three", "four five"))
+    assert history == [
+        {"role": "system", "content": "be brief"},
+        {"role": "assistant", "content": "three"},
+        {"role": "user", "content": "four five"},
+    ]
+
+
+def test_empty_system_prompt_falls_back_to_the_sliding_window():
+    builder = ContextBuilder(budget=10, strategy=PinnedSystemPrompt(""), count_tokens=_count_words)
+    assert [m["role"] for m in builder.build(_session("a", "b"))] == ["user", "assistant"]
+
+
+def test_history_is_read_newest_first_and_counted_once_per_text():
+    counted = []
+
+    def count(text):
+        counted.append(text)
+        return _count_words(text)
+
+    builder = ContextBuilder(budget=3, strategy=SlidingWindow(), count_tokens=count)
+    messages = _session(*[f"turn {number}" for number in range(1000)])
+    builder.build(messages)
+    assert counted == ["turn 999", "turn 998"]  # Stops once the budget is full
+    messages.append(Message("turn 1000", True))
+    builder.build(messages)
+    assert counted[2:] == ["turn 1000"]
@@ -0,0 +1,103 @@
+# tests/test_http_client.py
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from core import http_client
+
+
+class _Server:
+    """Answers POSTs with the queued (status, headers) responses, then 200."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.hits = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                server.hits += 1
+                status, headers = server.responses.pop(0) if server.responses else (200, {})
+                body = b"{}"
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1/chat"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http_client, "_overrides", {})
+    monkeypatch.setattr(http_client, "_rate_limit_listeners", [])
+    http_client.configure(max_retries=2, backoff_factor=0, backoff_jitter=0)
+    yield http_client
+    http_client.close_all()
+
+
+def test_retries_5xx_then_succeeds(client):
+    server = _Server([(503, {}), (502, {})])
+    try:
+        assert client.post(server.url, json={}).status_code == 200
+        assert server.hits == 3
+    finally:
+        server.close()
+
+
+def test_gives_up_after_max_retries_and_returns_last_response(client):
+    server = _Server([(503, {})] * 5)
+    try:
+        assert client.post(server.url, json={}).status_code == 503
+        assert server.hits == 3
+    finally:
+        server.close()
+
+
+def test_retried_429_is_reported(client):
+    reports = []
+    client.add_rate_limit_listener(lambda url, retry_after: reports.append((url, retry_after)))
+    server = _Server([(429, {"Retry-After": "0"})])
+    try:
+        assert client.post(server.url, json={}).status_code == 200
+        assert server.hits == 2
+        # Retry history keeps no headers, so the listener falls back to its default pause
+        assert reports == [(server.url, None)]
+    finally:
+        server.close()
+
+
+def test_final_429_reports_retry_after(client):
+    client.configure(max_retries=0)
+    reports = []
+    client.add_rate_limit_listener(lambda url, retry_after: reports.append(retry_after))
+    server = _Server([(429, {"Retry-After": "3"})])
+    try:
+        assert client.post(server.url, json={}).status_code == 429
+        assert reports == [3.0]
+    finally:
+        server.close()
+
+
+def test_sessions_are_pooled_per_host(client):
+    assert client.get_session("http://a.example/x") is client.get_session("http://a.example/y")
+    assert client.get_session("http://a.example/x") is not client.get_session("http://b.example/x")
+
+
+def test_unknown_setting_is_rejected(client):
+    with pytest.raises(ValueError):
+        client.configure(retries=1)
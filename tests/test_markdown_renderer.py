@@ -0,0 +1,188 @@
+# tests/test_markdown_renderer.py
+
+import sqlite3
+
+import pytest
+
+from advanced import markdown_renderer
+from advanced.markdown_renderer import MarkdownEngine, RenderCache
+
+
+@pytest.fixture
+def cache_path(data_dir, tmp_path):
+    return str(tmp_path / "render_cache.sqlite3")
+
+
+def _stored(path):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT key, html FROM rendered"))
+
+
+# ------------------- MarkdownEngine ------------------- #
+def test_engine_is_reset_between_documents():
+    engine = MarkdownEngine()
+    first = engine.convert("Text and *emphasis*\n\n[ref]: http://example.com")
+    assert "<em>emphasis</em>" in first
+    # Nothing (e.g. reference definitions) leaks from the previous document
+    assert engine.convert("[link][ref]") == "<p>[link][ref]</p>"
+
+
+def test_engine_highlights_fenced_code_with_classes():
+    html = MarkdownEngine().convert("```python\nx = 1\n```")
+    assert 'class="codehilite"' in html
+    assert "style=" not in html
+    assert '<span class="o">=</span>' in html
+
+
+def test_engine_renders_tables_and_line_breaks():
+    html = MarkdownEngine().convert("| a | b |\n|---|---|\n| 1 | 2 |\n\none\ntwo")
+    assert "<table>" in html and "<td>2</td>" in html
+    assert "one<br>\ntwo" in html
+
+
+# ------------------- RenderCache ------------------- #
+def test_put_without_persist_is_written_at_once(cache_path):
+    cache = RenderCache(cache_path, memory_entries=4, max_disk_entries=10)
+    cache.put("k", "<p>k</p>")
+    assert _stored(cache_path) == {"k": "<p>k</p>"}
+    cache.close()
+
+
+def test_put_with_persist_only_touches_memory_until_saved(cache_path):
+    scheduled = []
+    cache = RenderCache(cache_path, memory_entries=4, max_disk_entries=10, persist=scheduled.append)
+    cache.put("a", "<p>a</p>")
+    cache.put("b", "<p>b</p>")
+    assert scheduled == [cache.save]  # One save for the whole burst
+    assert cache._conn is None  # No disk access yet
+    assert cache.peek("a") == "<p>a</p>"
+
+    scheduled.pop()()
+    assert _stored(cache_path) == {"a": "<p>a</p>", "b": "<p>b</p>"}
+    cache.put("c", "<p>c</p>")
+    assert scheduled == [cache.save]  # A new burst schedules again
+    cache.close()
+    assert _stored(cache_path)["c"] == "<p>c</p>"
+
+
+def test_peek_never_reads_the_disk(cache_path):
+    writer = RenderCache(cache_path, memory_entries=4, max_disk_entries=10)
+    writer.put("k", "<p>k</p>")
+    writer.close()
+
+    reader = RenderCache(cache_path, memory_entries=4, max_disk_entries=10)
+    assert reader.peek("k") is None
+    assert reader._conn is None
+    assert reader.get("k") == "<p>k</p>"
+    assert reader.peek("k") == "<p>k</p>"  # Now in memory
+    reader.close()
+
+
+def test_unsaved_entries_are_found_after_leaving_memory(cache_path):
+    cache = RenderCache(cache_path, memory_entries=1, max_disk_entries=10, persist=lambda save: None)
+    cache.put("a", "<p>a</p>")
+    cache.put("b", "<p>b</p>")
+    assert cache.peek("a") == "<p>a</p>"
+
+
+def test_disk_entries_are_bounded(cache_path):
+    cache = RenderCache(cache_path, memory_entries=1, max_disk_entries=3)
+    for number in range(250):
+        cache.put(str(number), f"<p>{number}</p>")
+    cache.close()
+    reopened = RenderCache(cache_path, memory_entries=1, max_disk_entries=3)
+    reopened._db()  # Opening evicts down to the limit
+    reopened.close()
+    assert len(_stored(cache_path)) == 3
+
+
+def test_render_markdown_keeps_disk_io_off_the_calling_thread(monkeypatch, cache_path):
+    scheduled = []
+    cache = RenderCache(cache_path, memory_entries=4, max_disk_entries=10, persist=scheduled.append)
+    monkeypatch.setattr(markdown_renderer, "_cache", cache)
+    html = markdown_renderer.render_markdown("*hi*")
+    assert html == "<p><em>hi</em></p>"
+    assert markdown_renderer.cached_markdown("*hi*") == html
+    assert cache._conn is None
+    assert scheduled == [cache.save]
+
+
+# ------------------- Streaming ------------------- #
+@pytest.mark.parametrize("text, done", [
+    ("one", 0),
+    ("one\n\ntwo\n", 5),
+    ("one\n\ntwo", 0),  # The next block's first line may still be incomplete
+    ("```\na\n\nb\n```\n\nc\n", 14),  # Blank lines inside a fence are no boundary
+    ("- a\n\n- b\n", 0),  # Another item continues the list
+    ("- a\n\nb\n", 5),
+    ("> a\n\n> b\n", 0),
+    ("para\n\n    indented\n", 0),
+])
+def test_finished_length(text, done):
+    assert markdown_renderer.finished_length(text) == done
+
+
+def test_incremental_renderer_renders_finished_blocks_once(monkeypatch):
+    converted = []
+    convert = markdown_renderer._convert
+    monkeypatch.setattr(markdown_renderer, "_convert", lambda text: converted.append(text) or convert(text))
+    renderer = markdown_renderer.IncrementalRenderer()
+
+    assert renderer.update("# Title\n\nfir") == (False, "", "<h1>Title</h1>\n<p>fir</p>")
+    assert renderer.update("# Title\n\nfirst\n") == (False, "<h1>Title</h1>", "<p>first</p>")
+    assert renderer.update("# Title\n\nfirst\n\nsecond") == (False, "", "<p>first</p>\n<p>second</p>")
+    assert renderer.update("# Title\n\nfirst\n\nsecond\n") == (False, "<p>first</p>", "<p>second</p>")
+    # Each finished block was converted once, on its own
+    assert converted[-2:] == ["first\n\n", "second\n"]
+    assert converted.count("# Title\n\n") == 1
+    assert renderer.html("<p>second</p>") == "<h1>Title</h1>\n<p>first</p>\n<p>second</p>"
+
+
+def test_incremental_renderer_starts_over_when_the_text_is_replaced():
+    renderer = markdown_renderer.IncrementalRenderer()
+    renderer.update("one\n\ntwo\n")
+    assert renderer.update("other\n\nthing\n") == (True, "<p>other</p>", "<p>thing</p>")
+
+
+# ------------------- Code highlighting ------------------- #
+def _code_block(code, lang="python"):
+    return f'<pre class="codehilite"><code class="language-{lang}">{code}</code></pre>'
+
+
+def test_highlighted_blocks_are_cached_by_content(monkeypatch):
+    from markdown.extensions import codehilite
+
+    highlighted = []
+    hilite = codehilite.CodeHilite.hilite
+    monkeypatch.setattr(codehilite.CodeHilite, "hilite",
+                        lambda self, **kwargs: highlighted.append(self.src) or hilite(self, **kwargs))
+    highlighter = markdown_renderer._CodeHighlighter(entries=2)
+
+    first = highlighter.run(_code_block("x = 1"))
+    assert highlighter.run("<p>again</p>" + _code_block("x = 1")) == "<p>again</p>" + first
+    assert highlighted == ["x = 1"]
+    highlighter.run(_code_block("x = 1", lang="ruby"))  # Another language is another entry
+    highlighter.run(_code_block("y = 2"))  # Pushes the python "x = 1" out
+    highlighter.run(_code_block("x = 1"))
+    assert highlighted == ["x = 1", "x = 1", "y = 2", "x = 1"]
+
+
+def test_spans_that_no_theme_colors_are_dropped():
+    html = markdown_renderer._CodeHighlighter().run(_code_block("print(x)"))
+    kept = markdown_renderer._styled_classes()
+    classes = set(markdown_renderer._CLASS.findall(html)) - {"codehilite"}
+    assert classes and classes <= kept
+    assert '<span class="w">' not in html
+    assert "style=" not in html
+
+
+def test_code_stylesheet_follows_the_theme_and_the_classes_used():
+    html = MarkdownEngine().convert("```python\nprint(1)\n```")
+    light = markdown_renderer.code_stylesheet(html, theme="light")
+    dark = markdown_renderer.code_stylesheet(html, theme="dark")
+    assert light != dark
+    assert ".codehilite {" in light
+    rules = {line.split(" ", 1)[0][1:] for line in dark.splitlines()}
+    assert rules <= set(markdown_renderer._CLASS.findall(html))
+    # The full stylesheet covers every class of the style
+    assert len(markdown_renderer.code_stylesheet(theme="dark").splitlines()) > len(dark.splitlines())
@@ -0,0 +1,56 @@
+# tests/test_message.py
+
+import json
+
+from core.message import Message, attachment_line, legacy_message_id
+from core.session_journal import JournalSessionStore, SessionJournal
+
+
+def test_message_unpacks_like_the_old_tuple():
+    text, is_user, sender = Message("hi", 1, "You")
+    assert (text, is_user, sender) == ("hi", True, "You")
+    assert Message("hi", True, "You")[2] == "You"
+
+
+def test_body_and_attachments_are_derived_from_text():
+    message = Message("look\n" + attachment_line("blob:abc/a.png"), True, "You")
+    assert message.body == "look"
+    assert message.attachments == ("blob:abc/a.png",)
+    assert not hasattr(message, "__dict__")
+    message.text = "plain"
+    assert message.attachments == ()
+
+
+def test_encode_decode_round_trip():
+    message = Message("hi", False, "AI", id=42, timestamp=1.5)
+    decoded = Message.decode(message.encode())
+    assert (decoded.text, decoded.is_user, decoded.sender, decoded.id, decoded.timestamp) == ("hi", False, "AI", 42, 1.5)
+
+
+def test_legacy_entries_get_the_same_id_on_every_load():
+    first = Message.decode(["ok", True, "You"], 0)
+    assert Message.decode(["ok", True, "You"], 0).id == first.id
+    # The same text later in the session is a different message
+    assert Message.decode(["ok", True, "You"], 1).id != first.id
+    assert first.id == legacy_message_id(0, "ok", True, "You")
+    assert first.id < Message("new", True, "You").id
+    assert first.timestamp == 0
+
+
+def test_legacy_journal_ids_survive_reloads(tmp_path):
+    path = tmp_path / "ai_chat_sessions.journal"
+    records = [{"op": "create", "session": "s"}] + [
+        {"op": "append", "session": "s", "message": ["same", True, "You"]} for _ in range(2)
+    ]
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+    def ids():
+        store = JournalSessionStore(lambda mode: SessionJournal(str(path)))
+        try:
+            return store.message_ids("AI Chat", "s")
+        finally:
+            store.close()
+
+    first = ids()
+    assert len(first) == 2
+    assert ids() == first
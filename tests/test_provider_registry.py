@@ -0,0 +1,86 @@
+# tests/test_provider_registry.py
+
+import os
+import sys
+
+import pytest
+
+from core import provider_registry
+from core.provider_registry import ProviderError, ProviderNotFoundError, ProviderRegistry
+
+
+@pytest.fixture
+def apis_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(provider_registry, "RELOAD_CHECK_INTERVAL", 0)
+    yield tmp_path
+    for name in [name for name in sys.modules if name.startswith(provider_registry.PACKAGE_PREFIX + ".test_")]:
+        del sys.modules[name]
+
+
+def _write(apis_dir, name, source, mtime=1000.0):
+    path = apis_dir / f"{name}.py"
+    path.write_text(source)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_resolves_query_stream_and_model(apis_dir):
+    _write(apis_dir, "test_echo", "MODEL = 'echo-1'\n"
+                                  "def query(text, messages=None): return text\n"
+                                  "def stream(text, messages=None): yield text\n")
+    provider = ProviderRegistry(str(apis_dir)).resolve(" Test Echo ")
+    assert provider.query("hi") == "hi"
+    assert list(provider.stream("hi")) == ["hi"]
+    assert (provider.module_name, provider.model, provider.accepts_messages) == ("test_echo", "echo-1", True)
+
+
+def test_messages_support_needs_both_callables(apis_dir):
+    _write(apis_dir, "test_partial", "def query(text, **kwargs): return text\n"
+                                     "def stream(text): yield text\n")
+    assert not ProviderRegistry(str(apis_dir)).resolve("test_partial").accepts_messages
+
+
+def test_edited_module_is_reloaded(apis_dir):
+    _write(apis_dir, "test_reload", "def query(text): return 'old'\n")
+    registry = ProviderRegistry(str(apis_dir))
+    first = registry.resolve("test_reload")
+    assert registry.resolve("test_reload") is first  # Unchanged file: no re-import
+
+    _write(apis_dir, "test_reload", "def query(text): return 'new'\n", mtime=2000.0)
+    assert registry.resolve("test_reload").query("x") == "new"
+
+
+def test_files_are_not_checked_again_within_the_interval(apis_dir, monkeypatch):
+    _write(apis_dir, "test_interval", "def query(text): return 'old'\n")
+    registry = ProviderRegistry(str(apis_dir))
+    registry.resolve("test_interval")
+    monkeypatch.setattr(provider_registry, "RELOAD_CHECK_INTERVAL", 60)
+    _write(apis_dir, "test_interval", "def query(text): return 'new'\n", mtime=2000.0)
+    assert registry.resolve("test_interval").query("x") == "old"
+    registry.invalidate("test_interval")
+    assert registry.resolve("test_interval").query("x") == "new"
+
+
+def test_removed_module_is_reported_as_missing(apis_dir):
+    path = _write(apis_dir, "test_removed", "def query(text): return text\n")
+    registry = ProviderRegistry(str(apis_dir))
+    registry.resolve("test_removed")
+    path.unlink()
+    with pytest.raises(ProviderNotFoundError):
+        registry.resolve("test_removed")
+
+
+def test_module_without_query_is_rejected(apis_dir):
+    _write(apis_dir, "test_broken", "QUERY = None\n")
+    with pytest.raises(ProviderError):
+        ProviderRegistry(str(apis_dir)).resolve("test_broken")
+
+
+def test_builtins_take_precedence_and_discover_skips_broken_modules(apis_dir):
+    _write(apis_dir, "test_good", "def query(text): return 'file'\n")
+    _write(apis_dir, "test_bad", "raise RuntimeError('broken')\n")
+    registry = ProviderRegistry(str(apis_dir))
+    registry.register_builtin("Test_Good", lambda text: "builtin")
+    registry.discover()
+    assert registry.resolve("test_good").query("x") == "builtin"
+    assert "test_bad" not in registry._providers
@@ -0,0 +1,159 @@
+# tests/test_request_executor.py
+
+import threading
+import time
+
+import pytest
+
+from core import request_executor
+from core.request_executor import RequestExecutor
+from core.scheduler import RequestScheduler
+
+
+class _Provider:
+    """Stands in for the API: streams the chunks given per prompt, optionally after a gate opens."""
+
+    def __init__(self):
+        self.calls = []
+        self.cached = {}
+        self.gate = None
+
+    def stream(self, text, profile_name, messages=None):
+        self.calls.append(text)
+        if self.gate is not None:
+            self.gate.wait(5)
+        yield from text.split()
+
+    def get_cached(self, text, profile_name, messages=None):
+        return self.cached.get(text)
+
+    def cache(self, text, profile_name, reply, messages=None):
+        self.cached[text] = reply
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = _Provider()
+    monkeypatch.setattr(request_executor, "stream_api", provider.stream)
+    monkeypatch.setattr(request_executor, "get_cached_reply", provider.get_cached)
+    monkeypatch.setattr(request_executor, "cache_reply", provider.cache)
+    return provider
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RequestScheduler(max_concurrent=1, rate_limits={}, default_rate_limit=(1000, 1000))
+    monkeypatch.setattr(request_executor, "get_scheduler", lambda: scheduler)
+    yield scheduler
+    scheduler.close()
+
+
+@pytest.fixture
+def executor(qapp, provider, scheduler):
+    executor = RequestExecutor(max_workers=1)
+    events = []
+    executor.chunk_received.connect(lambda request_id, chunk: events.append(("chunk", request_id, chunk)))
+    executor.reply_ready.connect(lambda request_id, reply, cached: events.append(("reply", request_id, reply, cached)))
+    executor.request_cancelled.connect(lambda request_id, reason: events.append(("cancelled", request_id, reason)))
+    executor.events = events
+    yield executor
+    executor.cancel_all()
+    if provider.gate is not None:
+        provider.gate.set()
+    executor.pool.waitForDone(5000)
+    qapp.processEvents()
+
+
+def _wait_until(qapp, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        qapp.processEvents()
+        time.sleep(0.005)
+
+
+def _hold_slot(scheduler):
+    """Take the scheduler's only slot; returns the ticket to release()."""
+    admitted = threading.Event()
+    ticket = scheduler.submit("other", lambda ticket: admitted.set())
+    assert admitted.wait(5)
+    return ticket
+
+
+class _PoolWatch:
+    """Wraps a task's pool to tell when the scheduler has handed the task to it."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.started = threading.Event()
+
+    def start(self, runnable):
+        self.pool.start(runnable)
+        self.started.set()
+
+
+def test_streams_and_caches_the_reply(qapp, executor, provider):
+    request_id = executor.submit("hello there", "deepseek")
+    _wait_until(qapp, lambda: not executor.is_pending(request_id))
+    assert executor.events == [
+        ("chunk", request_id, "hello"), ("chunk", request_id, "there"), ("reply", request_id, "hellothere", False),
+    ]
+    assert provider.cached == {"hello there": "hellothere"}
+
+
+def test_cache_hit_skips_the_scheduler_and_the_provider(qapp, executor, provider, scheduler):
+    provider.cached["hello"] = "from cache"
+    _hold_slot(scheduler)  # Would keep a real request waiting
+    request_id = executor.submit("hello", "deepseek")
+    _wait_until(qapp, lambda: not executor.is_pending(request_id))
+    assert executor.events == [("reply", request_id, "from cache", True)]
+    assert provider.calls == []
+
+
+def test_cancel_while_queued_in_the_scheduler(qapp, executor, provider, scheduler):
+    held = _hold_slot(scheduler)
+    request_id = executor.submit("queued", "deepseek")
+    task = executor._pending[request_id]
+    _wait_until(qapp, lambda: task.ticket is not None)
+
+    executor.cancel(request_id)
+    assert task.ticket.cancelled
+    scheduler.release(held)
+    # The slot is free again: the next request runs
+    other = executor.submit("next one", "deepseek")
+    _wait_until(qapp, lambda: not executor.is_pending(other))
+    assert provider.calls == ["next one"]
+    assert executor.events[0] == ("cancelled", request_id, "cancelled")
+
+
+def test_cancel_after_admission_but_before_running_gives_the_slot_back(qapp, executor, provider, scheduler):
+    held = _hold_slot(scheduler)
+    request_id = executor.submit("admitted", "deepseek")
+    task = executor._pending[request_id]
+    _wait_until(qapp, lambda: task.ticket is not None)
+
+    # Fill the pool, then let the scheduler admit the request behind the blocker
+    blocker = threading.Event()
+    executor.pool.start(lambda: blocker.wait(5))
+    task.pool = _PoolWatch(task.pool)
+    scheduler.release(held)
+    assert task.pool.started.wait(5)
+    executor.cancel(request_id)
+    assert scheduler._running == 0
+    blocker.set()
+
+    other = executor.submit("next one", "deepseek")
+    _wait_until(qapp, lambda: not executor.is_pending(other))
+    assert provider.calls == ["next one"]
+
+
+def test_cancel_while_streaming_discards_the_reply(qapp, executor, provider):
+    provider.gate = threading.Event()
+    request_id = executor.submit("slow reply", "deepseek")
+    _wait_until(qapp, lambda: provider.calls)
+    executor.cancel(request_id, "timeout")
+    provider.gate.set()
+    executor.pool.waitForDone(5000)
+    qapp.processEvents()
+    assert executor.events == [("cancelled", request_id, "timeout")]
+    assert provider.cached == {}
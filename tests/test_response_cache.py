@@ -0,0 +1,49 @@
+# tests/test_response_cache.py
+
+import pytest
+
+from core import api_manager, response_cache
+from core.api_manager import ErrorChunk, cache_reply, get_cached_reply, is_error_reply
+from core.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(data_dir, tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "response_cache.sqlite3"))
+    monkeypatch.setenv("FOXCHAT_RESPONSE_CACHE", "1")
+    monkeypatch.setattr(response_cache, "_default_cache", cache)
+    monkeypatch.setattr(response_cache, "_bypassed_profiles", set())
+    monkeypatch.setattr(api_manager, "get_profile_model", lambda profile_name: "model")
+    yield cache
+    cache.close()
+
+
+def test_error_replies_are_recognized():
+    assert is_error_reply("❌ Request failed")
+    assert is_error_reply("⚠️ Rate limited")
+    assert is_error_reply(ErrorChunk("partial text, then the stream broke"))
+    assert not is_error_reply("A normal answer")
+
+
+def test_good_reply_is_cached(cache):
+    cache_reply("hello", "deepseek", "Hi there")
+    assert get_cached_reply("hello  ", "deepseek") == "Hi there"
+
+
+@pytest.mark.parametrize("reply", ["❌ Request failed", "⚠️ Rate limited", ErrorChunk("Hi th")])
+def test_error_reply_is_not_cached(cache, reply):
+    cache_reply("hello", "deepseek", reply)
+    assert get_cached_reply("hello", "deepseek") is None
+
+
+def test_bypassed_profile_is_not_cached(cache):
+    response_cache._bypassed_profiles.add("deepseek")
+    cache_reply("hello", "deepseek", "Hi there")
+    assert get_cached_reply("hello", "deepseek") is None
+
+
+def test_expired_entries_are_dropped(data_dir, tmp_path):
+    cache = ResponseCache(str(tmp_path / "response_cache.sqlite3"), ttl_seconds=-1)
+    cache.put("key", "deepseek", "reply")
+    assert cache.get("key") is None
+    cache.close()
@@ -0,0 +1,112 @@
+# tests/test_scheduler.py
+
+import time
+
+import pytest
+
+from core.scheduler import BACKGROUND, BATCH, DEFAULT_RATE_LIMIT_PAUSE, INTERACTIVE, RequestScheduler, TokenBucket
+
+
+def _bucket(rate=2.0, burst=3, now=100.0):
+    bucket = TokenBucket(rate, burst)
+    bucket.updated = now
+    return bucket
+
+
+def test_burst_then_waits_for_refill():
+    bucket = _bucket()
+    for _ in range(3):
+        assert bucket.wait_time(100.0) == 0
+        bucket.take(100.0)
+    assert bucket.wait_time(100.0) == 0.5
+    assert bucket.wait_time(100.5) == 0
+
+
+def test_refill_is_capped_at_burst():
+    bucket = _bucket()
+    bucket.take(100.0)
+    bucket.wait_time(1000.0)
+    assert bucket.tokens == 3
+
+
+def test_penalize_blocks_for_retry_after_and_halves_rate():
+    bucket = _bucket()
+    bucket.penalize(100.0, retry_after=4)
+    assert bucket.wait_time(101.0) == 3.0
+    assert bucket.rate == 1.0
+    assert bucket.tokens == 0
+
+
+def test_penalize_without_retry_after_uses_default_pause():
+    bucket = _bucket()
+    bucket.penalize(100.0, retry_after=None)
+    assert bucket.wait_time(100.0) == DEFAULT_RATE_LIMIT_PAUSE
+
+
+def test_rate_floor_and_recovery():
+    bucket = _bucket(rate=8.0)
+    for _ in range(10):
+        bucket.penalize(100.0, retry_after=1)
+    assert bucket.rate == 1.0
+    for _ in range(20):
+        bucket.reward()
+    assert bucket.rate == 8.0
+
+
+@pytest.mark.parametrize("rate, burst", [(0, 5), (-1, 5), (1, 0)])
+def test_invalid_rate_limit_is_rejected(rate, burst):
+    with pytest.raises(ValueError):
+        TokenBucket(rate, burst)
+    with pytest.raises(ValueError):
+        RequestScheduler(rate_limits={"p": (rate, burst)})
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = RequestScheduler(max_concurrent=1, rate_limits={"p": (1000, 1000)}, default_rate_limit=(1000, 1000))
+    yield scheduler
+    scheduler.close()
+
+
+def test_priority_order_once_a_slot_frees(scheduler):
+    started = []
+    first = scheduler.submit("p", lambda ticket: started.append("first"))
+    _wait_for(lambda: started)
+    for name, priority in [("batch", BATCH), ("background", BACKGROUND), ("interactive", INTERACTIVE)]:
+        scheduler.submit("p", lambda ticket, name=name: (started.append(name), scheduler.release(ticket)), priority)
+    scheduler.release(first)
+    _wait_for(lambda: len(started) == 4)
+    assert started == ["first", "interactive", "background", "batch"]
+
+
+def test_raising_max_concurrent_wakes_the_dispatcher(scheduler):
+    started = []
+    for _ in range(3):
+        scheduler.submit("p", lambda ticket: started.append(ticket))
+    _wait_for(lambda: len(started) == 1)
+    scheduler.set_max_concurrent(3)
+    _wait_for(lambda: len(started) == 3)
+    assert scheduler.stats()["running"] == 3
+    with pytest.raises(ValueError):
+        scheduler.set_max_concurrent(0)
+
+
+def test_cancelled_ticket_never_starts(scheduler):
+    started = []
+    first = scheduler.submit("p", lambda ticket: started.append("first"))
+    _wait_for(lambda: started)
+    second = scheduler.submit("p", lambda ticket: started.append("second"))
+    assert scheduler.queue_position(second) == 0
+    assert scheduler.cancel(second)
+    assert not scheduler.cancel(first)
+    scheduler.release(first)
+    time.sleep(0.05)
+    assert started == ["first"]
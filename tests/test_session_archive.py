@@ -0,0 +1,104 @@
+# tests/test_session_archive.py
+
+import os
+import time
+
+import pytest
+
+from core.message import Message
+from core.session_archive import SessionArchive
+from core.session_db import SessionDatabase
+
+MODE = "AI Chat"
+
+
+def _store_with_session(tmp_path, count=3):
+    store = SessionDatabase(str(tmp_path / "sessions.sqlite3"))
+    store.create_session(MODE, "old")
+    store.append_messages(MODE, "old", [Message(f"message {i}", i % 2 == 0, "You") for i in range(count)])
+    return store
+
+
+def test_archive_and_restore_round_trip(tmp_path):
+    store = _store_with_session(tmp_path)
+    archive = SessionArchive(str(tmp_path / "archive"), codec="zlib")
+
+    archive.archive(store, MODE, "old", updated=time.time())
+    assert store.list_sessions(MODE) == []
+    assert archive.names(MODE) == ["old"]
+    assert [m.text for m in archive.read(MODE, "old")] == ["message 0", "message 1", "message 2"]
+
+    assert archive.restore(store, MODE, "old")
+    assert [m.text for m in store.load_messages(MODE, "old")] == ["message 0", "message 1", "message 2"]
+    assert archive.names(MODE) == []
+    assert not archive.restore(store, MODE, "old")
+    store.close()
+
+
+def test_restore_after_crash_keeps_one_copy(tmp_path):
+    # A crash after the archive was written but before the store row was dropped
+    store = _store_with_session(tmp_path)
+    archive = SessionArchive(str(tmp_path / "archive"), codec="zlib")
+    archive.archive(store, MODE, "old", updated=time.time())
+    store.create_session(MODE, "old")
+    store.append_messages(MODE, "old", archive.read(MODE, "old"))
+
+    reopened = SessionArchive(str(tmp_path / "archive"), codec="zlib")
+    assert reopened.restore(store, MODE, "old")
+    assert store.count_messages(MODE, "old") == 3
+    assert reopened.names(MODE) == []
+    assert os.listdir(tmp_path / "archive" / "ai_chat") == []
+    store.close()
+
+
+def test_restore_after_crash_with_partial_store_copy(tmp_path):
+    store = _store_with_session(tmp_path)
+    archive = SessionArchive(str(tmp_path / "archive"), codec="zlib")
+    archive.archive(store, MODE, "old", updated=time.time())
+    store.create_session(MODE, "old")
+    store.append_message(MODE, "old", Message("message 0", True, "You"))
+
+    assert archive.restore(store, MODE, "old")
+    assert [m.text for m in store.load_messages(MODE, "old")] == ["message 0", "message 1", "message 2"]
+    store.close()
+
+
+def test_archived_sessions_stay_searchable(tmp_path):
+    store = _store_with_session(tmp_path)
+    if not store.fts_enabled:
+        store.close()
+        pytest.skip("SQLite without FTS5")
+    archive = SessionArchive(str(tmp_path / "archive"), codec="zlib")
+    archive.archive(store, MODE, "old", updated=time.time())
+    assert [hit[0] for hit in store.search_archived(MODE, "message")] == ["old"] * 3
+
+    archive.restore(store, MODE, "old")
+    assert store.search_archived(MODE, "message") == []
+    store.close()
+
+
+def test_archive_if_idle_skips_recent_sessions(tmp_path):
+    store = _store_with_session(tmp_path)
+    archive = SessionArchive(str(tmp_path / "archive"), codec="zlib")
+    assert archive.idle_sessions(store, MODE, idle_seconds=3600) == []
+    assert not archive.archive_if_idle(store, MODE, "old", idle_seconds=3600)
+    assert store.list_sessions(MODE) == ["old"]
+    store.close()
+
+
+def test_size_of_old_archive_entries_is_unknown_until_measured(data_dir):
+    data_dir.create_session(MODE, "old")
+    data_dir.append_message(MODE, "old", Message("x" * 5000, True, "You"))
+    data_dir.flush_writes()
+    archive = data_dir._archive
+    store = data_dir.get_session_store()
+    archive.archive(store, MODE, "old", updated=time.time())
+    del archive._entries(MODE)["old"]["size"]  # As written before the size was recorded
+
+    info, = data_dir.list_session_info(MODE)
+    assert info.bytes is None
+    assert archive.unmeasured(MODE) == ["old"]
+    archive.measure(MODE, "old")
+    info, = data_dir.list_session_info(MODE)
+    assert (info.name, info.count, info.bytes) == ("old", 1, 5000)
+    assert archive.unmeasured(MODE) == []
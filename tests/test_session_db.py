@@ -0,0 +1,85 @@
+# tests/test_session_db.py
+
+import pytest
+
+from core.message import Message
+from core.session_db import SessionDatabase
+
+
+def test_legacy_data_is_imported_once_per_mode(tmp_path):
+    calls = []
+
+    def legacy_loader(mode):
+        calls.append(mode)
+        return {"old": [["question", True, "You"], Message("answer", False, "AI", id=7, timestamp=5.0)]}
+
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"), legacy_loader)
+    assert db.list_sessions("AI Chat") == ["old"]
+    assert [m.text for m in db.load_messages("AI Chat", "old")] == ["question", "answer"]
+    assert db.load_messages("AI Chat", "old")[1].id == 7
+    db.append_message("AI Chat", "old", Message("more", True, "You"))
+    db.close()
+
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"), legacy_loader)
+    assert db.count_messages("AI Chat", "old") == 3
+    assert calls == ["AI Chat"]
+    db.close()
+
+
+def test_modes_are_migrated_separately(tmp_path):
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"), lambda mode: {mode + " chat": []})
+    assert db.list_sessions("AI Chat") == ["AI Chat chat"]
+    assert db.list_sessions("Anonymous Chat") == ["Anonymous Chat chat"]
+    db.close()
+
+
+def test_message_ids_cover_migrated_and_new_messages(tmp_path):
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"))
+    db.create_session("AI Chat", "s")
+    db.append_messages("AI Chat", "s", [Message("a", True, "You", id=1), Message("b", False, "AI", id=2)])
+    assert db.message_ids("AI Chat", "s") == {1, 2}
+    db.close()
+
+
+def test_failed_import_is_retried(tmp_path):
+    attempts = []
+
+    def legacy_loader(mode):
+        attempts.append(mode)
+        if len(attempts) == 1:
+            raise OSError("disk went away")
+        return {"old": [["hello", True, "You"]]}
+
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"), legacy_loader)
+    with pytest.raises(OSError):
+        db.migrate("AI Chat")
+    assert db.list_sessions("AI Chat") == ["old"]
+    assert len(attempts) == 2
+    db.close()
+
+
+def test_import_in_a_rolled_back_batch_is_not_marked_done(tmp_path):
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"), lambda mode: {"old": []})
+    with pytest.raises(RuntimeError):
+        with db.batch():
+            db.migrate("AI Chat")
+            raise RuntimeError("writer batch failed")
+    assert db.list_sessions("AI Chat") == ["old"]
+    db.close()
+
+
+def test_failed_import_leaves_the_enclosing_batch_intact(tmp_path):
+    def legacy_loader(mode):
+        if mode == "Anonymous Chat":
+            raise ValueError("corrupt legacy file")
+        return {}
+
+    db = SessionDatabase(str(tmp_path / "sessions.sqlite3"), legacy_loader)
+    with db.batch():
+        db.create_session("AI Chat", "kept")
+        with pytest.raises(ValueError):
+            db.migrate("Anonymous Chat")
+    assert db.list_sessions("AI Chat") == ["kept"]
+    with pytest.raises(ValueError):
+        db.list_sessions("Anonymous Chat")
+    db.close()
@@ -0,0 +1,59 @@
+# tests/test_session_journal.py
+
+import json
+
+from core.message import Message
+from core.session_journal import SessionJournal, replay
+
+
+def _line(record):
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+
+def test_replay_stops_at_torn_tail():
+    data = (_line({"op": "create", "session": "a"})
+            + _line({"op": "append", "session": "a", "message": ["hi", True, "You", 1, 1.0]}))
+    sessions, records, good_length = replay(data + b'{"op": "append", "sess')
+    assert records == 2
+    assert good_length == len(data)
+    assert [m.text for m in sessions["a"]] == ["hi"]
+
+
+def test_replay_skips_corrupt_complete_line():
+    data = _line({"op": "create", "session": "a"}) + b"not json\n" + _line({"op": "create", "session": "b"})
+    sessions, records, good_length = replay(data)
+    assert sorted(sessions) == ["a", "b"]
+    assert records == 2
+    assert good_length == len(data)
+
+
+def test_load_truncates_torn_tail_and_keeps_appending(tmp_path):
+    path = tmp_path / "ai_chat_sessions.journal"
+    journal = SessionJournal(str(path))
+    journal.create("a")
+    journal.append("a", Message("first", True, "You"))
+    journal.close()
+    good = path.read_bytes()
+    with open(path, "ab") as f:
+        f.write(b'{"op":"append","session":"a","mess')
+
+    journal = SessionJournal(str(path))
+    assert [m.text for m in journal.load()["a"]] == ["first"]
+    assert path.read_bytes() == good
+
+    journal.append("a", Message("second", False, "AI"))
+    journal.close()
+    assert [m.text for m in SessionJournal(str(path)).load()["a"]] == ["first", "second"]
+
+
+def test_load_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / "ai_chat_sessions.json"
+    legacy.write_text(json.dumps({"old": [["hello", True, "You"]]}), encoding="utf-8")
+    path = tmp_path / "ai_chat_sessions.journal"
+
+    sessions = SessionJournal(str(path), legacy_path=str(legacy)).load()
+    assert [m.text for m in sessions["old"]] == ["hello"]
+    assert path.exists()
+
+    legacy.write_text(json.dumps({"changed": []}), encoding="utf-8")
+    assert list(SessionJournal(str(path), legacy_path=str(legacy)).load()) == ["old"]
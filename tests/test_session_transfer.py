@@ -0,0 +1,79 @@
+# tests/test_session_transfer.py
+
+import io
+import json
+
+from core import session_transfer
+from core.message import Message
+from core.session_transfer import MessageFilter, export_jsonl, import_jsonl, parse_date
+
+MODE = "AI Chat"
+
+
+def _fill(file_manager):
+    file_manager.create_session(MODE, "a")
+    file_manager.append_message(MODE, "a", Message("old", True, "You", timestamp=parse_date("2024-01-01")))
+    file_manager.append_message(MODE, "a", Message("new", False, "AI", timestamp=parse_date("2025-06-01")))
+    file_manager.create_session(MODE, "b")
+    file_manager.append_message(MODE, "b", Message("other", True, "You", timestamp=parse_date("2025-06-01")))
+    file_manager.flush_writes()
+
+
+def _export(selection=MessageFilter()):
+    out = io.StringIO()
+    count = export_jsonl(out, selection)
+    return count, out.getvalue().splitlines()
+
+
+def test_export_writes_one_record_per_message(data_dir):
+    _fill(data_dir)
+    count, lines = _export()
+    assert count == 3
+    records = [json.loads(line) for line in lines]
+    assert [(r["session"], r["text"]) for r in records] == [("a", "old"), ("a", "new"), ("b", "other")]
+    assert set(records[0]) == {"mode", "session", "id", "timestamp", "is_user", "sender", "text"}
+
+
+def test_export_filters_by_session_and_date(data_dir):
+    _fill(data_dir)
+    assert _export(MessageFilter(sessions=["b"]))[0] == 1
+    assert _export(MessageFilter(since=parse_date("2025-01-01")))[0] == 2
+    assert _export(MessageFilter(until=parse_date("2025-01-01")))[0] == 1
+    assert _export(MessageFilter(modes=["Anonymous Chat"]))[0] == 0
+
+
+def test_import_round_trip_and_reimport_is_a_no_op(data_dir):
+    _fill(data_dir)
+    _count, lines = _export()
+    data_dir.delete_session(MODE, "a")
+    data_dir.flush_writes()
+
+    assert import_jsonl(lines, MessageFilter()) == (2, 1)
+    assert [m.text for m in data_dir.load_session_messages(MODE, "a")] == ["old", "new"]
+    assert import_jsonl(lines, MessageFilter()) == (0, 3)
+    assert data_dir.count_session_messages(MODE, "a") == 2
+
+
+def test_duplicate_records_in_one_file_are_imported_once(data_dir):
+    record = json.dumps({"mode": MODE, "session": "s", "id": 5, "timestamp": 1.0, "is_user": True,
+                         "sender": "You", "text": "hi"})
+    assert import_jsonl([record, record], MessageFilter()) == (1, 1)
+
+
+def test_malformed_lines_are_reported_and_skipped(data_dir, capsys):
+    lines = ["not json", json.dumps({"session": "s", "text": "no mode"}),
+             json.dumps({"mode": MODE, "session": "s", "text": "ok"}), ""]
+    assert import_jsonl(lines, MessageFilter(), "input.jsonl") == (1, 0)
+    errors = capsys.readouterr().err
+    assert "input.jsonl:1: skipped" in errors
+    assert "input.jsonl:2: skipped" in errors
+
+
+def test_run_reports_skipped_messages(data_dir, tmp_path, capsys):
+    _fill(data_dir)
+    path = tmp_path / "export.jsonl"
+    assert session_transfer.run("export", str(path), MessageFilter()) == 0
+    assert session_transfer.run("import", str(path), MessageFilter()) == 0
+    errors = capsys.readouterr().err
+    assert "Exported 3 messages" in errors
+    assert "Skipped 3 messages already present" in errors
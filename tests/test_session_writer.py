@@ -0,0 +1,89 @@
+# tests/test_session_writer.py
+
+import threading
+from contextlib import contextmanager
+
+from core.message import Message
+from core.session_journal import JournalSessionStore, SessionJournal
+from core.session_writer import SessionWriter
+
+
+class _Store:
+    @contextmanager
+    def batch(self):
+        yield self
+
+
+def test_flush_with_keys_only_waits_for_matching_changes():
+    writer = SessionWriter(_Store(), interval=0.01)
+    release = threading.Event()
+    done = []
+    writer.submit(lambda store: (release.wait(5), done.append("slow")), keys=["slow"])
+    assert writer.flush(timeout=0, keys=["other"])
+    assert not writer.flush(timeout=0.05, keys=["slow"])
+    release.set()
+    assert writer.flush(timeout=5, keys=["slow"])
+    assert done == ["slow"]
+    writer.close()
+
+
+def test_changes_apply_in_submission_order():
+    writer = SessionWriter(_Store(), interval=0.01)
+    applied = []
+    for i in range(5):
+        writer.submit(lambda store, i=i: applied.append(i), keys=[i % 2])
+    assert writer.flush(timeout=5)
+    assert applied == [0, 1, 2, 3, 4]
+    writer.close()
+
+
+def test_failed_change_does_not_stop_the_batch():
+    writer = SessionWriter(_Store(), interval=0.01)
+    applied = []
+    writer.submit(lambda store: 1 / 0)
+    writer.submit(lambda store: applied.append("after"))
+    assert writer.flush(timeout=5)
+    assert applied == ["after"]
+    writer.close()
+
+
+def test_journal_store_reads_do_not_wait_for_the_batch_fsync(tmp_path, monkeypatch):
+    store = JournalSessionStore(lambda mode: SessionJournal(str(tmp_path / "ai_chat_sessions.journal")))
+    store.create_session("AI Chat", "s")
+    syncing = threading.Event()
+    release = threading.Event()
+    real_sync = SessionJournal.sync
+
+    def slow_sync(journal):
+        syncing.set()
+        release.wait(5)
+        real_sync(journal)
+
+    monkeypatch.setattr(SessionJournal, "sync", slow_sync)
+    writer = SessionWriter(store, interval=0.01)
+    writer.submit(lambda store: store.append_message("AI Chat", "s", Message("hi", True, "You")))
+    assert syncing.wait(5)
+    # The change is applied in memory; only its fsync is still running
+    counts = []
+    reader = threading.Thread(target=lambda: counts.append(store.count_messages("AI Chat", "s")))
+    reader.start()
+    reader.join(1)
+    release.set()
+    assert counts == [1]
+    assert writer.flush(timeout=5)
+    writer.close()
+    store.close()
+    assert [m.text for m in SessionJournal(str(tmp_path / "ai_chat_sessions.journal")).load()["s"]] == ["hi"]
+
+
+def test_nested_journal_batches_sync_once_at_the_end(tmp_path, monkeypatch):
+    store = JournalSessionStore(lambda mode: SessionJournal(str(tmp_path / "ai_chat_sessions.journal")))
+    store.create_session("AI Chat", "s")
+    syncs = []
+    monkeypatch.setattr(SessionJournal, "sync", lambda journal: syncs.append(journal))
+    with store.batch():
+        with store.batch():
+            store.append_message("AI Chat", "s", Message("a", True, "You"))
+        assert syncs == []
+    assert len(syncs) == 1
+    store.close()
@@ -1,23 +1,499 @@
 # foxchat/ui/chat_area.py
 
+import itertools
+import math
 import os
+from collections import OrderedDict
+
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QScrollArea, QLabel, QFrame
+    QWidget, QVBoxLayout, QLabel, QFrame, QPushButton, QListView, QStyledItemDelegate,
+    QStyle, QStyleOption, QToolTip, QMenu, QApplication, QAbstractItemView
+)
+from PyQt6.QtCore import (
+    Qt, QUrl, QTimer, pyqtSignal, QAbstractListModel, QModelIndex, QRect, QSize, QPoint, QPointF
+)
+from PyQt6.QtGui import (
+    QPixmap, QPixmapCache, QCursor, QDesktopServices, QFont, QFontMetrics, QTextDocument,
+    QAbstractTextDocumentLayout, QPalette, QPen, QColor, QPainter, QTextCursor, QTextDocumentFragment
 )
-from PyQt6.QtCore import Qt, QUrl
-from PyQt6.QtGui import QPixmap, QCursor, QDesktopServices, QFont
 
-from ui.message_bubble import MessageBubble
-from advanced.markdown_renderer import render_markdown
+from advanced.markdown_renderer import (
+    IncrementalRenderer, RenderQueue, cached_markdown, code_stylesheet, placeholder_html, render_markdown
+)
 from advanced.file_preview_widget import is_image_file
+from core.blob_store import display_name
+from core.file_manager import attachment_path, attachment_open_path, attachment_cache_path, attachment_text
+from core.message import Message, parse_attachments
+
+# Streamed replies are re-rendered at most this often
+STREAM_UPDATE_INTERVAL_MS = 200
+THUMBNAIL_WIDTH = 300
+
+# Row geometry (px)
+ROW_MARGIN = 15  # Left/right edge of the chat
+ROW_SPACING = 15  # Between rows
+GROUP_SPACING = 10  # Between side-by-side bubbles of a fan-out row
+BUBBLE_PADDING = (10, 5)  # Inside the themed bubble frame, on top of its QSS padding
+BUBBLE_MAX_WIDTH = 0.75  # Of the chat width
+SENDER_GAP = 4
+ITEM_SPACING = 5  # Between text and file previews inside a bubble
+HIGHLIGHT_MS = 2000
+# Laid-out QTextDocuments kept for repainting and link hit-tests
+DOCUMENT_CACHE_SIZE = 300
+# Rows above/below the viewport rendered ahead of scrolling
+PREFETCH_ROWS = 20
+# Finished renders are laid out together, at most this often
+RENDER_BATCH_MS = 20
+
+RowRole = Qt.ItemDataRole.UserRole + 1
+
+
+class _Bubble:
+    """One message bubble. Its HTML is rendered (in the background) the first time it is shown."""
+
+    __slots__ = ("text", "is_user", "sender", "attachments", "status", "html", "pending", "document")
+
+    def __init__(self, text, is_user, sender=None, attachments=()):
+        self.text = text
+        self.is_user = is_user
+        self.sender = sender
+        self.attachments = attachments
+        self.status = None  # Streaming status shown until the first chunk
+        self.html = None
+        self.pending = False  # Showing the plain-text placeholder until rendered
+        self.document = None  # Streaming: QTextDocument patched in place
+
+
+class _Row:
+    """
+    A list row: one bubble, or several side by side (fan-out). `width` and
+    `height` cache the exact layout for a viewport width; rows that were
+    never shown only have an estimate.
+    """
+
+    __slots__ = ("key", "bubbles", "is_message", "live", "highlighted", "width", "height", "layout",
+                 "estimate")
+
+    _keys = itertools.count(1)
+
+    def __init__(self, bubbles, is_message=False, live=False):
+        self.key = next(self._keys)
+        self.bubbles = bubbles
+        self.is_message = is_message  # Counted by scroll_to_message
+        self.live = live  # Streaming: always measured exactly
+        self.highlighted = False
+        self.width = None
+        self.height = 0
+        self.layout = None
+        self.estimate = None  # (width, height)
+
+    def relayout(self):
+        self.width = None
+        self.layout = None
+
+    def invalidate(self):
+        self.relayout()
+        for bubble in self.bubbles:
+            bubble.html = None
+            bubble.pending = False
+
+
+class _ChatModel(QAbstractListModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == RowRole:
+            return row
+        if role == Qt.ItemDataRole.DisplayRole:
+            return "\n\n".join(bubble.text for bubble in row.bubbles)
+        return None
+
+    def append(self, row):
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows))
+        self.rows.append(row)
+        self.endInsertRows()
+
+    def prepend(self, rows):
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self.rows[0:0] = rows
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    def row_index(self, row):
+        """Model index of a row object (searched from the end: live rows are usually last)."""
+        for position in range(len(self.rows) - 1, -1, -1):
+            if self.rows[position] is row:
+                return self.index(position)
+        return QModelIndex()
+
+    def refresh(self, row):
+        index = self.row_index(row)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+        return index
+
+
+class _BubbleLayout:
+    __slots__ = ("sender_rect", "bubble_rect", "text_rect", "previews")
+
+    def __init__(self, sender_rect, bubble_rect, text_rect, previews):
+        self.sender_rect = sender_rect
+        self.bubble_rect = bubble_rect
+        self.text_rect = text_rect  # None when the bubble has no text
+        self.previews = previews  # [(QRect, path, label text or None, pixmap or None, ref)]
+
+
+class _MessageDelegate(QStyledItemDelegate):
+    """
+    Lays out and paints message rows. Bubble backgrounds are drawn with
+    the theme's QSS through hidden probe frames named UserBubble/BotBubble,
+    so themes keep styling them. Exact layout needs the rendered Markdown,
+    so rows that have never been on screen report an estimated height
+    (from their text length) and are measured when first painted.
+    """
+
+    def __init__(self, chat_area):
+        super().__init__(chat_area)
+        self.chat_area = chat_area
+        self._documents = OrderedDict()  # (row key, bubble no.) -> QTextDocument
+        self._resized = set()
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.timeout.connect(self._emit_resized)
+
+        self.sender_font = QFont("Segoe UI", 9, QFont.Weight.Bold)
+        self.sender_metrics = QFontMetrics(self.sender_font)
+        self._probes = {}
+        for is_user in (True, False):
+            frame = QFrame(chat_area)
+            frame.setObjectName("UserBubble" if is_user else "BotBubble")
+            label = QLabel(frame)
+            frame.hide()
+            self._probes[is_user] = (frame, label)
+        self._styles = {}  # is_user -> (padding, font, metrics), until the theme changes
+
+    def clear(self):
+        self._documents.clear()
+        self._resized.clear()
+
+    def restyle(self, rows):
+        """Forget everything derived from the theme (fonts, padding, layouts)."""
+        self._styles.clear()
+        self.clear()
+        for row in rows:
+            row.invalidate()
+            row.estimate = None
+            for bubble in row.bubbles:
+                if bubble.document is not None:
+                    bubble.document.setDefaultFont(self._style(bubble.is_user)[1])
+
+    # ------------------- Geometry ------------------- #
+    def _column_widths(self, row, width):
+        available = max(1, width - 2 * ROW_MARGIN)
+        if len(row.bubbles) == 1:
+            return [int(available * BUBBLE_MAX_WIDTH)]
+        column = (available - GROUP_SPACING * (len(row.bubbles) - 1)) // len(row.bubbles)
+        return [max(1, column)] * len(row.bubbles)
+
+    def _style(self, is_user):
+        """(padding, font, font metrics) of a bubble as themed by the QSS."""
+        style = self._styles.get(is_user)
+        if style is None:
+            frame, label = self._probes[is_user]
+            frame.ensurePolished()
+            label.ensurePolished()
+            margins = frame.contentsMargins()
+            horizontal, vertical = BUBBLE_PADDING
+            padding = (margins.left() + horizontal, margins.top() + vertical,
+                       margins.right() + horizontal, margins.bottom() + vertical)
+            style = self._styles[is_user] = (padding, label.font(), QFontMetrics(label.font()))
+        return style
+
+    def new_document(self, is_user):
+        document = QTextDocument()
+        document.setDocumentMargin(0)
+        document.setDefaultFont(self._style(is_user)[1])
+        return document
+
+    def _document(self, row, number, bubble, text_width):
+        if bubble.document is not None:
+            if bubble.document.textWidth() != text_width:
+                bubble.document.setTextWidth(text_width)
+            return bubble.document
+        key = (row.key, number)
+        document = self._documents.get(key)
+        if document is None:
+            document = self.new_document(bubble.is_user)
+            html = self.chat_area._bubble_html(row, bubble)
+            document.setDefaultStyleSheet(code_stylesheet(html))
+            document.setHtml(html)
+            self._documents[key] = document
+            if len(self._documents) > DOCUMENT_CACHE_SIZE:
+                self._documents.popitem(last=False)
+        else:
+            self._documents.move_to_end(key)
+        if document.textWidth() != text_width:
+            document.setTextWidth(text_width)
+        return document
+
+    def estimate(self, row, width):
+        """Height of a row that has not been laid out, from its text length."""
+        if row.estimate and row.estimate[0] == width:
+            return row.estimate[1]
+        height = 0
+        sender_height = self.sender_metrics.height() + SENDER_GAP
+        for bubble, column in zip(row.bubbles, self._column_widths(row, width)):
+            (left, top, right, bottom), _font, metrics = self._style(bubble.is_user)
+            per_line = max(1, (column - left - right) // max(1, metrics.averageCharWidth()))
+            body = bubble.text or "…"
+            lines = sum(1 + len(paragraph) // per_line for paragraph in body.split("\n"))
+            bubble_height = top + bottom + lines * metrics.lineSpacing()
+            for ref in bubble.attachments:
+                bubble_height += ITEM_SPACING + (THUMBNAIL_WIDTH * 2 // 3 if is_image_file(ref) else metrics.height())
+            height = max(height, bubble_height + (sender_height if bubble.sender else 0))
+        height += ROW_SPACING
+        row.estimate = (width, height)
+        return height
+
+    def measure(self, row, width):
+        """Exact layout of a row for a viewport width (cached on the row)."""
+        if row.width == width and row.layout is not None:
+            return row.layout
+        layouts = []
+        height = 0
+        x = ROW_MARGIN
+        sender_metrics = self.sender_metrics
+        for number, (bubble, column) in enumerate(zip(row.bubbles, self._column_widths(row, width))):
+            (left, top, right, bottom), _font, metrics = self._style(bubble.is_user)
+            inner = max(1, column - left - right)
+            y = ROW_SPACING // 2
+            sender_rect = None
+            if bubble.sender:
+                sender_rect = QRect(0, y, 0, sender_metrics.height())
+                y += sender_metrics.height() + SENDER_GAP
+
+            content_width = 0
+            content_height = 0
+            text_rect = None
+            if bubble.text or not bubble.attachments:
+                document = self._document(row, number, bubble, inner)
+                text_width = min(inner, math.ceil(document.idealWidth()))
+                text_rect = QRect(0, 0, text_width, math.ceil(document.size().height()))
+                content_width = text_width
+                content_height = text_rect.height()
+
+            previews = []
+            for ref in bubble.attachments:
+                path = attachment_path(ref)
+                if content_height:
+                    content_height += ITEM_SPACING
+                if not os.path.exists(path):
+                    label, pixmap = f"❓ Missing: {display_name(ref)}", None
+                elif is_image_file(ref):
+                    label, pixmap = None, ChatArea._thumbnail(ref, path)
+                else:
+                    label, pixmap = f"📄 {display_name(ref)}", None
+                if pixmap is not None and not pixmap.isNull():
+                    size = pixmap.deviceIndependentSize().toSize()
+                    if size.width() > inner:
+                        size = QSize(inner, size.height() * inner // max(1, size.width()))
+                else:
+                    label = metrics.elidedText(label or f"📄 {display_name(ref)}", Qt.TextElideMode.ElideMiddle, inner)
+                    pixmap = None
+                    size = QSize(min(inner, metrics.horizontalAdvance(label)), metrics.height())
+                previews.append((QRect(0, content_height, size.width(), size.height()), path, label, pixmap, ref))
+                content_width = max(content_width, size.width())
+                content_height += size.height()
+
+            bubble_width = content_width + left + right
+            # A lone user bubble sits at the right edge; everything else starts at its column
+            bubble_x = width - ROW_MARGIN - bubble_width if bubble.is_user and len(row.bubbles) == 1 else x
+            bubble_rect = QRect(bubble_x, y, bubble_width, content_height + top + bottom)
+            origin = QPoint(bubble_x + left, y + top)
+            if text_rect is not None:
+                text_rect.translate(origin)
+            previews = [(rect.translated(origin), path, label, pixmap, ref) for rect, path, label, pixmap, ref in previews]
+            if sender_rect is not None:
+                sender_width = min(column, sender_metrics.horizontalAdvance(bubble.sender) + 2)
+                sender_x = bubble_rect.right() + 1 - sender_width if bubble.is_user else bubble_x
+                sender_rect = QRect(sender_x, sender_rect.y(), sender_width, sender_rect.height())
+            layouts.append(_BubbleLayout(sender_rect, bubble_rect, text_rect, previews))
+            height = max(height, bubble_rect.bottom() + 1)
+            x += column + GROUP_SPACING
+
+        row.layout = layouts
+        row.width = width
+        row.height = height + ROW_SPACING - ROW_SPACING // 2
+        return layouts
+
+    def sizeHint(self, option, index):
+        row = index.data(RowRole)
+        width = self.chat_area.view.viewport().width()
+        if row.live or row.width == width:
+            self.measure(row, width)
+            return QSize(width, row.height)
+        return QSize(width, self.estimate(row, width))
+
+    def relayout(self, rows):
+        """Re-measure rows whose content changed and let the view pick up their new heights."""
+        width = self.chat_area.view.viewport().width()
+        for row in rows:
+            for number in range(len(row.bubbles)):
+                self._documents.pop((row.key, number), None)
+            if row.width is not None:
+                row.relayout()
+                self.measure(row, width)
+            self._resized.add(row)
+        self._resize_timer.start(0)
+
+    def _emit_resized(self):
+        # Each sizeHintChanged re-lays out the whole list: batch several into one layout
+        if len(self._resized) == 1:
+            index = self.chat_area.model.row_index(self._resized.pop())
+            if index.isValid():
+                self.sizeHintChanged.emit(index)
+        elif self._resized:
+            self._resized.clear()
+            self.chat_area.view.scheduleDelayedItemsLayout()
+
+    # ------------------- Painting ------------------- #
+    def paint(self, painter, option, index):
+        row = index.data(RowRole)
+        width = option.rect.width()
+        if row.width != width:
+            before = row.height if row.width is not None else self.estimate(row, width)
+            self.measure(row, width)
+            if row.height != before:
+                # Measured for real now: let the view re-layout with the exact height
+                self._resized.add(row)
+                self._resize_timer.start(0)
+
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        for number, (bubble, layout) in enumerate(zip(row.bubbles, row.layout)):
+            frame, label = self._probes[bubble.is_user]
+            if layout.sender_rect is not None:
+                painter.setFont(self.sender_font)
+                painter.setPen(QColor("gray"))
+                alignment = Qt.AlignmentFlag.AlignRight if bubble.is_user else Qt.AlignmentFlag.AlignLeft
+                painter.drawText(layout.sender_rect, alignment | Qt.AlignmentFlag.AlignVCenter, bubble.sender)
+
+            style_option = QStyleOption()
+            style_option.initFrom(frame)
+            style_option.rect = layout.bubble_rect
+            frame.style().drawPrimitive(QStyle.PrimitiveElement.PE_Widget, style_option, painter, frame)
+
+            palette = label.palette()
+            if layout.text_rect is not None:
+                document = self._document(row, number, bubble, layout.text_rect.width())
+                context = QAbstractTextDocumentLayout.PaintContext()
+                context.palette.setColor(QPalette.ColorRole.Text, palette.color(QPalette.ColorRole.WindowText))
+                context.palette.setColor(QPalette.ColorRole.Link, palette.color(QPalette.ColorRole.Link))
+                painter.save()
+                painter.translate(QPointF(layout.text_rect.topLeft()))
+                document.documentLayout().draw(painter, context)
+                painter.restore()
+
+            for rect, _path, text, pixmap, _ref in layout.previews:
+                if pixmap is not None:
+                    painter.drawPixmap(rect, pixmap)
+                else:
+                    painter.setFont(self._style(bubble.is_user)[1])
+                    painter.setPen(palette.color(QPalette.ColorRole.WindowText))
+                    painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter
+                                     | Qt.TextFlag.TextDontClip, text)
+
+            if row.highlighted:
+                painter.setPen(QPen(QColor("#ff9800"), 2))
+                painter.setBrush(Qt.BrushStyle.NoBrush)
+                painter.drawRoundedRect(layout.bubble_rect.adjusted(1, 1, -1, -1), 12, 12)
+        painter.restore()
+
+    # ------------------- Hit testing ------------------- #
+    def target_at(self, row, rect, pos):
+        """("link", url), ("file", path, ref) or None for a point inside a row's rect."""
+        layouts = self.measure(row, rect.width())
+        point = pos - rect.topLeft()
+        for number, (bubble, layout) in enumerate(zip(row.bubbles, layouts)):
+            if layout.text_rect is not None and layout.text_rect.contains(point):
+                document = self._document(row, number, bubble, layout.text_rect.width())
+                anchor = document.documentLayout().anchorAt(QPointF(point - layout.text_rect.topLeft()))
+                if anchor:
+                    return ("link", anchor)
+            for preview_rect, path, _text, _pixmap, ref in layout.previews:
+                if preview_rect.contains(point):
+                    return ("file", path, ref)
+        return None
+
+    def helpEvent(self, event, view, option, index):
+        if event.type() == event.Type.ToolTip and index.isValid():
+            target = self.target_at(index.data(RowRole), view.visualRect(index), event.pos())
+            if target and target[0] == "file":
+                text = attachment_text(target[2])
+                if text:
+                    QToolTip.showText(event.globalPos(), text[:500], view)
+                    return True
+            elif target and target[0] == "link":
+                QToolTip.showText(event.globalPos(), target[1], view)
+                return True
+        QToolTip.hideText()
+        return True
+
+
+class _ChatView(QListView):
+    """List view that opens links and file previews on click."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMouseTracking(True)
+
+    def _target(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return None
+        return self.itemDelegate().target_at(index.data(RowRole), self.visualRect(index), pos)
+
+    def mouseMoveEvent(self, event):
+        target = self._target(event.position().toPoint())
+        self.viewport().setCursor(
+            QCursor(Qt.CursorShape.PointingHandCursor if target else Qt.CursorShape.ArrowCursor)
+        )
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            target = self._target(event.position().toPoint())
+            if target and target[0] == "link":
+                QDesktopServices.openUrl(QUrl(target[1]))
+            elif target and target[0] == "file":
+                ChatArea._open_file(attachment_open_path(target[2]))
+        super().mouseReleaseEvent(event)
 
 
 class ChatArea(QWidget):
     """
     ChatArea widget:
-    Contains a scrollable area with vertical stacked messages.
+    A virtualized list of message bubbles (model/view): only rows in the
+    viewport are laid out and painted, so long sessions stay cheap.
     """
 
+    load_earlier_requested = pyqtSignal()
+
     def __init__(self):
         super().__init__()
 
@@ -26,122 +502,436 @@ class ChatArea(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
 
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        layout.addWidget(self.scroll_area)
+        self._load_earlier_button = QPushButton()
+        self._load_earlier_button.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+        self._load_earlier_button.clicked.connect(self.load_earlier_requested)
+        self._load_earlier_button.hide()
+        layout.addWidget(self._load_earlier_button)
+
+        self.model = _ChatModel(self)
+        self.view = _ChatView()
+        self.delegate = _MessageDelegate(self)
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.verticalScrollBar().setSingleStep(20)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.view.setFrameShape(QFrame.Shape.NoFrame)
+        self.view.setStyleSheet("QListView { background: transparent; border: none; }")
+        self.view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self._show_context_menu)
+        layout.addWidget(self.view)
+
+        # Keep following new messages while the view is scrolled to the bottom
+        self._follow_bottom = True
+        self._bottom_timer = QTimer(self)
+        self._bottom_timer.setSingleShot(True)
+        self._bottom_timer.setInterval(10)
+        self._bottom_timer.timeout.connect(
+            lambda: self.view.verticalScrollBar().setValue(self.view.verticalScrollBar().maximum())
+        )
+        scrollbar = self.view.verticalScrollBar()
+        scrollbar.valueChanged.connect(self._on_scrolled)
+        scrollbar.rangeChanged.connect(self._on_range_changed)
+
+        # --- Background Markdown rendering ---
+        self._renders = RenderQueue(self)
+        self._renders.rendered.connect(self._on_rendered)
+        self._queued = {}  # _Bubble -> (row, task) waiting for its rendering
+        self._rendered_rows = set()
+        self._rendered_timer = QTimer(self)
+        self._rendered_timer.setSingleShot(True)
+        self._rendered_timer.setInterval(RENDER_BATCH_MS)
+        self._rendered_timer.timeout.connect(self._apply_rendered)
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(50)
+        self._prefetch_timer.timeout.connect(self._prefetch)
+        scrollbar.valueChanged.connect(self._prefetch_timer.start)
+        scrollbar.rangeChanged.connect(self._prefetch_timer.start)
 
-        self.chat_widget = QWidget()
-        self.chat_layout = QVBoxLayout(self.chat_widget)
-        self.chat_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
-        self.chat_layout.setSpacing(15)
-        self.chat_layout.setContentsMargins(15, 15, 15, 15)
+        # --- Streaming state ---
+        self._streams = {}  # stream_id -> {"row", "bubble", "text", "status", "dirty"}
+        self._stream_timer = QTimer(self)
+        self._stream_timer.setInterval(STREAM_UPDATE_INTERVAL_MS)
+        self._stream_timer.timeout.connect(self._flush_streams)
 
-        self.scroll_area.setWidget(self.chat_widget)
+    def changeEvent(self, event):
+        if event.type() == event.Type.StyleChange:
+            # Theme switched: bubble fonts and padding may differ
+            self._reset_renders()
+            self.delegate.restyle(self.model.rows)
+            self.view.reset()
+        super().changeEvent(event)
 
     def clear_messages(self):
-        """Remove all message widgets."""
-        while self.chat_layout.count():
-            child = self.chat_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+        """Remove all messages."""
+        self._streams.clear()
+        self._stream_timer.stop()
+        # Renders still queued for the previous session are dropped
+        self._reset_renders()
+        self.delegate.clear()
+        self.model.clear()
+        self._load_earlier_button.hide()
+        self._follow_bottom = True
 
     def scroll_to_bottom(self):
-        """Scrolls to the bottom."""
-        # Use QTimer to ensure scrolling happens after layout is updated
-        from PyQt6.QtCore import QTimer
-        # First scroll with a short delay
-        QTimer.singleShot(10, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()
-        ))
-        # Second scroll with a longer delay to ensure we reach the absolute bottom
-        QTimer.singleShot(100, lambda: self.scroll_area.verticalScrollBar().setValue(
-            self.scroll_area.verticalScrollBar().maximum()
-        ))
-
-    def add_message(self, content, is_user=True, sender=None):
-        """
-        Adds a message to the chat.
-        Supports [Uploaded File: path] tags for file previews.
-        """
-        # Ensure we're at the bottom if we were already scrolled to bottom
-        scrollbar = self.scroll_area.verticalScrollBar()
-        was_at_bottom = scrollbar.value() >= scrollbar.maximum() - 10
-
-        # --- Optional sender label ---
-        if sender:
-            sender_label = QLabel(sender)
-            sender_label.setFont(QFont("Segoe UI", 9, QFont.Weight.Bold))
-            sender_label.setStyleSheet("color: gray;")
-            sender_label.setAlignment(Qt.AlignmentFlag.AlignRight if is_user else Qt.AlignmentFlag.AlignLeft)
-            self.chat_layout.addWidget(sender_label)
-
-        # --- Create message frame ---
-        message_frame = QFrame()
-        message_layout = QVBoxLayout(message_frame)
-        message_layout.setContentsMargins(10, 5, 10, 5)
-        message_layout.setSpacing(5)
-        message_frame.setObjectName("UserBubble" if is_user else "BotBubble")
-
-        text_lines, file_paths = self._split_content(content)
-
-        # --- Text part (Markdown) ---
-        if text_lines:
-            markdown_html = render_markdown("\n".join(text_lines))
-            text_label = QLabel()
-            text_label.setText(markdown_html)
-            text_label.setWordWrap(True)
-            text_label.setTextFormat(Qt.TextFormat.RichText)
-            text_label.setOpenExternalLinks(True)
-            message_layout.addWidget(text_label)
-
-        # --- File previews ---
-        for path in file_paths:
-            self._add_file_preview(message_layout, path)
-
-        # --- Add to main chat layout ---
-        self.chat_layout.addWidget(
-            message_frame,
-            alignment=Qt.AlignmentFlag.AlignRight if is_user else Qt.AlignmentFlag.AlignLeft
-        )
+        """Scrolls to the bottom (and keeps following rows that are still being measured)."""
+        self._follow_bottom = True
+        # The list lays itself out asynchronously; scroll once it has
+        self._bottom_timer.start()
+
+    def is_at_bottom(self):
+        scrollbar = self.view.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum() - 10
+
+    def _on_scrolled(self, value):
+        self._follow_bottom = value >= self.view.verticalScrollBar().maximum() - 10
+
+    def _on_range_changed(self, _minimum, maximum):
+        if self._follow_bottom:
+            self.view.verticalScrollBar().setValue(maximum)
+
+    def add_message(self, content, is_user=True, sender=None, cached=False):
+        """
+        Adds a message to the chat. `content` is a Message (attachments
+        already parsed) or text with [Uploaded File: path] tags.
+        `cached` marks replies served from the response cache.
+        """
+        was_at_bottom = self.is_at_bottom()
+        self.model.append(_Row([self._bubble(content, is_user, sender, cached)], is_message=True))
 
         # Only scroll to bottom if we were already at the bottom or this is a user message
         if was_at_bottom or is_user:
             self.scroll_to_bottom()
 
-    def _split_content(self, content):
-        """Split message content into text lines and file paths."""
-        file_lines = []
-        text_lines = []
+    def prepend_messages(self, messages):
+        """Insert older Messages above the ones shown, keeping the visible rows in place."""
+        top = self.view.indexAt(QPoint(0, 0))
+        offset = self.view.visualRect(top).top() if top.isValid() else 0
+        rows = [
+            _Row([self._bubble(message, message.is_user, message.sender)], is_message=True)
+            for message in messages
+        ]
+        self._follow_bottom = False
+        self.model.prepend(rows)
+        if top.isValid():
+            anchor = self.model.index(top.row() + len(rows))
 
-        for line in content.strip().splitlines():
-            if line.startswith("[Uploaded File: ") and line.endswith("]"):
-                file_path = line[len("[Uploaded File: "):-1]
-                file_lines.append(file_path)
-            else:
-                text_lines.append(line)
+            def restore():
+                self.view.scrollTo(anchor, QAbstractItemView.ScrollHint.PositionAtTop)
+                scrollbar = self.view.verticalScrollBar()
+                scrollbar.setValue(scrollbar.value() - offset)
 
-        return text_lines, file_lines
+            QTimer.singleShot(0, restore)
 
-    def _add_file_preview(self, layout, filepath):
-        """Add file preview or file label to the layout."""
-        if not os.path.exists(filepath):
-            layout.addWidget(QLabel(f"❓ Missing: {os.path.basename(filepath)}"))
+    def show_load_earlier(self, count):
+        """Show a "load earlier messages" button at the top while `count` older messages remain."""
+        self._load_earlier_button.setVisible(bool(count))
+        if count:
+            self._load_earlier_button.setText(f"Load earlier messages ({count} more)")
+
+    def scroll_to_message(self, index):
+        """Scroll the `index`-th shown message into view and highlight it briefly."""
+        messages = [row for row in self.model.rows if row.is_message]
+        if not 0 <= index < len(messages):
             return
+        row = messages[index]
+        self._follow_bottom = False
+        row.highlighted = True
+        self.model.refresh(row)
+
+        def reveal():
+            target = self.model.row_index(row)
+            if target.isValid():
+                self._follow_bottom = False
+                self.view.scrollTo(target, QAbstractItemView.ScrollHint.PositionAtCenter)
+
+        def unhighlight():
+            row.highlighted = False
+            self.model.refresh(row)
+
+        # After scroll_to_bottom()'s delayed scrolls from add_message, and again
+        # once the rows around it have been measured
+        QTimer.singleShot(150, reveal)
+        QTimer.singleShot(300, reveal)
+        QTimer.singleShot(150 + HIGHLIGHT_MS, unhighlight)
 
-        if is_image_file(filepath):
-            pixmap = QPixmap(filepath).scaledToWidth(300, Qt.TransformationMode.SmoothTransformation)
-            label = QLabel()
-            label.setPixmap(pixmap)
-            label.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+    def _bubble(self, content, is_user, sender, cached=False):
+        if isinstance(content, Message):
+            body, file_paths = content.body, content.attachments
         else:
-            label = QLabel(f"📄 {os.path.basename(filepath)}")
-            label.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
+            body, file_paths = parse_attachments(content)
+        return _Bubble(body, is_user, self._sender_text(sender, cached), file_paths)
+
+    def _show_context_menu(self, pos):
+        index = self.view.indexAt(pos)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        menu.addAction("Copy", lambda: QApplication.clipboard().setText(index.data()))
+        menu.exec(self.view.viewport().mapToGlobal(pos))
+
+    # ------------------- Background rendering ------------------- #
+    def _bubble_html(self, row, bubble):
+        """
+        HTML to lay out for a bubble: cached rendering, or a plain-text
+        placeholder while the real one renders off the GUI thread.
+        Streaming bubbles are rendered in place.
+        """
+        if bubble.html is None:
+            if not bubble.text:
+                bubble.html = f"<i>{bubble.status}…</i>" if bubble.status else "…"
+            elif row.live:
+                bubble.html = render_markdown(bubble.text)
+            else:
+                bubble.html = cached_markdown(bubble.text)
+                if bubble.html is None:
+                    bubble.html = placeholder_html(bubble.text)
+                    self._submit_render(row, bubble, RenderQueue.VISIBLE)
+        return bubble.html
+
+    def _submit_render(self, row, bubble, tier):
+        bubble.pending = True
+        self._queued[bubble] = (row, self._renders.submit(bubble.text, (row, bubble, bubble.text), tier))
+
+    def _reset_renders(self):
+        self._renders.reset()
+        self._queued.clear()
+        self._rendered_rows.clear()
+
+    def _prefetch(self):
+        """
+        Once scrolling settles: take back renders queued for rows that
+        scrolled away, and queue the rows around the viewport behind the
+        visible ones.
+        """
+        rows = self.model.rows
+        if not rows:
+            return
+        viewport = self.view.viewport().rect()
+        top = self.view.indexAt(viewport.topLeft())
+        bottom = self.view.indexAt(viewport.bottomLeft())
+        first = top.row() if top.isValid() else 0
+        last = bottom.row() if bottom.isValid() else len(rows) - 1
+        window = rows[max(0, first - PREFETCH_ROWS):last + PREFETCH_ROWS + 1]
 
-        label.mousePressEvent = lambda e, p=filepath: self._open_file(p, e)
-        layout.addWidget(label)
+        nearby = set(window)
+        for bubble, (row, task) in list(self._queued.items()):
+            if row not in nearby and self._renders.cancel(task):
+                del self._queued[bubble]
+                bubble.pending = False
+                if bubble.html is not None:
+                    # Placeholder laid out: render again when it is back on screen
+                    bubble.html = None
+                    row.relayout()
+                    for number in range(len(row.bubbles)):
+                        self.delegate._documents.pop((row.key, number), None)
+
+        for row in window:
+            if row.live:
+                continue
+            for bubble in row.bubbles:
+                if (bubble.html is None and not bubble.pending and bubble.text
+                        and cached_markdown(bubble.text) is None):
+                    self._submit_render(row, bubble, RenderQueue.NEARBY)
+
+    def _on_rendered(self, token, html):
+        row, bubble, text = token
+        self._queued.pop(bubble, None)
+        if bubble.text != text or not bubble.pending:
+            return  # Edited (or already rendered) since it was queued
+        bubble.pending = False
+        if bubble.html is None:
+            return  # Prefetched before it was shown: picked up from the cache on first paint
+        bubble.html = html
+        self._rendered_rows.add(row)
+        self._rendered_timer.start(0)
+
+    def _apply_rendered(self):
+        self.delegate.relayout(self._rendered_rows)
+        self._rendered_rows = set()
+
+    # ------------------- Streaming ------------------- #
+    def begin_streaming_message(self, stream_id, sender=None):
+        """Add an empty bot bubble that grows as chunks are appended."""
+        self.begin_streaming_group([(stream_id, sender)])
+
+    def begin_streaming_group(self, streams):
+        """
+        Add one row with a streaming bubble per (stream_id, sender) pair,
+        laid out side by side (used for fan-out replies).
+        """
+        was_at_bottom = self.is_at_bottom()
+        row = _Row([], live=True)
+        for stream_id, sender in streams:
+            bubble = _Bubble("", False, sender)
+            row.bubbles.append(bubble)
+            self._streams[stream_id] = {
+                "row": row, "bubble": bubble, "sender": sender, "text": "", "status": None, "dirty": False,
+            }
+        self.model.append(row)
+        if was_at_bottom:
+            self.scroll_to_bottom()
+
+    def has_stream(self, stream_id):
+        return stream_id in self._streams
+
+    def set_stream_status(self, stream_id, status):
+        """Show a status (e.g. "queued (3 ahead)") until the first chunk arrives; None clears it."""
+        stream = self._streams.get(stream_id)
+        if stream is None or stream["status"] == status:
+            return
+        stream["status"] = status
+        if not stream["text"]:
+            stream["bubble"].status = status
+            self._update_row(stream["row"])
+
+    def append_stream_chunk(self, stream_id, chunk):
+        """Buffer a chunk; the bubble is re-rendered on the next timer tick."""
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            return
+        stream["text"] += chunk
+        stream["dirty"] = True
+        if not self._stream_timer.isActive():
+            self._stream_timer.start()
+
+    def finish_streaming_message(self, stream_id, content=None, cached=False, note=None):
+        """
+        Render the final text of a streamed bubble and stop tracking it.
+        `note` (e.g. "Timed out") is appended below whatever text arrived.
+        """
+        stream = self._streams.pop(stream_id, None)
+        if stream is None:
+            return
+        if content is not None:
+            stream["text"] = content
+        if note:
+            stream["text"] = (stream["text"] + "\n\n" if stream["text"] else "") + f"*{note}*"
+        bubble = stream["bubble"]
+        if cached:
+            bubble.sender = self._sender_text(stream["sender"], cached)
+        # One full rendering of the final text replaces the patched document
+        bubble.text, bubble.attachments = parse_attachments(stream["text"])
+        bubble.document = None
+        row = stream["row"]
+        if not any(other["row"] is row for other in self._streams.values()):
+            row.live = False
+        row.invalidate()
+        if bubble.text:
+            bubble.html = render_markdown(bubble.text)
+        self._refresh_row(row)
+        if not self._streams:
+            self._stream_timer.stop()
+
+    def _flush_streams(self):
+        for stream in self._streams.values():
+            if stream["dirty"]:
+                self._render_stream(stream)
+
+    def _render_stream(self, stream):
+        """
+        Re-render a streamed bubble. Its blocks that are finished keep
+        their HTML and document content; only the open tail is rendered
+        again and swapped in at the end of the document.
+        """
+        bubble = stream["bubble"]
+        body, attachments = parse_attachments(stream["text"])
+        bubble.text, bubble.attachments = body, attachments
+        stream["dirty"] = False
+        if not body:
+            self._update_row(stream["row"])
+            return
+        if bubble.document is None:
+            bubble.document = self.delegate.new_document(bubble.is_user)
+            stream["renderer"] = IncrementalRenderer()
+            stream["tail"] = 0  # Document position where the open block starts
+        reset, appended, tail = stream["renderer"].update(body)
+        if reset:
+            stream["tail"] = 0
+        cursor = QTextCursor(bubble.document)
+        cursor.setPosition(stream["tail"])
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+        if appended:
+            self._insert_blocks(cursor, appended)
+            stream["tail"] = cursor.position()
+        if tail:
+            self._insert_blocks(cursor, tail)
+
+        row = stream["row"]
+        row.relayout()
+        index = self.model.refresh(row)
+        if index.isValid():
+            self.delegate.sizeHintChanged.emit(index)
+
+    @staticmethod
+    def _insert_blocks(cursor, html):
+        """
+        Append rendered blocks at the cursor (end of the document) as new
+        blocks. QTextCursor.insertHtml would merge the first one into the
+        current block and drop its paragraph format.
+        """
+        fragment = QTextDocument()
+        fragment.setDefaultStyleSheet(code_stylesheet(html))
+        fragment.setHtml(html)
+        if not cursor.atStart():
+            cursor.insertBlock()
+        start = cursor.position()
+        cursor.insertFragment(QTextDocumentFragment(fragment))
+        first = QTextCursor(cursor.document())
+        first.setPosition(start)
+        if not first.block().text() and fragment.begin().text():
+            # Fragments starting with a list leave the separator block empty in front of it
+            first.deleteChar()
+        first.setBlockFormat(fragment.begin().blockFormat())
+
+    def _update_row(self, row):
+        """Re-render a changed row and let the view pick up its new height."""
+        row.invalidate()
+        self._refresh_row(row)
+
+    def _refresh_row(self, row):
+        """Drop a row's laid-out documents and let the view pick up its new height."""
+        for number in range(len(row.bubbles)):
+            self.delegate._documents.pop((row.key, number), None)
+        index = self.model.refresh(row)
+        if index.isValid():
+            self.delegate.sizeHintChanged.emit(index)
+
+    # ------------------- Bubble helpers ------------------- #
+    @staticmethod
+    def _sender_text(sender, cached):
+        if cached:
+            return f"{sender or 'AI'} · ⚡ cached"
+        return sender
+
+    @staticmethod
+    def _thumbnail(ref, filepath):
+        """
+        Scaled preview of an image, decoded once per process (QPixmapCache)
+        and, for blobs, once ever (cached as a PNG next to the blob).
+        """
+        key = f"thumb:{filepath}"
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None:
+            return pixmap
+        cache_path = attachment_cache_path(ref, f"thumb{THUMBNAIL_WIDTH}.png")
+        pixmap = QPixmap(cache_path) if cache_path and os.path.exists(cache_path) else QPixmap()
+        if pixmap.isNull():
+            pixmap = QPixmap(filepath).scaledToWidth(THUMBNAIL_WIDTH, Qt.TransformationMode.SmoothTransformation)
+            if cache_path and not pixmap.isNull():
+                pixmap.save(cache_path, "PNG")
+        QPixmapCache.insert(key, pixmap)
+        return pixmap
 
-    def _open_file(self, filepath, event):
+    @staticmethod
+    def _open_file(filepath):
         """Open file in default OS handler."""
         if os.path.exists(filepath):
             QDesktopServices.openUrl(QUrl.fromLocalFile(filepath))
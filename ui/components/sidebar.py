@@ -1,12 +1,15 @@
 # foxchat/ui/components/sidebar.py
 
+import html
+
 from PyQt6.QtWidgets import (
-    QWidget, QVBoxLayout, QLabel, QPushButton, QListWidget,
-    QComboBox, QSizePolicy
+    QWidget, QVBoxLayout, QLabel, QPushButton, QListWidget, QListWidgetItem,
+    QComboBox, QSizePolicy, QLineEdit
 )
 from PyQt6.QtCore import QSize, Qt
 from PyQt6.QtGui import QFont
 
+from core.config import CHAT_MODES
 from core.utils import load_icon
 
 
@@ -14,6 +17,7 @@ class Sidebar(QWidget):
     """
     Sidebar widget:
     - Lists chat sessions and API profiles.
+    - Searches chat history; hits replace the session list while a query is typed.
     - Contains buttons for new sessions, adding APIs, and settings.
     - Switches between AI Chat and Anonymous Chat modes.
     """
@@ -35,6 +39,16 @@ class Sidebar(QWidget):
         sessions_title.setFont(QFont("Segoe UI", 18, QFont.Weight.Bold))
         layout.addWidget(sessions_title)
 
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search chats…")
+        self.search_box.setClearButtonEnabled(True)
+        layout.addWidget(self.search_box)
+
+        self.search_results = QListWidget()
+        self.search_results.setWordWrap(True)
+        self.search_results.hide()
+        layout.addWidget(self.search_results)
+
         self.session_list = QListWidget()
         self.session_list.setEditTriggers(
             QListWidget.EditTrigger.DoubleClicked |
@@ -47,7 +61,7 @@ class Sidebar(QWidget):
         layout.addWidget(self.btn_new_session)
 
         self.chat_mode_switch = QComboBox()
-        self.chat_mode_switch.addItems(["AI Chat", "Anonymous Chat"])
+        self.chat_mode_switch.addItems(list(CHAT_MODES))
         self.chat_mode_switch.setCursor(Qt.CursorShape.PointingHandCursor)
         layout.addWidget(self.chat_mode_switch)
 
@@ -57,6 +71,8 @@ class Sidebar(QWidget):
         layout.addWidget(api_label)
 
         self.api_list = QListWidget()
+        self.api_list.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.api_list.setToolTip("Ctrl+click several APIs to send each message to all of them")
         layout.addWidget(self.api_list)
 
         self.btn_add_api = QPushButton("Add Custom API")
@@ -76,3 +92,28 @@ class Sidebar(QWidget):
 
         # --- Push everything up ---
         layout.addStretch()
+
+    def show_search_results(self, hits):
+        """
+        Show (session, message index, snippet HTML) hits in place of the
+        session list; None goes back to the session list.
+        """
+        self.search_results.clear()
+        searching = hits is not None
+        self.search_results.setVisible(searching)
+        self.session_list.setVisible(not searching)
+        if not searching:
+            return
+        if not hits:
+            self.search_results.addItem("No matches")
+            return
+        for session, index, snippet in hits:
+            item = QListWidgetItem()
+            item.setData(Qt.ItemDataRole.UserRole, (session, index))
+            label = QLabel(f"<b>{html.escape(session)}</b><br>{snippet}")
+            label.setWordWrap(True)
+            label.setTextFormat(Qt.TextFormat.RichText)
+            label.setContentsMargins(4, 2, 4, 2)
+            self.search_results.addItem(item)
+            self.search_results.setItemWidget(item, label)
+            item.setSizeHint(label.sizeHint())
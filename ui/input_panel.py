@@ -76,6 +76,15 @@ class InputPanel(QWidget):
         self.btn_send.setCursor(Qt.CursorShape.PointingHandCursor)
         input_layout.addWidget(self.btn_send)
 
+        # Stop button replaces Send while a reply is pending
+        self.btn_stop = QPushButton("Stop")
+        self.btn_stop.setFixedSize(56, 48)
+        self.btn_stop.setObjectName("StopButton")
+        self.btn_stop.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_stop.setToolTip("Cancel the pending reply")
+        self.btn_stop.setVisible(False)
+        input_layout.addWidget(self.btn_stop)
+
         self.btn_upload = QPushButton()
         self.btn_upload.setIcon(load_icon("Upload.png"))
         self.btn_upload.setIconSize(QSize(28, 28))
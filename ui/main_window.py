@@ -1,10 +1,11 @@
 import os
+import time
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QListWidgetItem,
     QFileDialog, QMenu, QMessageBox, QApplication
 )
 from PyQt6.QtGui import QAction, QKeySequence, QShortcut
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QObject, QRunnable, QThreadPool, pyqtSignal
 
 from ui.components.topbar import TopBar
 from ui.components.sidebar import Sidebar
@@ -14,15 +15,77 @@ from advanced.file_preview_widget import is_image_file
 
 from core.utils import load_icon
 from core.file_manager import (
-    save_sessions, load_sessions,
-    save_api_profiles, load_api_profiles
+    list_session_info, count_session_messages, create_session, append_message, delete_session,
+    load_session_messages as load_saved_messages, rename_session as rename_saved_session,
+    search_messages, list_archived_sessions, archive_idle_sessions, ingest_attachments, release_attachments,
+    save_api_profiles, load_api_profiles, prepare_sessions
 )
-from core.api_manager import query_api
+from core.message import Message, attachment_line
+from core.request_executor import RequestExecutor
+from core.context_builder import ContextBuilder
 from core.custom_api_dialog import CustomApiDialog
-from core.config import load_theme
+from core.config import load_theme, FANOUT_PROVIDER_TIMEOUT, FANOUT_TOTAL_BUDGET, SESSION_PAGE_SIZE, SESSION_SORT
+from core import response_cache
+from core.provider_registry import APIS_DIR, get_registry
 
 DEFAULT_APIS = ["deepseek"]
 
+# Wait this long after the last keystroke before searching
+SEARCH_DEBOUNCE_MS = 150
+
+CANCEL_NOTES = {
+    "cancelled": "Cancelled",
+    "timeout": "Timed out",
+    "budget": "Stopped: fan-out time budget exceeded",
+}
+
+def session_tooltip(info, archived=False):
+    """Sidebar tooltip from a session's metadata (count, last activity, size)."""
+    if info.bytes is None:
+        size = "size unknown"
+    else:
+        size = f"{info.bytes} bytes" if info.bytes < 1024 else f"{info.bytes / 1024:.1f} KB"
+    lines = [f"{info.count} messages · {size}"]
+    if info.updated:
+        lines.append("Last active " + time.strftime("%Y-%m-%d %H:%M", time.localtime(info.updated)))
+    if archived:
+        lines.append("Archived: decompressed when opened")
+    return "\n".join(lines)
+
+
+class SessionMessages(list):
+    """The loaded tail of a session; `earlier` counts older messages still on disk."""
+
+    def __init__(self, messages=(), earlier=0):
+        super().__init__(messages)
+        self.earlier = earlier
+
+
+class _IngestSignals(QObject):
+    """Signal carrier for _IngestTask (QRunnable is not a QObject)."""
+    done = pyqtSignal(int, list)
+
+
+class _IngestTask(QRunnable):
+    """Copies a message's attachments into the blob store off the GUI thread."""
+
+    def __init__(self, token, paths, signals):
+        super().__init__()
+        self.token = token
+        self.paths = paths
+        self.signals = signals
+        self.cancelled = False
+        self.setAutoDelete(False)  # May be taken back from the pool
+
+    def run(self):
+        refs = []
+        for path in self.paths:
+            if self.cancelled:
+                break
+            refs += ingest_attachments([path])
+        self.signals.done.emit(self.token, refs)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -34,6 +97,8 @@ class MainWindow(QMainWindow):
         self.setup_state()
         self.setAcceptDrops(True)
 
+        # Older session data is imported on the writer thread, not by the first read
+        prepare_sessions(["AI Chat", "Anonymous Chat"])
         self.load_sessions_for_mode()
         self.load_api_list()
 
@@ -67,12 +132,17 @@ class MainWindow(QMainWindow):
         self.sidebar.session_list.currentItemChanged.connect(self.switch_session)
         self.sidebar.session_list.itemChanged.connect(self.rename_session)
         self.sidebar.btn_add_api.clicked.connect(self.add_custom_api)
+        self.chat_area.load_earlier_requested.connect(self.load_earlier_messages)
+        self.sidebar.search_box.textChanged.connect(lambda _: self.search_timer.start())
+        self.sidebar.search_results.itemClicked.connect(self.open_search_hit)
         self.input_panel.btn_send.clicked.connect(self.send_message)
+        self.input_panel.btn_stop.clicked.connect(self.cancel_pending_reply)
         self.input_panel.text_input.send_requested.connect(self.send_message)
         self.input_panel.btn_upload.clicked.connect(self.open_file_dialog)
 
         QShortcut(QKeySequence("Ctrl+N"), self, activated=self.create_new_session)
         QShortcut(QKeySequence("Ctrl+B"), self, activated=self.toggle_sidebar)
+        QShortcut(QKeySequence("Ctrl+F"), self, activated=self.focus_search)
 
         self.sidebar.api_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.sidebar.api_list.customContextMenuRequested.connect(self.handle_api_context_menu)
@@ -83,16 +153,46 @@ class MainWindow(QMainWindow):
     def setup_state(self):
         self.sidebar_expanded = True
         self.chat_mode = "AI Chat"
-        self.ai_sessions = {}
+        self.ai_sessions = {}  # name -> SessionMessages, or None until the session is opened
         self.p2p_sessions = {}
         self.current_session = None
+        self.archive_checked_modes = set()
         self.waiting_for_reply = False
         self.api_profiles = DEFAULT_APIS + load_api_profiles()
 
+        # Provider calls run off the GUI thread; replies arrive via signals
+        self.executor = RequestExecutor(parent=self)
+        self.executor.request_queued.connect(self.on_reply_queued)
+        self.executor.request_started.connect(self.on_reply_started)
+        self.executor.chunk_received.connect(self.on_reply_chunk)
+        self.executor.reply_ready.connect(self.process_ai_reply)
+        self.executor.request_cancelled.connect(self.on_reply_cancelled)
+        self.pending_requests = {}  # request_id -> (mode, session messages list, ai_name)
+        self._ingest_signals = _IngestSignals(self)
+        self._ingest_signals.done.connect(self.on_attachments_ingested)
+        self._ingest_token = 0
+        self.pending_ingests = {}  # token -> (mode, session messages list, text, _IngestTask)
+        self.context_builder = ContextBuilder()
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.run_search)
+
     def get_current_sessions(self):
         """Helper method to get the current sessions dictionary based on chat mode."""
         return self.ai_sessions if self.chat_mode == "AI Chat" else self.p2p_sessions
 
+    def get_session_messages(self, name, mode=None):
+        """Messages of a session, loading its most recent page on first access."""
+        mode = mode or self.chat_mode
+        sessions = self.ai_sessions if mode == "AI Chat" else self.p2p_sessions
+        messages = sessions.get(name)
+        if messages is None and name in sessions:
+            start = max(0, count_session_messages(mode, name) - SESSION_PAGE_SIZE)
+            messages = sessions[name] = SessionMessages(load_saved_messages(mode, name, start), earlier=start)
+        return messages
+
     def get_current_ai_name(self):
         """Helper method to get the name of the currently selected AI."""
         ai_name = "AI"
@@ -101,10 +201,21 @@ class MainWindow(QMainWindow):
             ai_name = current_api_item.text()
         return ai_name
 
+    def get_selected_ai_names(self):
+        """Names of all selected AIs in list order (fan-out when more than one)."""
+        api_list = self.sidebar.api_list
+        names = [
+            api_list.item(row).text() for row in range(api_list.count())
+            if api_list.item(row).isSelected()
+        ]
+        return names or [self.get_current_ai_name()]
+
     # ------------------- Chat Logic ------------------- #
     def switch_chat_mode(self, mode):
         self.chat_mode = mode
         self.load_sessions_for_mode()
+        if self.sidebar.search_box.text().strip():
+            self.run_search()
         self.chat_area.add_message(f"Switched to {mode} mode", is_user=False)
         self.sidebar.api_list.setEnabled(mode == "AI Chat")
 
@@ -118,11 +229,15 @@ class MainWindow(QMainWindow):
         else:
             session_name = f"Anonymous Chat {count}"
 
-        target_sessions[session_name] = []
+        target_sessions[session_name] = SessionMessages()
+        create_session(self.chat_mode, session_name)
 
         item = QListWidgetItem(session_name)
         item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
-        self.sidebar.session_list.addItem(item)
+        if SESSION_SORT == "recent":
+            self.sidebar.session_list.insertItem(0, item)
+        else:
+            self.sidebar.session_list.addItem(item)
         self.sidebar.session_list.setCurrentItem(item)
         self.current_session = session_name
         self.chat_area.clear_messages()
@@ -141,10 +256,13 @@ class MainWindow(QMainWindow):
                 item.setText(self.current_session)
                 return
 
+            if new_name == self.current_session:
+                return
+
             # Rename session key
             sessions[new_name] = sessions.pop(self.current_session)
+            rename_saved_session(self.chat_mode, self.current_session, new_name)
             self.current_session = new_name
-            save_sessions(self.chat_mode, sessions)  # Save immediately
 
     def switch_session(self, current, _previous):
         if current is None:
@@ -164,16 +282,22 @@ class MainWindow(QMainWindow):
         self.load_session_messages()
 
     def load_sessions_for_mode(self):
-        sessions = load_sessions(self.chat_mode)
+        # Only names are read here; messages load when a session is opened.
+        # Already-loaded sessions are kept so in-flight replies still find them.
+        loaded = self.get_current_sessions()
+        infos = list_session_info(self.chat_mode)
+        sessions = {info.name: loaded.get(info.name) for info in infos}
         if self.chat_mode == "AI Chat":
             self.ai_sessions = sessions
         else:
             self.p2p_sessions = sessions
 
+        archived = set(list_archived_sessions(self.chat_mode))
         self.sidebar.session_list.clear()
-        for name in sessions:
-            item = QListWidgetItem(name)
+        for info in infos:
+            item = QListWidgetItem(info.name)
             item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
+            item.setToolTip(session_tooltip(info, info.name in archived))
             self.sidebar.session_list.addItem(item)
 
         if self.sidebar.session_list.count() > 0:
@@ -182,11 +306,59 @@ class MainWindow(QMainWindow):
             self.current_session = None
             self.chat_area.clear_messages()
 
+        if self.chat_mode not in self.archive_checked_modes:
+            # Once per mode and run: move long-idle sessions to compressed storage
+            self.archive_checked_modes.add(self.chat_mode)
+            keep = [name for name, messages in sessions.items() if messages is not None]
+            archive_idle_sessions(self.chat_mode, keep=keep + [self.current_session])
+
     def load_session_messages(self):
         self.chat_area.clear_messages()
-        sessions = self.get_current_sessions()
-        for msg, is_user, sender in sessions.get(self.current_session, []):
-            self.chat_area.add_message(msg, is_user, sender=sender)
+        messages = self.get_session_messages(self.current_session) or []
+        for message in messages:
+            self.chat_area.add_message(message, message.is_user, sender=message.sender)
+        self.chat_area.show_load_earlier(getattr(messages, "earlier", 0))
+
+    def load_earlier_messages(self):
+        messages = self.get_session_messages(self.current_session)
+        if not messages or not messages.earlier:
+            return
+        start = max(0, messages.earlier - SESSION_PAGE_SIZE)
+        older = load_saved_messages(self.chat_mode, self.current_session, start, messages.earlier)
+        messages[0:0] = older
+        messages.earlier = start
+        self.chat_area.prepend_messages(older)
+        self.chat_area.show_load_earlier(start)
+
+    # ------------------- Search ------------------- #
+    def focus_search(self):
+        if not self.sidebar_expanded:
+            self.toggle_sidebar()
+        self.sidebar.search_box.setFocus()
+        self.sidebar.search_box.selectAll()
+
+    def run_search(self):
+        query = self.sidebar.search_box.text().strip()
+        self.sidebar.show_search_results(search_messages(self.chat_mode, query) if query else None)
+
+    def open_search_hit(self, item):
+        hit = item.data(Qt.ItemDataRole.UserRole)
+        if not hit:
+            return
+        session, index = hit
+        matches = self.sidebar.session_list.findItems(session, Qt.MatchFlag.MatchExactly)
+        if not matches:
+            return
+        self.sidebar.session_list.setCurrentItem(matches[0])
+
+        # Make sure the hit is loaded (with a little context above it), then re-render
+        messages = self.get_session_messages(session)
+        if index < messages.earlier:
+            start = max(0, index - 2)
+            messages[0:0] = load_saved_messages(self.chat_mode, session, start, messages.earlier)
+            messages.earlier = start
+            self.load_session_messages()
+        self.chat_area.scroll_to_message(index - messages.earlier)
 
     def send_message(self):
         if not self.current_session or self.waiting_for_reply:
@@ -197,40 +369,133 @@ class MainWindow(QMainWindow):
         if not text and not files:
             return
 
-        sessions = self.get_current_sessions()
-        msg = text + "".join(f"\n[Uploaded File: {f}]" for f in files)
-        sessions[self.current_session].append((msg, True, "You"))
-        self.chat_area.add_message(msg, True, sender="You")
-
+        messages = self.get_session_messages(self.current_session)
         self.input_panel.text_input.clear()
         self.input_panel.clear_file_previews()
         self.set_waiting_state(True)
+        if not files:
+            self._send(self.chat_mode, messages, text, [])
+            return
 
-        if self.chat_mode == "AI Chat":
-            ai_name = self.get_current_ai_name()
-            QTimer.singleShot(1000, lambda: self.process_ai_reply(ai_name, text))
+        # Hashing and copying large files would freeze the window; the
+        # message is sent once its attachments are in the blob store.
+        self._ingest_token += 1
+        task = _IngestTask(self._ingest_token, files, self._ingest_signals)
+        self.pending_ingests[self._ingest_token] = (self.chat_mode, messages, text, task)
+        QThreadPool.globalInstance().start(task)
+
+    def on_attachments_ingested(self, token, refs):
+        request = self.pending_ingests.pop(token, None)
+        if request is None:
+            release_attachments(refs)  # Stopped while copying: the message was never sent
+            return
+        mode, messages, text, _task = request
+        self._send(mode, messages, text, refs)
+
+    def _send(self, mode, messages, text, refs):
+        """Post the user's message to the session `messages` belongs to and ask the selected AIs."""
+        sessions = self.ai_sessions if mode == "AI Chat" else self.p2p_sessions
+        # The session may have been renamed (or deleted) while attachments were ingested
+        session_name = next((name for name, m in sessions.items() if m is messages), None)
+        if session_name is None:
+            release_attachments(refs)
+            self.set_waiting_state(bool(self.pending_requests))
+            return
+        message = Message(text + "".join("\n" + attachment_line(ref) for ref in refs), True, "You")
+        messages.append(message)
+        append_message(mode, session_name, message)
+        visible = mode == self.chat_mode and sessions.get(self.current_session) is messages
+        if visible:
+            self.chat_area.add_message(message, True, sender="You")
+
+        if mode == "AI Chat":
+            ai_names = self.get_selected_ai_names()
+            history = self.context_builder.build(messages)
+            if len(ai_names) == 1:
+                request_ids = [self.executor.submit(text, ai_names[0], messages=history)]
+                if visible:
+                    self.chat_area.begin_streaming_message(request_ids[0], sender=ai_names[0])
+            else:
+                # Fan-out: total latency is the slowest provider, not the sum
+                request_ids = self.executor.submit_fanout(
+                    text, ai_names,
+                    timeout=FANOUT_PROVIDER_TIMEOUT, budget=FANOUT_TOTAL_BUDGET, messages=history
+                )
+                if visible:
+                    self.chat_area.begin_streaming_group(list(zip(request_ids, ai_names)))
+            for request_id, ai_name in zip(request_ids, ai_names):
+                self.pending_requests[request_id] = (mode, messages, ai_name)
         else:
             # For Anonymous Chat, no AI response
             self.set_waiting_state(False)
-            save_sessions(self.chat_mode, sessions)  # Save immediately for P2P chat
 
-    def process_ai_reply(self, ai_name, user_text):
-        reply = query_api(user_text, ai_name)
-        sessions = self.get_current_sessions()
-        sessions[self.current_session].append((reply, False, ai_name))
-        self.chat_area.add_message(reply, False, sender=ai_name)
-        self.set_waiting_state(False)
-        save_sessions(self.chat_mode, sessions)
+    def process_ai_reply(self, request_id, reply, cached=False):
+        request = self.pending_requests.pop(request_id, None)
+        if request is None:
+            return
+        mode, messages, ai_name = request
+
+        # The reply belongs to the session it was sent from, which may no
+        # longer be the visible one (or may have been renamed/deleted).
+        message = Message(reply, False, ai_name)
+        messages.append(message)
+        sessions = self.ai_sessions if mode == "AI Chat" else self.p2p_sessions
+        if self.chat_area.has_stream(request_id):
+            self.chat_area.finish_streaming_message(request_id, reply, cached=cached)
+        elif mode == self.chat_mode and sessions.get(self.current_session) is messages:
+            self.chat_area.add_message(message, False, sender=ai_name, cached=cached)
+        self.set_waiting_state(bool(self.pending_requests))
+        session_name = next((name for name, m in sessions.items() if m is messages), None)
+        if session_name is not None:
+            append_message(mode, session_name, message)
+
+    def on_reply_queued(self, request_id, ahead):
+        status = f"queued ({ahead} ahead)" if ahead else "queued"
+        self.chat_area.set_stream_status(request_id, status)
+
+    def on_reply_started(self, request_id):
+        self.chat_area.set_stream_status(request_id, None)
+
+    def on_reply_chunk(self, request_id, chunk):
+        # Bubbles only exist for replies to the visible session
+        self.chat_area.append_stream_chunk(request_id, chunk)
+
+    def cancel_pending_reply(self):
+        for request_id in list(self.pending_requests):
+            self.executor.cancel(request_id)
+        if self.pending_ingests:
+            self.cancel_pending_ingests()
+
+    def cancel_pending_ingests(self):
+        """Stop sending messages whose attachments are still being copied, and put them back in the input."""
+        for mode, messages, text, task in self.pending_ingests.values():
+            task.cancelled = True
+            # A task still queued never took a reference; one already running reports back and is released then
+            QThreadPool.globalInstance().tryTake(task)
+            if not self.input_panel.text_input.toPlainText():
+                self.input_panel.text_input.setPlainText(text)
+                for path in task.paths:
+                    self.input_panel.add_file_preview(path)
+        self.pending_ingests.clear()
+        self.set_waiting_state(bool(self.pending_requests))
+
+    def on_reply_cancelled(self, request_id, reason):
+        if self.pending_requests.pop(request_id, None) is None:
+            return
+        self.chat_area.finish_streaming_message(request_id, note=CANCEL_NOTES.get(reason, reason))
+        self.set_waiting_state(bool(self.pending_requests))
 
     def set_waiting_state(self, waiting):
         self.waiting_for_reply = waiting
         self.input_panel.btn_send.setDisabled(waiting)
         self.input_panel.text_input.setDisabled(waiting)
+        self.input_panel.btn_send.setVisible(not waiting)
+        self.input_panel.btn_stop.setVisible(waiting)
 
     # ------------------- File & API Features ------------------- #
     def get_apis_dir(self):
         """Helper method to get the path to the APIs directory."""
-        return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "apis"))
+        return os.path.abspath(APIS_DIR)
 
     def load_api_list(self):
         self.sidebar.api_list.clear()
@@ -261,6 +526,8 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, "Error", f"Failed to write API file:\n{e}")
                 return
 
+            # Drop any stale resolution; the registry also reloads on mtime changes
+            get_registry().invalidate(name)
             self.api_profiles.append(name)
             # Save only custom profiles (exclude DEFAULT_APIS)
             save_api_profiles(self.api_profiles[len(DEFAULT_APIS):])
@@ -268,11 +535,24 @@ class MainWindow(QMainWindow):
 
     def handle_api_context_menu(self, pos):
         item = self.sidebar.api_list.itemAt(pos)
-        if item and item.text() not in DEFAULT_APIS:
-            menu = QMenu(self)
+        if not item:
+            return
+        name = item.text()
+        menu = QMenu(self)
+
+        if response_cache.cache_enabled():
+            bypass_action = QAction("Bypass Response Cache", self)
+            bypass_action.setCheckable(True)
+            bypass_action.setChecked(response_cache.is_bypassed(name))
+            bypass_action.toggled.connect(lambda checked: response_cache.set_bypassed(name, checked))
+            menu.addAction(bypass_action)
+
+        if name not in DEFAULT_APIS:
             action = QAction(load_icon("Delete.png"), "Delete API", self)
-            action.triggered.connect(lambda: self.delete_api(item.text()))
+            action.triggered.connect(lambda: self.delete_api(name))
             menu.addAction(action)
+
+        if not menu.isEmpty():
             menu.exec(self.sidebar.api_list.viewport().mapToGlobal(pos))
 
     def delete_api(self, name):
@@ -280,6 +560,7 @@ class MainWindow(QMainWindow):
             return
 
         self.api_profiles.remove(name)
+        get_registry().invalidate(name)
         save_api_profiles(self.api_profiles[len(DEFAULT_APIS):])
         self.load_api_list()
 
@@ -313,8 +594,9 @@ class MainWindow(QMainWindow):
         sessions = self.get_current_sessions()
         if name in sessions:
             del sessions[name]
-            save_sessions(self.chat_mode, sessions)
-            self.load_sessions_for_mode()
+            delete_session(self.chat_mode, name)
+            for item in self.sidebar.session_list.findItems(name, Qt.MatchFlag.MatchExactly):
+                self.sidebar.session_list.takeItem(self.sidebar.session_list.row(item))
 
     def open_file_dialog(self):
         dialog = QFileDialog(self)
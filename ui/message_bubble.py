@@ -2,7 +2,7 @@
 
 from PyQt6.QtWidgets import QFrame, QLabel, QVBoxLayout
 from PyQt6.QtCore import Qt
-from advanced.markdown_renderer import render_markdown
+from advanced.markdown_renderer import code_stylesheet, render_markdown
 
 
 class MessageBubble(QFrame):
@@ -35,6 +35,8 @@ class MessageBubble(QFrame):
         # Markdown-rendered message content
         content = QLabel()
         content.setTextFormat(Qt.TextFormat.RichText)
-        content.setText(render_markdown(text))  # Use actual markdown renderer
+        # QLabel has no default stylesheet: carry the code colors in the HTML
+        html = render_markdown(text)
+        content.setText(f"<style>{code_stylesheet(html)}</style>{html}")
         content.setWordWrap(True)
         layout.addWidget(content)